@@ -0,0 +1,379 @@
+"""
+Vectorised analytics over a user's mood history.
+
+This module works on plain NumPy arrays of entry timestamps and mood
+scores (as loaded by the CRUD layer) rather than on `Entry` objects, so
+that aggregations stay cheap for long histories. It provides:
+- Conversion of UTC timestamps into a user's local time zone
+- Day / week / month bucketing with avg/min/max/count per bucket, either
+  from raw entries or from pre-aggregated daily rollups
+- Largest-Triangle-Three-Buckets (LTTB) downsampling for charts
+- Insights: weekday / hour-of-day seasonality, rolling averages, logging
+  streaks, volatility and sharp mood drops, all over dense per-day
+  arrays built with `np.bincount`
+"""
+
+import datetime
+from typing import Literal
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+Bucket = Literal["day", "week", "month"]
+
+# 1970-01-01 was a Thursday; shifting by 3 days makes Monday weekday 0
+_EPOCH_WEEKDAY_SHIFT = 3
+
+
+def to_local_time(timestamps: np.ndarray, tz: ZoneInfo | None) -> np.ndarray:
+    """
+    Convert naive UTC timestamps into naive local timestamps for `tz`.
+
+    UTC offsets are resolved once per distinct UTC day rather than once per
+    entry. Only the (rare) days on which the offset changes, i.e. DST
+    transitions, fall back to resolving offsets for their individual entries.
+
+    Args:
+        timestamps: `datetime64[us]` array of UTC timestamps.
+        tz: Target time zone, or `None` to keep UTC.
+
+    Returns:
+        A `datetime64[us]` array of local wall-clock timestamps.
+    """
+    if tz is None or timestamps.size == 0:
+        return timestamps
+
+    days, inverse = np.unique(timestamps.astype("datetime64[D]"), return_inverse=True)
+
+    def offset_us(moment: datetime.datetime) -> int:
+        utc_moment = moment.replace(tzinfo=datetime.timezone.utc)
+        return int(utc_moment.astimezone(tz).utcoffset() // datetime.timedelta(microseconds=1))
+
+    day_starts = days.astype("datetime64[us]").tolist()
+    start_offsets = np.array([offset_us(d) for d in day_starts], dtype=np.int64)
+    end_offsets = np.array(
+        [offset_us(d + datetime.timedelta(days=1, microseconds=-1)) for d in day_starts],
+        dtype=np.int64,
+    )
+
+    offsets = start_offsets[inverse]
+    # Entries on a day with a DST transition need their own offset
+    changed = (start_offsets != end_offsets)[inverse]
+    if changed.any():
+        offsets[changed] = [offset_us(t) for t in timestamps[changed].tolist()]
+
+    return timestamps + offsets.astype("timedelta64[us]")
+
+
+def bucket_starts(local_timestamps: np.ndarray, bucket: Bucket) -> np.ndarray:
+    """
+    Map local timestamps to the start date of their day/week/month bucket.
+
+    Weeks start on Monday.
+
+    Args:
+        local_timestamps: `datetime64` array of local timestamps.
+        bucket: Bucket size.
+
+    Returns:
+        A `datetime64[D]` array with one bucket start per timestamp.
+    """
+    days = local_timestamps.astype("datetime64[D]")
+    if bucket == "day":
+        return days
+    if bucket == "week":
+        weekday = (days.astype(np.int64) + _EPOCH_WEEKDAY_SHIFT) % 7
+        return days - weekday.astype("timedelta64[D]")
+    return local_timestamps.astype("datetime64[M]").astype("datetime64[D]")
+
+
+def _empty_buckets() -> dict[str, np.ndarray]:
+    return {
+        "bucket": np.array([], dtype="datetime64[D]"),
+        "avg": np.array([], dtype=np.float64),
+        "min": np.array([], dtype=np.int64),
+        "max": np.array([], dtype=np.int64),
+        "n": np.array([], dtype=np.int64),
+    }
+
+
+def _reduce_buckets(
+    keys: np.ndarray,
+    counts: np.ndarray,
+    sums: np.ndarray,
+    mins: np.ndarray,
+    maxs: np.ndarray,
+) -> dict[str, np.ndarray]:
+    # Sort by bucket, then reduce each run of equal keys in one pass
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    starts, first_index = np.unique(keys, return_index=True)
+    n = np.add.reduceat(counts[order].astype(np.int64), first_index)
+    return {
+        "bucket": starts,
+        "avg": np.add.reduceat(sums[order].astype(np.int64), first_index) / n,
+        "min": np.minimum.reduceat(mins[order].astype(np.int64), first_index),
+        "max": np.maximum.reduceat(maxs[order].astype(np.int64), first_index),
+        "n": n,
+    }
+
+
+def aggregate_buckets(
+    timestamps: np.ndarray,
+    moods: np.ndarray,
+    bucket: Bucket,
+    tz: ZoneInfo | None = None,
+) -> dict[str, np.ndarray]:
+    """
+    Group moods into calendar buckets and compute per-bucket statistics.
+
+    Args:
+        timestamps: `datetime64[us]` array of UTC entry timestamps.
+        moods: Integer array of mood scores aligned with `timestamps`.
+        bucket: Bucket size (`"day"`, `"week"` or `"month"`).
+        tz: Optional time zone used to decide bucket boundaries.
+
+    Returns:
+        A dict of equally sized arrays, ordered by bucket start:
+        `bucket` (datetime64[D]), `avg`, `min`, `max` and `n`.
+    """
+    if timestamps.size == 0:
+        return _empty_buckets()
+    keys = bucket_starts(to_local_time(timestamps, tz), bucket)
+    return _reduce_buckets(keys, np.ones_like(moods), moods, moods, moods)
+
+
+def aggregate_daily_rollups(
+    days: np.ndarray,
+    counts: np.ndarray,
+    sums: np.ndarray,
+    mins: np.ndarray,
+    maxs: np.ndarray,
+    bucket: Bucket,
+) -> dict[str, np.ndarray]:
+    """
+    Combine pre-aggregated UTC daily rollups into day/week/month buckets.
+
+    This costs O(days) rather than O(entries), but buckets follow UTC day
+    boundaries; use `aggregate_buckets` when a local time zone is needed.
+
+    Args:
+        days: `datetime64[D]` array of rollup days.
+        counts: Entry count per day.
+        sums: Sum of moods per day.
+        mins: Minimum mood per day.
+        maxs: Maximum mood per day.
+        bucket: Bucket size (`"day"`, `"week"` or `"month"`).
+
+    Returns:
+        The same shape of result as `aggregate_buckets`.
+    """
+    if days.size == 0:
+        return _empty_buckets()
+    return _reduce_buckets(bucket_starts(days, bucket), counts, sums, mins, maxs)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Select points with the Largest-Triangle-Three-Buckets algorithm.
+
+    LTTB keeps the first and last points and, for each of the
+    `threshold - 2` buckets in between, the point forming the largest
+    triangle with the previously selected point and the next bucket's
+    average. This preserves peaks and troughs far better than striding.
+
+    Args:
+        x: Monotonically increasing x values.
+        y: Y values aligned with `x`.
+        threshold: Maximum number of points to keep (at least 3).
+
+    Returns:
+        Sorted indices of the selected points.
+    """
+    n = x.size
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = x.astype(np.float64)
+    y = y.astype(np.float64)
+    # Bucket edges over the interior points [1, n - 1)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < threshold - 1:
+            next_start, next_end = edges[i + 1], edges[i + 2]
+        else:
+            next_start, next_end = n - 1, n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        areas = np.abs(
+            (x[previous] - avg_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (avg_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[i + 1] = previous
+    return selected
+
+
+def seasonality(local_timestamps: np.ndarray, moods: np.ndarray) -> dict[str, np.ndarray]:
+    """
+    Average mood by weekday and by hour of the day.
+
+    Args:
+        local_timestamps: `datetime64[us]` array of local timestamps.
+        moods: Integer array of mood scores aligned with `local_timestamps`.
+
+    Returns:
+        `weekday_n` / `weekday_avg` (7 values, Monday first) and `hour_n` /
+        `hour_avg` (24 values); averages are NaN where there are no entries.
+    """
+    days = local_timestamps.astype("datetime64[D]")
+    weekdays = (days.astype(np.int64) + _EPOCH_WEEKDAY_SHIFT) % 7
+    hours = (local_timestamps - days) // np.timedelta64(1, "h")
+    result = {}
+    for name, keys, size in (("weekday", weekdays, 7), ("hour", hours.astype(np.int64), 24)):
+        n = np.bincount(keys, minlength=size)
+        sums = np.bincount(keys, weights=moods, minlength=size)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result[f"{name}_avg"] = sums / n
+        result[f"{name}_n"] = n
+    return result
+
+
+def daily_totals(
+    local_timestamps: np.ndarray, moods: np.ndarray
+) -> tuple[np.datetime64, np.ndarray, np.ndarray]:
+    """
+    Entry counts and mood sums for every calendar day of a history.
+
+    Days without entries are included (with zero counts), so windows over
+    the result are windows over calendar days.
+
+    Args:
+        local_timestamps: Non-empty `datetime64[us]` array of local timestamps.
+        moods: Integer array of mood scores aligned with `local_timestamps`.
+
+    Returns:
+        The first day, and the per-day `counts` and `sums` from that day on.
+    """
+    day_numbers = local_timestamps.astype("datetime64[D]").astype(np.int64)
+    first = day_numbers.min()
+    offsets = day_numbers - first
+    counts = np.bincount(offsets)
+    sums = np.bincount(offsets, weights=moods)
+    return np.datetime64(int(first), "D"), counts, sums
+
+
+def _window_sums(values: np.ndarray, window: int, lag: int = 0) -> np.ndarray:
+    # Sum of values[i - lag - window + 1 .. i - lag] for every i, via a prefix sum
+    prefix = np.concatenate(([0], np.cumsum(values)))
+    end = np.arange(values.size) + 1 - lag
+    start = np.maximum(end - window, 0)
+    return prefix[np.maximum(end, 0)] - prefix[start]
+
+
+def rolling_averages(counts: np.ndarray, sums: np.ndarray, window: int) -> np.ndarray:
+    """
+    Entry-weighted mood average over the trailing `window` days of each day.
+
+    Args:
+        counts: Per-day entry counts (from `daily_totals`).
+        sums: Per-day mood sums aligned with `counts`.
+        window: Window length in days, including the day itself.
+
+    Returns:
+        One average per day; NaN where the window holds no entries.
+    """
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return _window_sums(sums, window) / _window_sums(counts, window)
+
+
+def streaks(counts: np.ndarray, today: int) -> dict[str, int]:
+    """
+    Current and longest runs of consecutive days with at least one entry.
+
+    Args:
+        counts: Per-day entry counts (from `daily_totals`).
+        today: Offset of today from the first day; the current streak also
+            counts if its last day was yesterday.
+
+    Returns:
+        `current` and `longest` lengths in days, and the offsets of the
+        longest streak's first and last day (`longest_start`/`longest_end`,
+        -1 without entries).
+    """
+    logged = np.concatenate(([False], counts > 0, [False]))
+    edges = np.flatnonzero(logged[1:] != logged[:-1])
+    starts, ends = edges[::2], edges[1::2]
+    if starts.size == 0:
+        return {"current": 0, "longest": 0, "longest_start": -1, "longest_end": -1}
+    lengths = ends - starts
+    best = int(np.argmax(lengths))
+    current = int(lengths[-1]) if ends[-1] - 1 >= today - 1 else 0
+    return {
+        "current": current,
+        "longest": int(lengths[best]),
+        "longest_start": int(starts[best]),
+        "longest_end": int(ends[best] - 1),
+    }
+
+
+def volatility(
+    counts: np.ndarray, sums: np.ndarray, today: int, recent_days: int = 30
+) -> dict[str, float]:
+    """
+    How much the daily average mood moves around.
+
+    Args:
+        counts: Per-day entry counts (from `daily_totals`).
+        sums: Per-day mood sums aligned with `counts`.
+        today: Offset of today from the first day.
+        recent_days: Length of the recent window, ending today.
+
+    Returns:
+        `std` and `recent_std` (standard deviation of daily averages, over
+        the whole history and the recent window) and `mean_abs_change`
+        (between consecutive days with entries); NaN without enough days.
+    """
+    logged = np.flatnonzero(counts)
+    daily = sums[logged] / counts[logged]
+    recent = daily[logged > today - recent_days]
+    return {
+        "std": float(daily.std()) if daily.size > 1 else np.nan,
+        "recent_std": float(recent.std()) if recent.size > 1 else np.nan,
+        "mean_abs_change": float(np.abs(np.diff(daily)).mean()) if daily.size > 1 else np.nan,
+    }
+
+
+def mood_drops(
+    counts: np.ndarray, sums: np.ndarray, threshold: float, baseline_days: int = 7
+) -> dict[str, np.ndarray]:
+    """
+    Find days whose average mood fell sharply below the days before.
+
+    The baseline of a day is the entry-weighted average of the preceding
+    `baseline_days` days.
+
+    Args:
+        counts: Per-day entry counts (from `daily_totals`).
+        sums: Per-day mood sums aligned with `counts`.
+        threshold: Minimum drop (baseline minus the day's average) to report.
+        baseline_days: Length of the baseline window.
+
+    Returns:
+        Arrays `offset`, `avg`, `baseline` and `drop` for each such day, in
+        day order.
+    """
+    before_counts = _window_sums(counts, baseline_days, lag=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        baseline = _window_sums(sums, baseline_days, lag=1) / before_counts
+        daily = sums / counts
+    drop = baseline - daily
+    hit = np.flatnonzero((counts > 0) & (before_counts > 0) & (drop >= threshold))
+    return {"offset": hit, "avg": daily[hit], "baseline": baseline[hit], "drop": drop[hit]}
@@ -3,11 +3,28 @@ Dependency utilities for database sessions and authentication.
 
 This module provides:
 - get_db: FastAPI dependency that yields a database Session
+- get_async_db: FastAPI dependency that yields an AsyncSession (async mode only)
+- get_shard_db / get_async_shard_db: sessions on the shard holding the
+  current user's entries, for routes that write them
+- get_read_db / get_async_read_db: sessions for read-only entry routes,
+  served by the user's shard or a read replica of shard 0
+- get_directory_read_db / get_async_directory_read_db: read-only sessions
+  on the user directory, used to look up principals
 - get_current_user: FastAPI dependency that validates a JWT and returns the User
-- SessionDep / TokenDep / CurrentUser: typed aliases for dependency injection
+- get_current_principal: like get_current_user, but returns a cached
+  lightweight principal so routes that only need the user's ID skip the
+  database lookup
+- get_current_principal_async: async counterpart of get_current_principal
+- require_profiles_token: guards the profiler endpoints with PROFILES_TOKEN
+- SessionDep / AsyncSessionDep / ShardSessionDep / AsyncShardSessionDep /
+  ReadSessionDep / AsyncReadSessionDep / DirectoryReadSessionDep /
+  AsyncDirectoryReadSessionDep / TokenDep / CurrentUser / CurrentPrincipal /
+  AsyncCurrentPrincipal: typed aliases for dependency injection
 """
 
-from collections.abc import Generator
+import secrets
+import uuid
+from collections.abc import AsyncGenerator, Generator
 from typing import Annotated
 
 from jwt.exceptions import InvalidTokenError
@@ -15,64 +32,218 @@ from pydantic import ValidationError
 
 from app.core.config import settings
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import event
 from sqlmodel import Session
-from app.core.db import engine
-from app.models import User, TokenData
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.auth_cache import principal_cache
+from app.core.profiling import timed
+from app.core.db import async_engine, async_replicas, engine, note_write, replicas
+from app.core.sharding import shards
+from app.models import User, TokenData, UserPublic
 import jwt
 
 # OAuth2 scheme used by FastAPI to extract the bearer token
 oauth2_schema = OAuth2PasswordBearer(tokenUrl="/login/access-token")
 
 
-def get_db() -> Generator[Session, None, None]:
+_UNSET = object()
+
+
+def request_user_id(request: Request) -> uuid.UUID | None:
+    """
+    Return the user ID from the request's bearer token, if it is valid.
+
+    Used to route reads and note writes for replica stickiness; the result
+    is cached on the request. Authentication itself still happens in the
+    `get_current_*` dependencies.
+    """
+    user_id = getattr(request.state, "token_user_id", _UNSET)
+    if user_id is _UNSET:
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        user_id = None
+        if scheme.lower() == "bearer" and token:
+            try:
+                user_id = decode_access_token(token).sub
+            except HTTPException:
+                pass
+        request.state.token_user_id = user_id
+    return user_id
+
+
+def _note_write(session: Session) -> None:
+    request = session.info.get("request")
+    if request is None:
+        return
+    if replicas.replicas or (async_replicas is not None and async_replicas.replicas):
+        user_id = request_user_id(request)
+        if user_id is not None:
+            note_write(user_id)
+
+
+# Keep a user's reads on the primary for a while after any commit they make
+event.listen(Session, "after_commit", _note_write)
+
+
+def _routing_user_id(request: Request) -> uuid.UUID | None:
+    # Only decode the token when there is more than one place to route to
+    if shards.count > 1 or replicas.replicas:
+        return request_user_id(request)
+    return None
+
+
+def get_db(request: Request) -> Generator[Session, None, None]:
     """
     Yield a database session for the duration of a request.
 
-    Uses the global SQLModel engine to open a Session and ensures that it is
-    properly closed after the request is handled.
+    Uses the global SQLModel engine (the primary, which holds the user
+    directory) to open a Session and ensures that it is properly closed
+    after the request is handled.
     """
     with Session(engine) as session:
+        session.info["request"] = request
+        yield session
+
+
+def get_shard_db(request: Request) -> Generator[Session, None, None]:
+    """
+    Yield a session on the shard holding the current user's entries.
+
+    Without DATABASE_SHARD_URLS (or without a valid token) this is the
+    primary, like `get_db`.
+    """
+    user_id = request_user_id(request) if shards.count > 1 else None
+    bind = shards.engine_for(user_id) if user_id is not None else engine
+    with Session(bind) as session:
+        session.info["request"] = request
+        yield session
+
+
+def get_read_db(request: Request) -> Generator[Session, None, None]:
+    """
+    Yield a session for a read-only entry route.
+
+    The session is bound to the current user's shard. On shard 0 it uses a
+    read replica when DATABASE_REPLICA_URLS is set, unless the user wrote
+    recently (see `app.core.db.ReplicaSet`).
+    """
+    with Session(shards.read_engine(_routing_user_id(request))) as session:
+        yield session
+
+
+def get_directory_read_db(request: Request) -> Generator[Session, None, None]:
+    """
+    Yield a read-only session on the user directory (shard 0), served by a
+    read replica when configured.
+    """
+    with Session(replicas.read_engine(_routing_user_id(request))) as session:
+        yield session
+
+
+async def get_async_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Yield an async database session for the duration of a request.
+
+    Only available when `DATABASE_ASYNC` is enabled. Attributes are not
+    expired on commit so returned objects can be serialised without
+    triggering lazy loads outside the session.
+    """
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        session.info["request"] = request
+        yield session
+
+
+async def get_async_shard_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Async counterpart of `get_shard_db` for async-mode routes.
+    """
+    user_id = request_user_id(request) if shards.count > 1 else None
+    bind = shards.async_engine_for(user_id) if user_id is not None else async_engine
+    async with AsyncSession(bind, expire_on_commit=False) as session:
+        session.info["request"] = request
+        yield session
+
+
+async def get_async_read_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Async counterpart of `get_read_db` for async-mode routes.
+    """
+    bind = shards.async_read_engine(_routing_user_id(request))
+    async with AsyncSession(bind, expire_on_commit=False) as session:
+        yield session
+
+
+async def get_async_directory_read_db(
+    request: Request,
+) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Async counterpart of `get_directory_read_db` for async-mode routes.
+    """
+    bind = async_replicas.read_engine(_routing_user_id(request))
+    async with AsyncSession(bind, expire_on_commit=False) as session:
         yield session
 
 
 # Typed dependency aliases used throughout the application
 SessionDep = Annotated[Session, Depends(get_db)]
+AsyncSessionDep = Annotated[AsyncSession, Depends(get_async_db)]
+ShardSessionDep = Annotated[Session, Depends(get_shard_db)]
+AsyncShardSessionDep = Annotated[AsyncSession, Depends(get_async_shard_db)]
+ReadSessionDep = Annotated[Session, Depends(get_read_db)]
+AsyncReadSessionDep = Annotated[AsyncSession, Depends(get_async_read_db)]
+DirectoryReadSessionDep = Annotated[Session, Depends(get_directory_read_db)]
+AsyncDirectoryReadSessionDep = Annotated[AsyncSession, Depends(get_async_directory_read_db)]
 TokenDep = Annotated[str, Depends(oauth2_schema)]
 
 
-def get_current_user(session: SessionDep, token: TokenDep) -> User:
+def decode_access_token(token: str) -> TokenData:
     """
-    Resolve and return the current authenticated user from a JWT access token.
-
-    The token is decoded using the configured JWT secret and algorithm, then
-    validated against the TokenData schema. The `sub` claim is used to look up
-    the corresponding User record in the database.
+    Decode and validate a JWT access token.
 
     Args:
-        session: Database session dependency.
         token: Raw JWT access token extracted from the Authorization header.
 
     Raises:
-        HTTPException: 401 if the token is invalid, malformed, expired,
-        or if no matching user is found in the database.
+        HTTPException: 401 if the token is invalid, malformed or expired.
 
     Returns:
-        User: The authenticated User instance.
+        TokenData: The validated token claims.
     """
     try:
         # Decode the token and validate the expected payload shape
         payload = jwt.decode(
             token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM]
         )
-        token_data = TokenData(**payload)
+        return TokenData(**payload)
     except (InvalidTokenError, ValidationError):
         # Token is invalid or doesn't match the expected schema
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
         )
+
+
+def get_current_user(session: SessionDep, token: TokenDep) -> User:
+    """
+    Resolve and return the current authenticated user from a JWT access token.
+
+    The token is decoded using the configured JWT secret and algorithm, then
+    validated against the TokenData schema. The `sub` claim is used to look up
+    the corresponding User record in the database.
+
+    Args:
+        session: Database session dependency.
+        token: Raw JWT access token extracted from the Authorization header.
+
+    Raises:
+        HTTPException: 401 if the token is invalid, malformed, expired,
+        or if no matching user is found in the database.
+
+    Returns:
+        User: The authenticated User instance.
+    """
+    token_data = decode_access_token(token)
     # Fetch the user referenced by the token subject
     user: User | None = session.get(User, token_data.sub)
     if not user:
@@ -86,3 +257,106 @@ def get_current_user(session: SessionDep, token: TokenDep) -> User:
 
 # Dependency alias for endpoints that require an authenticated User
 CurrentUser = Annotated[User, Depends(get_current_user)]
+
+
+def get_current_principal(session: DirectoryReadSessionDep, token: TokenDep) -> UserPublic:
+    """
+    Resolve the current authenticated principal, using the principal cache.
+
+    Behaves like `get_current_user`, but returns a `UserPublic` and only
+    queries the database when the token subject is not already cached.
+    The lookup uses the read session, falling back to the primary if the
+    user has not reached the replica yet.
+    Use this for routes that only need the user's ID or public profile.
+
+    Args:
+        session: Read-only session on the user directory.
+        token: Raw JWT access token extracted from the Authorization header.
+
+    Raises:
+        HTTPException: 401 if the token is invalid, malformed, expired,
+        or if no matching user is found in the database.
+
+    Returns:
+        UserPublic: The authenticated principal.
+    """
+    with timed("auth"):
+        token_data = decode_access_token(token)
+        principal = principal_cache.get(token_data.sub)
+        if principal is not None:
+            return principal
+
+        user: User | None = session.get(User, token_data.sub)
+        if not user and session.get_bind() is not engine:
+            with Session(engine) as primary:
+                user = primary.get(User, token_data.sub)
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Could not validate credentials",
+            )
+        principal = UserPublic.model_validate(user)
+        principal_cache.set(principal, token_expires_at=token_data.exp)
+        return principal
+
+
+# Dependency alias for endpoints that only need the authenticated principal
+CurrentPrincipal = Annotated[UserPublic, Depends(get_current_principal)]
+
+
+async def get_current_principal_async(
+    session: AsyncDirectoryReadSessionDep, token: TokenDep
+) -> UserPublic:
+    """
+    Async counterpart of `get_current_principal` for async-mode routes.
+
+    Args:
+        session: Async read-only session on the user directory.
+        token: Raw JWT access token extracted from the Authorization header.
+
+    Raises:
+        HTTPException: 401 if the token is invalid, malformed, expired,
+        or if no matching user is found in the database.
+
+    Returns:
+        UserPublic: The authenticated principal.
+    """
+    with timed("auth"):
+        token_data = decode_access_token(token)
+        principal = principal_cache.get(token_data.sub)
+        if principal is not None:
+            return principal
+
+        user: User | None = await session.get(User, token_data.sub)
+        if not user and session.bind is not async_engine:
+            async with AsyncSession(async_engine) as primary:
+                user = await primary.get(User, token_data.sub)
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Could not validate credentials",
+            )
+        principal = UserPublic.model_validate(user)
+        principal_cache.set(principal, token_expires_at=token_data.exp)
+        return principal
+
+
+# Dependency alias for async-mode endpoints that need the authenticated principal
+AsyncCurrentPrincipal = Annotated[UserPublic, Depends(get_current_principal_async)]
+
+
+def require_profiles_token(x_profiles_token: str | None = Header(default=None)) -> None:
+    """
+    Only allow access to the operational `/utils` endpoints (profiles,
+    metrics, pool, cache and admission stats) with the PROFILES_TOKEN secret.
+
+    Raises:
+        HTTPException: 404 if no PROFILES_TOKEN is configured (the endpoints
+        are disabled), 403 if the `X-Profiles-Token` header does not match.
+    """
+    if not settings.PROFILES_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if x_profiles_token is None or not secrets.compare_digest(
+        x_profiles_token.encode(), settings.PROFILES_TOKEN.encode()
+    ):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
@@ -7,7 +7,8 @@ single unified API router.
 """
 
 from fastapi import APIRouter
-from app.api.routes import utils, login, users, entries
+from app.api.routes import utils, login, users, entries, entries_async
+from app.core.config import settings
 
 # Create a root router that will be mounted in the main FastAPI app
 api_router = APIRouter()
@@ -16,4 +17,14 @@ api_router = APIRouter()
 api_router.include_router(utils.router)   # Health checks / utility endpoints
 api_router.include_router(users.router)   # User management endpoints
 api_router.include_router(login.router)   # Authentication / login endpoints
-api_router.include_router(entries.router) # Journal entries CRUD endpoints
+entries_router = entries.router
+if settings.DATABASE_ASYNC:
+    # Async entry routes replace their sync counterparts, which are left
+    # out so each operation is registered (and documented) once
+    api_router.include_router(entries_async.router)
+    replaced = {route.name for route in entries_async.router.routes}
+    entries_router = APIRouter()
+    entries_router.routes.extend(
+        route for route in entries.router.routes if route.name not in replaced
+    )
+api_router.include_router(entries_router) # Journal entries CRUD endpoints
@@ -0,0 +1,165 @@
+"""
+ASGI middleware for the MoodMap API.
+
+- `MetricsMiddleware` records request counts, latencies and in-flight
+  requests in `app.core.metrics`
+- `TimingMiddleware` adds a `Server-Timing` header and runs the sampling
+  profiler on selected requests (see `app.core.profiling`)
+- `AdmissionMiddleware` limits concurrent requests per route class and
+  sheds load with 503s (see `app.core.admission`)
+
+All three are plain ASGI rather than `BaseHTTPMiddleware`, so streaming
+responses (exports) pass through untouched and are timed until their last
+byte is sent.
+"""
+
+import time
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core import admission, metrics, profiling
+from app.core.config import settings
+
+# Label for requests that did not match any route (404s, scanners), so
+# arbitrary paths can't blow up the number of time series
+UNMATCHED_ROUTE = "unmatched"
+
+
+def route_template(scope: Scope) -> str:
+    """
+    Return the matched route's path template, e.g. `/entries/{entry_id}`.
+    """
+    route = scope.get("route")
+    return getattr(route, "path_format", None) or UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """
+    Time every HTTP request and count it by route template and status.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        metrics.http_requests_in_progress.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            metrics.http_requests_in_progress.dec()
+            method = scope["method"]
+            route = route_template(scope)
+            metrics.http_requests_total.inc((method, route, str(status)))
+            metrics.http_request_duration_seconds.observe(
+                time.perf_counter() - start, (method, route)
+            )
+
+
+class TimingMiddleware:
+    """
+    Report per-phase request timings and profile selected requests.
+
+    The `Server-Timing` header is written when the response starts, so for
+    streamed responses it covers the time until the first byte.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = profiling.RequestTimings()
+        timings_token = profiling.current_timings.set(timings)
+        # Event streams stay open for hours; their duration says nothing
+        reason = None if scope["path"] in admission.STREAM_PATHS else profiling.should_profile()
+        profile = None
+        if reason is not None:
+            profile = profiling.Profile(scope["method"], scope["path"], reason)
+            profile_token = profiling.current_profile.set(profile)
+            profiling.profiler.start(profile)
+        status = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if settings.SERVER_TIMING_ENABLED:
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", timings.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            profiling.current_timings.reset(timings_token)
+            if profile is not None:
+                profiling.current_profile.reset(profile_token)
+                duration_ms = (time.perf_counter() - timings.start) * 1000
+                threshold = settings.PROFILE_SLOW_REQUEST_MS
+                keep = profile.reason == "sampled" or (
+                    threshold is not None and duration_ms >= threshold
+                )
+                if keep:
+                    profile.route = route_template(scope)
+                    profile.status = status
+                    profile.duration_ms = round(duration_ms, 3)
+                    profile.server_timing = timings.server_timing()
+                profiling.profiler.stop(profile, keep)
+
+
+class AdmissionMiddleware:
+    """
+    Queue or shed requests according to their route class's limiter.
+
+    A slot is held until the response has been fully sent, so streamed
+    responses count against their class for their whole duration.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        route_class = None
+        if scope["type"] == "http" and settings.ADMISSION_CONTROL_ENABLED:
+            route_class = admission.classify(scope["method"], scope["path"])
+        if route_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        limiter = admission.limiters[route_class]
+        now = time.monotonic()
+        deadline = admission.request_deadline(Headers(scope=scope), now)
+        try:
+            await limiter.acquire(deadline)
+        except admission.Shed as shed:
+            response = JSONResponse(
+                {"detail": "Server is overloaded, try again shortly"},
+                status_code=503,
+                headers={"Retry-After": str(admission.retry_after_seconds(shed))},
+            )
+            await response(scope, receive, send)
+            return
+
+        start = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release(time.monotonic() - start)
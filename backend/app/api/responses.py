@@ -0,0 +1,46 @@
+"""
+Fast JSON responses for models that have already been validated.
+
+When a route returns a plain object, FastAPI validates it against the
+route's `response_model` a second time and then serialises it through
+`jsonable_encoder`-style Python code and `json.dumps`. For large entry
+pages that second pass costs as much as building the page in the first
+place.
+
+`ModelJSONResponse` takes a pydantic model instance and writes it with
+pydantic-core's compiled serializer straight to bytes. Routes keep their
+`response_model` for the OpenAPI schema; returning a `Response` makes
+FastAPI skip its own validation and encoding.
+"""
+
+from collections.abc import Mapping
+
+from pydantic import BaseModel
+from starlette.background import BackgroundTask
+from starlette.responses import Response
+
+from app.core.profiling import timed
+
+
+class ModelJSONResponse(Response):
+    """
+    JSON response rendered from a pydantic model by pydantic-core.
+
+    The output matches what FastAPI produces for the same model through
+    `response_model` (compact separators, ISO 8601 datetimes, string UUIDs).
+    """
+
+    media_type = "application/json"
+
+    def __init__(
+        self,
+        content: BaseModel,
+        status_code: int = 200,
+        headers: Mapping[str, str] | None = None,
+        background: BackgroundTask | None = None,
+    ) -> None:
+        super().__init__(content, status_code, headers, self.media_type, background)
+
+    def render(self, content: BaseModel) -> bytes:
+        with timed("serialize"):
+            return content.__pydantic_serializer__.to_json(content)
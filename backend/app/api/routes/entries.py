@@ -6,70 +6,500 @@ only access their own entries. Filtering by the current user's ID is
 handled in the CRUD layer.
 """
 
+import datetime
 import uuid
-from typing import Any
+from typing import Any, Literal
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
-from fastapi import APIRouter, HTTPException
+import numpy as np
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 
-from app import crud
-from app.models import EntryPublic, EntriesPublic, EntryCreate
-from app.api.deps import SessionDep, CurrentUser
+from app import analytics, changes, crud, entry_io, group_commit, insights, rollups, search
+from app.core.config import settings
+from app.core.events import entry_events, stream
+from app.core.sharding import shards
+from app.core.etag import etag_matches, make_etag, etag_headers, not_modified
+from app.core.profiling import ProfiledRoute
+from app.models import (
+    EntryPublic,
+    EntriesPublic,
+    EntrySummariesPublic,
+    EntryChangesPublic,
+    EntryCreate,
+    EntryImportReport,
+    EntrySearchResults,
+    MoodBucketPublic,
+    MoodTimeSeriesPublic,
+    DailyMoodPublic,
+    MoodStatsPublic,
+    MoodInsightsPublic,
+)
+from app.api.deps import CurrentPrincipal, ReadSessionDep, ShardSessionDep
+from app.api.responses import ModelJSONResponse
 
-router = APIRouter(prefix="/entries", tags=["entries"])
+router = APIRouter(prefix="/entries", tags=["entries"], route_class=ProfiledRoute)
 
-@router.get("/", response_model=EntriesPublic)
-def get_user_entries(*, session: SessionDep, current_user: CurrentUser) -> Any:
+@router.get("/", response_model=EntriesPublic | EntrySummariesPublic)
+def get_user_entries(
+    *,
+    session: ReadSessionDep,
+    current_user: CurrentPrincipal,
+    limit: int = Query(default=100, ge=1, le=500),
+    cursor: str | None = None,
+    view: Literal["full", "summary"] = "full",
+    created_from: datetime.datetime | None = Query(default=None, alias="from"),
+    created_to: datetime.datetime | None = Query(default=None, alias="to"),
+    min_mood: int | None = Query(default=None, ge=1, le=10),
+    max_mood: int | None = Query(default=None, ge=1, le=10),
+    order: crud.EntryOrder = "desc",
+    if_none_match: str | None = Header(default=None),
+) -> Any:
     """
-    Return all journal entries belonging to the authenticated user.
+    Return a page of journal entries belonging to the authenticated user.
+
+    Entries are ordered newest first (`order=asc` for oldest first). Pass
+    the `next_cursor` from one response as `cursor` to fetch the following
+    page. With `view=summary` only `id`, `title`, `mood` and `created_at`
+    are returned (and loaded).
+
+    `from`/`to` (creation time, `to` exclusive; naive values are UTC) and
+    `min_mood`/`max_mood` (inclusive) are filtered in SQL against the entry
+    indexes, and `count` is the number of matching entries.
+
+    The response carries an ETag derived from the user's entry watermark
+    and the page parameters. A matching `If-None-Match` is answered with
+    `304 Not Modified` without loading any entries. Otherwise the page is
+    validated once and written by pydantic-core (see `ModelJSONResponse`).
 
     Args:
         session: Database session dependency.
         current_user: The currently authenticated user.
+        limit: Maximum number of entries to return.
+        cursor: Opaque cursor from a previous page, if any.
+        view: `full` for complete entries, `summary` to omit bodies.
+        created_from: Only entries created at or after this time (`from`).
+        created_to: Only entries created before this time (`to`).
+        min_mood: Only entries with at least this mood.
+        max_mood: Only entries with at most this mood.
+        order: `desc` for newest first, `asc` for oldest first.
+        if_none_match: ETag(s) of the client's cached copy, if any.
+
+    Raises:
+        HTTPException: 400 if the cursor is malformed or a range is empty.
 
     Returns:
-        A collection of the user's journal entries, wrapped in
-        an `EntriesPublic` response model.
+        A page of the user's journal entries, wrapped in an `EntriesPublic`
+        (or `EntrySummariesPublic`) response model, or an empty 304.
     """
+    if created_from is not None and created_to is not None and (
+        crud.utc_naive(created_from) >= crud.utc_naive(created_to)
+    ):
+        raise HTTPException(status_code=400, detail="`from` must be before `to`")
+    if min_mood is not None and max_mood is not None and min_mood > max_mood:
+        raise HTTPException(status_code=400, detail="`min_mood` must not exceed `max_mood`")
+
+    count, updated_at = crud.get_entries_watermark(session=session, user_id=current_user.id)
+    etag = make_etag(
+        current_user.id, count, updated_at, limit, cursor, view,
+        created_from, created_to, min_mood, max_mood, order,
+    )
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
     # Crud layer handles ownership of entries making sure a user only recieves entries they own
-    data = crud.get_all_entries_by_user_id(session=session, user_id=current_user.id)
-    return data
+    try:
+        data = crud.get_all_entries_by_user_id(
+            session=session,
+            user_id=current_user.id,
+            limit=limit,
+            cursor=cursor,
+            summary=view == "summary",
+            created_from=created_from,
+            created_to=created_to,
+            min_mood=min_mood,
+            max_mood=max_mood,
+            order=order,
+            total=count,
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return ModelJSONResponse(data, headers=etag_headers(etag))
+
+@router.get("/timeseries", response_model=MoodTimeSeriesPublic)
+def get_mood_timeseries(
+    *,
+    session: ReadSessionDep,
+    current_user: CurrentPrincipal,
+    bucket: analytics.Bucket = "day",
+    tz: str | None = None,
+    max_points: int = Query(default=365, ge=3, le=5000),
+) -> Any:
+    """
+    Return the authenticated user's mood aggregated into time buckets.
+
+    Entries are grouped into day/week/month buckets (in the user's time
+    zone if given) and, when there are more buckets than `max_points`,
+    downsampled with LTTB so the chart keeps its shape at a fixed size.
+    Without a time zone, buckets are built from the UTC daily rollups
+    instead of the individual entries.
+
+    Args:
+        session: Database session dependency.
+        current_user: The currently authenticated user.
+        bucket: Bucket size: `day`, `week` or `month`.
+        tz: Optional IANA time zone name, e.g. `Europe/London`.
+        max_points: Maximum number of buckets to return.
+
+    Raises:
+        HTTPException: 400 if the time zone is unknown.
+
+    Returns:
+        The bucketed series as a `MoodTimeSeriesPublic` model.
+    """
+    try:
+        zone = ZoneInfo(tz) if tz else None
+    except (ZoneInfoNotFoundError, ValueError):
+        raise HTTPException(status_code=400, detail="Unknown time zone")
+
+    if zone is None:
+        daily = rollups.get_daily_rollup_arrays(session=session, user_id=current_user.id)
+        series = analytics.aggregate_daily_rollups(
+            daily["day"], daily["count"], daily["sum"], daily["min"], daily["max"], bucket
+        )
+    else:
+        timestamps, moods = crud.get_mood_series_by_user_id(
+            session=session, user_id=current_user.id
+        )
+        series = analytics.aggregate_buckets(timestamps, moods, bucket, zone)
+
+    keep = analytics.lttb_indices(
+        series["bucket"].astype(np.int64), series["avg"], max_points
+    )
+    data = [
+        MoodBucketPublic(bucket=start, avg=avg, min=low, max=high, n=n)
+        for start, avg, low, high, n in zip(
+            series["bucket"][keep].tolist(),
+            series["avg"][keep].tolist(),
+            series["min"][keep].tolist(),
+            series["max"][keep].tolist(),
+            series["n"][keep].tolist(),
+        )
+    ]
+    return MoodTimeSeriesPublic(data=data, bucket=bucket, timezone=tz or "UTC")
+
+@router.get("/stats", response_model=MoodStatsPublic)
+def get_mood_stats(
+    *,
+    session: ReadSessionDep,
+    current_user: CurrentPrincipal,
+    start: datetime.date | None = Query(default=None, alias="from"),
+    end: datetime.date | None = Query(default=None, alias="to"),
+) -> Any:
+    """
+    Return mood statistics for the authenticated user over a date range.
+
+    Served entirely from the daily rollup table, so the cost depends on the
+    number of days in the range rather than the number of entries. Days are
+    UTC dates.
+
+    Args:
+        session: Database session dependency.
+        current_user: The currently authenticated user.
+        start: First day to include (`from`), inclusive.
+        end: Last day to include (`to`), inclusive.
+
+    Returns:
+        Overall and per-day statistics as a `MoodStatsPublic` model.
+    """
+    days = rollups.get_daily_rollups(
+        session=session, user_id=current_user.id, start=start, end=end
+    )
+    count = sum(day.count for day in days)
+    return MoodStatsPublic(
+        days=[
+            DailyMoodPublic(
+                day=day.day,
+                count=day.count,
+                avg=day.sum / day.count,
+                min=day.min,
+                max=day.max,
+            )
+            for day in days
+        ],
+        count=count,
+        avg=sum(day.sum for day in days) / count if count else None,
+        min=min((day.min for day in days), default=None),
+        max=max((day.max for day in days), default=None),
+    )
+
+@router.get("/insights", response_model=MoodInsightsPublic)
+def get_mood_insights(
+    *,
+    session: ReadSessionDep,
+    current_user: CurrentPrincipal,
+    tz: str | None = None,
+    drop_threshold: float = Query(default=3.0, gt=0, le=9),
+    max_points: int = Query(default=365, ge=3, le=5000),
+    if_none_match: str | None = Header(default=None),
+) -> Any:
+    """
+    Return mood patterns and trends for the authenticated user.
+
+    Covers the average mood by weekday and hour of day, 7- and 30-day
+    rolling averages (on days with entries, downsampled to `max_points`
+    with LTTB), logging streaks, volatility of the daily average, and the
+    most recent days whose average fell `drop_threshold` or more below the
+    preceding week's.
+
+    Results are computed from the `(created_at, mood)` columns only and
+    cached per user until their next entry write (see `app.insights`).
+    The ETag is derived from the same watermark, so a matching
+    `If-None-Match` is answered with `304 Not Modified` after a single
+    primary-key lookup.
+
+    Args:
+        session: Database session dependency.
+        current_user: The currently authenticated user.
+        tz: Optional IANA time zone name for days and hours.
+        drop_threshold: Minimum fall in daily average mood to report.
+        max_points: Maximum number of rolling average points.
+        if_none_match: ETag(s) of the client's cached copy, if any.
+
+    Raises:
+        HTTPException: 400 if the time zone is unknown.
+
+    Returns:
+        The insights as a `MoodInsightsPublic` model, or an empty 304.
+    """
+    try:
+        zone = ZoneInfo(tz) if tz else None
+    except (ZoneInfoNotFoundError, ValueError):
+        raise HTTPException(status_code=400, detail="Unknown time zone")
+
+    mark = insights.watermark(session=session, user_id=current_user.id, tz=zone)
+    etag = make_etag(current_user.id, *mark, tz, drop_threshold, max_points)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    data = insights.get_insights(
+        session=session,
+        user_id=current_user.id,
+        tz=zone,
+        drop_threshold=drop_threshold,
+        max_points=max_points,
+        mark=mark,
+    )
+    return ModelJSONResponse(data, headers=etag_headers(etag))
+
+@router.get("/search", response_model=EntrySearchResults)
+def search_entries(
+    *,
+    session: ReadSessionDep,
+    current_user: CurrentPrincipal,
+    q: str = Query(min_length=1, max_length=200),
+    limit: int = Query(default=20, ge=1, le=100),
+    offset: int = Query(default=0, ge=0, le=10_000),
+) -> Any:
+    """
+    Full-text search over the authenticated user's entry titles and bodies.
+
+    Every word in `q` must match; results are ranked by relevance (title
+    matches weigh more than body matches) and include a highlighted snippet.
+
+    Args:
+        session: Database session dependency.
+        current_user: The currently authenticated user.
+        q: Search query.
+        limit: Maximum number of results to return.
+        offset: Number of ranked results to skip.
+
+    Returns:
+        A page of results as an `EntrySearchResults` model.
+    """
+    hits = search.search_entries(
+        session=session,
+        user_id=current_user.id,
+        query=q,
+        limit=limit + 1,
+        offset=offset,
+    )
+    next_offset = offset + limit if len(hits) > limit else None
+    return EntrySearchResults(data=hits[:limit], next_offset=next_offset)
+
+@router.get("/export", response_class=StreamingResponse)
+def export_entries(
+    *,
+    current_user: CurrentPrincipal,
+    fmt: entry_io.EntryFormat = Query(default="ndjson", alias="format"),
+    gzip: bool = False,
+) -> Any:
+    """
+    Download all of the authenticated user's entries as NDJSON or CSV.
+
+    The response is streamed from a batched query, so memory use is
+    constant and the download starts immediately however long the history.
+
+    Args:
+        current_user: The currently authenticated user.
+        fmt: `ndjson` (default) or `csv`.
+        gzip: Compress the file on the fly (served as a `.gz` download).
+
+    Returns:
+        A `StreamingResponse` with the exported entries as an attachment.
+    """
+    filename = f"moodmap-entries.{fmt}"
+    media_type = "application/x-ndjson" if fmt == "ndjson" else "text/csv"
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
+
+    return StreamingResponse(
+        entry_io.export_entries(
+            bind=shards.read_engine(current_user.id),
+            user_id=current_user.id,
+            fmt=fmt,
+            batch_size=settings.EXPORT_BATCH_SIZE,
+            compress=gzip,
+        ),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@router.get("/changes", response_model=EntryChangesPublic)
+def get_entry_changes(
+    *,
+    session: ReadSessionDep,
+    current_user: CurrentPrincipal,
+    since: int = Query(default=0, ge=0),
+    limit: int = Query(default=100, ge=1, le=500),
+) -> Any:
+    """
+    Return the changes to the authenticated user's entries since a sync point.
+
+    Every create, update and delete gets the next number of a per-user
+    change sequence, and deletes leave a tombstone, so a client only
+    downloads what changed since its last sync. Start with `since=0` (a
+    full sync). Then pass each response's `next_since` on the next
+    request, repeating straight away while `has_more` is set. See
+    `app.changes`.
+
+    Args:
+        session: Database session dependency.
+        current_user: The currently authenticated user.
+        since: `next_since` of the previous sync, or 0.
+        limit: Maximum number of changes to return.
+
+    Returns:
+        The changes, oldest first, as an `EntryChangesPublic` model.
+    """
+    data = changes.get_changes(
+        session=session, user_id=current_user.id, since=since, limit=limit
+    )
+    return ModelJSONResponse(data)
+
+@router.get("/stream", response_class=StreamingResponse)
+def stream_entry_events(
+    *,
+    current_user: CurrentPrincipal,
+    last_event_id: str | None = Header(default=None),
+) -> Any:
+    """
+    Stream changes to the authenticated user's entries as Server-Sent Events.
+
+    Sends a `created`, `updated` or `deleted` event (carrying the entry, or
+    its `id` for deletes) for each change, and `imported` after each batch
+    of a bulk import. Clients keep their list current from these instead of
+    refetching it. The first event is `ready`. A reconnecting `EventSource`
+    sends `Last-Event-ID` and gets the events it missed, or a `reset` event
+    when they can't be replayed, after which it should refetch the list.
+    See `app.core.events`.
+
+    No database connection is held while the stream is open.
+
+    Args:
+        current_user: The currently authenticated user.
+        last_event_id: ID of the last event the client received, if any.
+
+    Raises:
+        HTTPException: 503 if this process has too many open streams.
+
+    Returns:
+        A `text/event-stream` `StreamingResponse`.
+    """
+    if entry_events.full:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many open event streams",
+            headers={"Retry-After": "5"},
+        )
+    return StreamingResponse(
+        stream(current_user.id, last_event_id),
+        media_type="text/event-stream",
+        # Disable caching and proxy buffering, which would hold events back
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @router.get("/{entry_id}", response_model=EntryPublic)
-def get_entry(entry_id: uuid.UUID, *, session: SessionDep, current_user: CurrentUser) -> Any:
+def get_entry(
+    entry_id: uuid.UUID,
+    *,
+    session: ReadSessionDep,
+    current_user: CurrentPrincipal,
+    if_none_match: str | None = Header(default=None),
+) -> Any:
     """
     Return a single journal entry by ID for the authenticated user.
 
     The lookup is scoped to the current user's ID so one user cannot
-    retrieve another user's entry.
+    retrieve another user's entry. The ETag is derived from the entry's
+    `updated_at`, so a matching `If-None-Match` is answered with
+    `304 Not Modified` without loading the entry.
 
     Args:
         entry_id: UUID of the entry to retrieve.
         session: Database session dependency.
         current_user: The currently authenticated user.
+        if_none_match: ETag(s) of the client's cached copy, if any.
 
     Raises:
         HTTPException: 404 if the entry does not exist for this user.
 
     Returns:
-        The requested journal entry as an `EntryPublic` model.
+        The requested journal entry as an `EntryPublic` model, or an empty 304.
     """
+    updated_at = crud.get_entry_version(
+        session=session, id=entry_id, user_id=current_user.id
+    )
+    if updated_at is None:
+        raise HTTPException(status_code=404, detail="Entry not found")
+    etag = make_etag(entry_id, updated_at)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
     entry = crud.get_entry_by_id(session=session, id=entry_id, user_id=current_user.id)
     if not entry:
         raise HTTPException(status_code=404, detail="Entry not found")
-    return entry
+    return ModelJSONResponse(EntryPublic.model_validate(entry), headers=etag_headers(etag))
 
 @router.post("/", response_model=EntryPublic)
-def create_entry(*, session: SessionDep, current_user: CurrentUser, body: EntryCreate) -> Any:
+def create_entry(*, session: ShardSessionDep, current_user: CurrentPrincipal, body: EntryCreate) -> Any:
     """
     Create a new journal entry for the authenticated user.
 
+    With `GROUP_COMMIT_ENABLED`, the entry is committed together with other
+    concurrent creations by a background writer (see `app.group_commit`);
+    the response is still only sent once it is committed.
+
     Args:
         session: Database session dependency.
         current_user: The currently authenticated user.
         body: Validated entry data (title, content, mood, etc.).
 
     Raises:
-        HTTPException: 500 if for some reason no current user is present.
+        HTTPException: 500 if for some reason no current user is present, or
+        503 if the group commit writer is saturated or times out.
 
     Returns:
         The newly created journal entry as an `EntryPublic` model.
@@ -77,5 +507,62 @@ def create_entry(*, session: SessionDep, current_user: CurrentUser, body: EntryC
     if not current_user:
         raise HTTPException(status_code=500, detail="No current user found")
 
-    entry = crud.create_entry(session=session, user=current_user, entry_to_create=body)
-    return entry
\ No newline at end of file
+    if settings.GROUP_COMMIT_ENABLED:
+        try:
+            entry = group_commit.create_entry(
+                bind=shards.engine_for(current_user.id),
+                user_id=current_user.id,
+                entry_to_create=body,
+            )
+        except group_commit.GroupCommitBusy:
+            raise HTTPException(
+                status_code=503,
+                detail="Too many entries being saved, try again shortly",
+                headers={"Retry-After": "1"},
+            )
+        except group_commit.GroupCommitTimeout:
+            raise HTTPException(status_code=503, detail="Timed out saving the entry")
+    else:
+        entry = crud.create_entry(session=session, user=current_user, entry_to_create=body)
+    return ModelJSONResponse(EntryPublic.model_validate(entry))
+
+@router.post("/import", response_model=EntryImportReport)
+async def import_entries(
+    request: Request,
+    *,
+    session: ShardSessionDep,
+    current_user: CurrentPrincipal,
+    fmt: entry_io.EntryFormat | None = Query(default=None, alias="format"),
+) -> Any:
+    """
+    Bulk import journal entries from an NDJSON or CSV request body.
+
+    The body is streamed rather than buffered: rows are validated as they
+    arrive and valid ones are inserted in batches of `IMPORT_BATCH_SIZE`.
+    Each row needs `mood` and `title`, and may have `body` and `created_at`.
+    CSV uploads must start with a header row.
+
+    Args:
+        request: The incoming request, whose body is the upload.
+        session: Database session dependency.
+        current_user: The currently authenticated user.
+        fmt: `ndjson` or `csv`; inferred from the Content-Type when omitted.
+
+    Returns:
+        An `EntryImportReport` with imported/failed counts and row errors.
+    """
+    if fmt is None:
+        content_type = request.headers.get("content-type", "")
+        fmt = "csv" if content_type.startswith("text/csv") else "ndjson"
+
+    # Parsing and inserts are blocking, so run them on a worker thread that
+    # pulls body chunks from the event loop as it goes
+    return await run_in_threadpool(
+        entry_io.import_entries,
+        session=session,
+        user_id=current_user.id,
+        chunks=entry_io.iter_stream_from_thread(request.stream()),
+        fmt=fmt,
+        batch_size=settings.IMPORT_BATCH_SIZE,
+        max_errors=settings.IMPORT_MAX_ERRORS,
+    )
@@ -0,0 +1,164 @@
+"""
+Async variants of the core journal entry routes.
+
+Registered ahead of `entries.router` when `DATABASE_ASYNC` is enabled, so
+listing, reading and creating entries await an `AsyncSession` instead of
+holding a threadpool thread while waiting on the database. Routes that are
+not defined here keep being served by the sync router.
+
+The single-entry route uses a `uuid` path convertor so it never shadows
+the static `/entries/...` paths of the sync router.
+"""
+
+import datetime
+import uuid
+from typing import Any, Literal
+
+from fastapi import APIRouter, Header, HTTPException, Query
+
+from app import crud, crud_async, group_commit
+from app.core.config import settings
+from app.core.etag import etag_matches, make_etag, etag_headers, not_modified
+from app.core.profiling import ProfiledRoute
+from app.core.sharding import shards
+from app.models import EntryPublic, EntriesPublic, EntrySummariesPublic, EntryCreate
+from app.api.deps import AsyncCurrentPrincipal, AsyncReadSessionDep, AsyncShardSessionDep
+from app.api.responses import ModelJSONResponse
+
+router = APIRouter(prefix="/entries", tags=["entries"], route_class=ProfiledRoute)
+
+@router.get("/", response_model=EntriesPublic | EntrySummariesPublic)
+async def get_user_entries(
+    *,
+    session: AsyncReadSessionDep,
+    current_user: AsyncCurrentPrincipal,
+    limit: int = Query(default=100, ge=1, le=500),
+    cursor: str | None = None,
+    view: Literal["full", "summary"] = "full",
+    created_from: datetime.datetime | None = Query(default=None, alias="from"),
+    created_to: datetime.datetime | None = Query(default=None, alias="to"),
+    min_mood: int | None = Query(default=None, ge=1, le=10),
+    max_mood: int | None = Query(default=None, ge=1, le=10),
+    order: crud.EntryOrder = "desc",
+    if_none_match: str | None = Header(default=None),
+) -> Any:
+    """
+    Return a page of journal entries belonging to the authenticated user.
+
+    Async counterpart of `entries.get_user_entries`, with the same ETag /
+    `If-None-Match` handling.
+
+    Raises:
+        HTTPException: 400 if the cursor is malformed or a range is empty.
+
+    Returns:
+        A page of the user's journal entries, wrapped in an `EntriesPublic`
+        (or `EntrySummariesPublic`) response model, or an empty 304.
+    """
+    if created_from is not None and created_to is not None and (
+        crud.utc_naive(created_from) >= crud.utc_naive(created_to)
+    ):
+        raise HTTPException(status_code=400, detail="`from` must be before `to`")
+    if min_mood is not None and max_mood is not None and min_mood > max_mood:
+        raise HTTPException(status_code=400, detail="`min_mood` must not exceed `max_mood`")
+
+    count, updated_at = await crud_async.get_entries_watermark(
+        session=session, user_id=current_user.id
+    )
+    etag = make_etag(
+        current_user.id, count, updated_at, limit, cursor, view,
+        created_from, created_to, min_mood, max_mood, order,
+    )
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    try:
+        data = await crud_async.get_all_entries_by_user_id(
+            session=session,
+            user_id=current_user.id,
+            limit=limit,
+            cursor=cursor,
+            summary=view == "summary",
+            created_from=created_from,
+            created_to=created_to,
+            min_mood=min_mood,
+            max_mood=max_mood,
+            order=order,
+            total=count,
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return ModelJSONResponse(data, headers=etag_headers(etag))
+
+@router.get("/{entry_id:uuid}", response_model=EntryPublic)
+async def get_entry(
+    entry_id: uuid.UUID,
+    *,
+    session: AsyncReadSessionDep,
+    current_user: AsyncCurrentPrincipal,
+    if_none_match: str | None = Header(default=None),
+) -> Any:
+    """
+    Return a single journal entry by ID for the authenticated user.
+
+    Async counterpart of `entries.get_entry`, with the same ETag /
+    `If-None-Match` handling.
+
+    Raises:
+        HTTPException: 404 if the entry does not exist for this user.
+
+    Returns:
+        The requested journal entry as an `EntryPublic` model, or an empty 304.
+    """
+    updated_at = await crud_async.get_entry_version(
+        session=session, id=entry_id, user_id=current_user.id
+    )
+    if updated_at is None:
+        raise HTTPException(status_code=404, detail="Entry not found")
+    etag = make_etag(entry_id, updated_at)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    entry = await crud_async.get_entry_by_id(
+        session=session, id=entry_id, user_id=current_user.id
+    )
+    if not entry:
+        raise HTTPException(status_code=404, detail="Entry not found")
+    return ModelJSONResponse(EntryPublic.model_validate(entry), headers=etag_headers(etag))
+
+@router.post("/", response_model=EntryPublic)
+async def create_entry(
+    *, session: AsyncShardSessionDep, current_user: AsyncCurrentPrincipal, body: EntryCreate
+) -> Any:
+    """
+    Create a new journal entry for the authenticated user.
+
+    Async counterpart of `entries.create_entry`.
+
+    Raises:
+        HTTPException: 503 if the group commit writer is saturated or times
+        out.
+
+    Returns:
+        The newly created journal entry as an `EntryPublic` model.
+    """
+    if settings.GROUP_COMMIT_ENABLED:
+        try:
+            entry = await group_commit.create_entry_async(
+                bind=shards.engine_for(current_user.id),
+                user_id=current_user.id,
+                entry_to_create=body,
+            )
+        except group_commit.GroupCommitBusy:
+            raise HTTPException(
+                status_code=503,
+                detail="Too many entries being saved, try again shortly",
+                headers={"Retry-After": "1"},
+            )
+        except group_commit.GroupCommitTimeout:
+            raise HTTPException(status_code=503, detail="Timed out saving the entry")
+    else:
+        entry = await crud_async.create_entry(
+            session=session, user=current_user, entry_to_create=body
+        )
+    return ModelJSONResponse(EntryPublic.model_validate(entry))
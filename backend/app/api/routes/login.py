@@ -12,27 +12,29 @@ from typing import Annotated, Any
 from fastapi import APIRouter, Depends, HTTPException
 
 from app.core.config import settings
-from app.core.security import create_access_token
+from app.core.security import create_access_token, PasswordHasherBusy
 
-from app.api.deps import SessionDep, CurrentUser
+from app.api.deps import SessionDep, CurrentPrincipal
+from app.core.profiling import ProfiledRoute
 from fastapi.security import OAuth2PasswordRequestForm
 
 from app.models import Token, UserPublic
 from app import crud
 
-router = APIRouter(prefix="/login", tags=["login"])
+router = APIRouter(prefix="/login", tags=["login"], route_class=ProfiledRoute)
 
 
 @router.post("/access-token")
-def login_access_token(
+async def login_access_token(
         session: SessionDep, form_data: Annotated[OAuth2PasswordRequestForm, Depends()]
 ) -> Token:
     """
     Authenticate a user and return a JWT access token.
 
     The OAuth2PasswordRequestForm provides `username` and `password`, which
-    are validated against the database via `crud.authenticate_user`. On success,
-    this issues a signed JWT with the user's ID in the `sub` claim.
+    are validated against the database via `crud.authenticate_user_async`,
+    so the bcrypt check is awaited rather than holding a request thread. On
+    success, this issues a signed JWT with the user's ID in the `sub` claim.
 
     Args:
         session: Database session dependency.
@@ -40,16 +42,22 @@ def login_access_token(
             and raw password.
 
     Raises:
-        HTTPException: 401 if the credentials are invalid.
+        HTTPException: 401 if the credentials are invalid, or 503 if the
+        password hashing pool is saturated.
 
     Returns:
         Token: A JWT access token and token type (`bearer`).
     """
-    print("Looking for user:")
-    user = crud.authenticate_user(
-        session=session, email=form_data.username, password=form_data.password
-    )
-    print(user)
+    try:
+        user = await crud.authenticate_user_async(
+            session=session, email=form_data.username, password=form_data.password
+        )
+    except PasswordHasherBusy:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many login attempts in progress, try again shortly",
+            headers={"Retry-After": "1"},
+        )
     if not user:
         raise HTTPException(
             status_code=401, detail="Incorrect email or password"
@@ -61,11 +69,11 @@ def login_access_token(
 
 
 @router.post("/test-token", response_model=UserPublic)
-def test_token(current_user: CurrentUser) -> Any:
+def test_token(current_user: CurrentPrincipal) -> Any:
     """
     Return the authenticated user, validating the access token in the process.
 
-    This endpoint relies on the `CurrentUser` dependency to resolve the user
+    This endpoint relies on the `CurrentPrincipal` dependency to resolve the user
     from the Authorization header. If the token is invalid or expired, the
     dependency will raise an HTTPException before this handler runs.
 
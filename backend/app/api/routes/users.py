@@ -5,28 +5,40 @@ This file currently only contains one method for registering user accounts. Late
 """
 
 from fastapi import APIRouter, HTTPException
+from starlette.concurrency import run_in_threadpool
 from typing import Any
 
 from app.models import UserPublic, UserCreate
 from app.api.deps import SessionDep
+from app.core.profiling import ProfiledRoute
+from app.core.security import PasswordHasherBusy
 from app import crud
 
-router = APIRouter(prefix="/users", tags=["users"])
+router = APIRouter(prefix="/users", tags=["users"], route_class=ProfiledRoute)
 
 @router.post("/", response_model=UserPublic)
-def create_user(*, session: SessionDep, body: UserCreate) -> Any:
+async def create_user(*, session: SessionDep, body: UserCreate) -> Any:
     """
-    This route will create a new user
+    This route will create a new user; the password is hashed without
+    holding a request thread
     :param session: The database session to use
     :param body: User information to store in the database
+    :raises HTTPException: 503 if the password hashing pool is saturated
     :return: The new user
     """
-    user = crud.get_user_by_email(session=session, email=body.email)
+    user = await run_in_threadpool(crud.get_user_by_email, session=session, email=body.email)
     if user:
         raise HTTPException(
             status_code=400,
             detail="Email already registered",
         )
 
-    user = crud.create_user(session=session, user_to_create=body)
+    try:
+        user = await crud.create_user_async(session=session, user_to_create=body)
+    except PasswordHasherBusy:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many registrations in progress, try again shortly",
+            headers={"Retry-After": "1"},
+        )
     return user
@@ -1,8 +1,69 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
 from typing import Any
 
+from app.api.deps import require_profiles_token
+from app.core import admission, metrics
+from app.core.profiling import profiler
+from app.core.auth_cache import principal_cache
+from app.core.insights_cache import insights_cache
+from app.core.db import async_engine, engine, pool_status, pool_wait_stats, replicas
+from app.core.sharding import shards
+
 router = APIRouter(prefix="/utils", tags=["utils"])
 
 @router.get("/check-running")
 def check_running() -> Any :
-    return {"status": "running"}
\ No newline at end of file
+    return {"status": "running"}
+
+@router.get("/auth-cache", dependencies=[Depends(require_profiles_token)])
+def auth_cache_stats() -> Any:
+    return principal_cache.stats()
+
+@router.get("/insights-cache", dependencies=[Depends(require_profiles_token)])
+def insights_cache_stats() -> Any:
+    return insights_cache.stats()
+
+@router.get("/db-pool", dependencies=[Depends(require_profiles_token)])
+def db_pool() -> Any:
+    status = {**pool_status(engine), **pool_wait_stats.snapshot()}
+    if async_engine is not None:
+        status["async"] = pool_status(async_engine.sync_engine)
+    if replicas.replicas:
+        status["replicas"] = replicas.status()
+    # Shard 0 is the primary above; the wait stats cover every shard's pool
+    if shards.count > 1:
+        status["shards"] = []
+        for index, target in enumerate(shards.engines[1:], start=1):
+            shard = {"shard": index, **pool_status(target)}
+            if shards.async_engines is not None:
+                shard["async"] = pool_status(shards.async_engines[index].sync_engine)
+            status["shards"].append(shard)
+    return status
+
+@router.get("/admission", dependencies=[Depends(require_profiles_token)])
+def admission_stats() -> Any:
+    return admission.stats()
+
+@router.get(
+    "/metrics",
+    response_class=PlainTextResponse,
+    dependencies=[Depends(require_profiles_token)],
+)
+def metrics_endpoint() -> Any:
+    return PlainTextResponse(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+@router.get("/profiles", dependencies=[Depends(require_profiles_token)])
+def list_profiles() -> Any:
+    return [profile.summary() for profile in profiler.list()]
+
+@router.get(
+    "/profiles/{profile_id}",
+    response_class=PlainTextResponse,
+    dependencies=[Depends(require_profiles_token)],
+)
+def get_profile(profile_id: int) -> Any:
+    profile = profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(profile.collapsed())
@@ -0,0 +1,242 @@
+"""
+Per-user change sequence and delete tombstones, for delta sync.
+
+Every entry write takes the next number from its owner's counter
+(`User.change_seq`, on the user's row on their shard) and stores it on
+the entry, or on a `EntryTombstone` for deletes. The CRUD layer calls
+into this module inside the write's transaction. The counter is bumped
+with a single `UPDATE ... RETURNING`, which on Postgres row-locks it until
+commit, so a user's changes commit in sequence order and a reader never
+sees a higher number before a lower one.
+
+`get_changes` answers "what changed since sequence N" from the
+`(user_id, change_seq)` indexes on both tables, so a sync costs
+O(changes) rather than O(history). An entry updated several times
+appears once, with its latest state. Both tables are read by a single
+`UNION ALL` statement, so the page comes from one snapshot; reading them
+separately could miss a change that commits between the two reads.
+
+Tombstones are kept indefinitely; they are a few dozen bytes each.
+"""
+
+import uuid
+from collections import defaultdict
+from typing import Any
+
+from sqlalchemy import cast, delete, insert, literal_column, null, text, union_all, update
+from sqlalchemy.engine import Connection
+from sqlmodel import Session, select
+
+from app.models import (
+    Entry,
+    EntryChangePublic,
+    EntryChangesPublic,
+    EntryPublic,
+    EntryTombstone,
+    User,
+)
+
+_users = User.__table__
+_tombstones = EntryTombstone.__table__
+
+
+def reserve(session: Session, user_id: uuid.UUID, count: int = 1) -> int:
+    """
+    Take the next `count` change sequence numbers of a user.
+
+    Args:
+        session: Database session on the user's shard; the caller commits.
+        user_id: ID of the user whose counter to advance.
+        count: How many numbers to take.
+
+    Returns:
+        The last number taken; the range is `last - count + 1 ..= last`.
+    """
+    statement = (
+        update(_users)
+        .where(_users.c.id == user_id)
+        .values(change_seq=_users.c.change_seq + count)
+        .returning(_users.c.change_seq)
+    )
+    return session.exec(statement).scalar_one()
+
+
+def stamp_rows(session: Session, rows: list[dict[str, Any]]) -> None:
+    """
+    Assign change sequence numbers to new entry rows, in place.
+
+    Takes one range per user, so a batch costs one counter update per
+    user rather than per row.
+    """
+    by_user: dict[uuid.UUID, list[dict[str, Any]]] = defaultdict(list)
+    for row in rows:
+        by_user[row["user_id"]].append(row)
+    for user_id, user_rows in by_user.items():
+        last = reserve(session, user_id, len(user_rows))
+        for seq, row in enumerate(user_rows, start=last - len(user_rows) + 1):
+            row["change_seq"] = seq
+
+
+def record_delete(session: Session, entry: Entry) -> None:
+    """
+    Add a tombstone for a deleted entry, within the caller's transaction.
+    """
+    session.exec(
+        insert(_tombstones).values(
+            entry_id=entry.id,
+            user_id=entry.user_id,
+            change_seq=reserve(session, entry.user_id),
+        )
+    )
+
+
+def current_seq(session: Session, user_id: uuid.UUID) -> int:
+    """
+    Return a user's last issued change sequence number.
+
+    It changes with every write to the user's entries, so it doubles as a
+    watermark for caches of derived data.
+    """
+    return session.exec(select(User.change_seq).where(User.id == user_id)).first() or 0
+
+
+def remove_user(session: Session, user_id: uuid.UUID) -> None:
+    """
+    Delete all of a user's tombstones, within the caller's transaction.
+    """
+    session.exec(delete(_tombstones).where(_tombstones.c.user_id == user_id))
+
+
+def copy_user(source: Session, target: Session, user_id: uuid.UUID) -> None:
+    """
+    Copy a user's tombstones and change counter to another shard.
+
+    Used when moving a user; entries carry their own `change_seq`. The
+    target session is not committed.
+    """
+    rows = source.exec(
+        select(
+            EntryTombstone.entry_id,
+            EntryTombstone.user_id,
+            EntryTombstone.change_seq,
+            EntryTombstone.deleted_at,
+        ).where(EntryTombstone.user_id == user_id)
+    ).all()
+    if rows:
+        target.exec(insert(_tombstones), params=[row._asdict() for row in rows])
+    counter = current_seq(source, user_id)
+    target.exec(update(_users).where(_users.c.id == user_id).values(change_seq=counter))
+
+
+def backfill_change_seqs(connection: Connection) -> None:
+    """
+    Number existing entries per user and set each user's counter.
+
+    Entries are numbered oldest first, starting at 1, so a client syncing
+    from 0 receives them all. Run by the schema migrations (see
+    `app.migrations`), inside their transaction.
+    """
+    unnumbered = connection.execute(
+        select(Entry.id).where(Entry.change_seq == 0).limit(1)
+    ).first()
+    if unnumbered is None:
+        return
+    connection.execute(
+        text(
+            "UPDATE entry SET change_seq = ranked.seq FROM ("
+            "SELECT id, row_number() OVER ("
+            "PARTITION BY user_id ORDER BY created_at, id) AS seq FROM entry"
+            ") AS ranked WHERE entry.id = ranked.id"
+        )
+    )
+    connection.execute(
+        text(
+            'UPDATE "user" SET change_seq = coalesce(('
+            'SELECT max(entry.change_seq) FROM entry WHERE entry.user_id = "user".id'
+            "), 0)"
+        )
+    )
+
+
+def changes_statement(user_id: uuid.UUID, since: int, limit: int) -> Any:
+    """
+    Build the `SELECT` for one page of changes.
+
+    Entries and tombstones after `since` are combined with `UNION ALL`, in
+    sequence order, selecting one row more than `limit`. Tombstone rows
+    have `op` set to `delete` and `NULL` entry columns.
+    """
+    columns = Entry.__table__.c
+    entries = select(
+        literal_column("'upsert'").label("op"),
+        Entry.id,
+        Entry.user_id,
+        Entry.mood,
+        Entry.title,
+        Entry.body,
+        Entry.created_at,
+        Entry.updated_at,
+        Entry.change_seq,
+    ).where(Entry.user_id == user_id, Entry.change_seq > since)
+    tombstones = select(
+        literal_column("'delete'"),
+        EntryTombstone.entry_id,
+        EntryTombstone.user_id,
+        *(
+            cast(null(), column.type)
+            for column in (
+                columns.mood,
+                columns.title,
+                columns.body,
+                columns.created_at,
+                columns.updated_at,
+            )
+        ),
+        EntryTombstone.change_seq,
+    ).where(EntryTombstone.user_id == user_id, EntryTombstone.change_seq > since)
+    merged = union_all(entries, tombstones).subquery()
+    return select(*merged.c).order_by(merged.c.change_seq).limit(limit + 1)
+
+
+def build_changes_page(rows: Any, *, since: int, limit: int) -> EntryChangesPublic:
+    """
+    Turn the rows selected by `changes_statement` into a page of changes.
+    """
+    changes = [
+        EntryChangePublic(
+            seq=row.change_seq,
+            op="upsert",
+            id=row.id,
+            entry=EntryPublic.model_validate(row),
+        )
+        if row.op == "upsert"
+        else EntryChangePublic(seq=row.change_seq, op="delete", id=row.id)
+        for row in rows
+    ]
+    has_more = len(changes) > limit
+    data = changes[:limit]
+    return EntryChangesPublic(
+        data=data,
+        next_since=data[-1].seq if data else since,
+        has_more=has_more,
+    )
+
+
+def get_changes(
+    *, session: Session, user_id: uuid.UUID, since: int, limit: int = 100
+) -> EntryChangesPublic:
+    """
+    Return a user's entry changes after sequence number `since`, oldest first.
+
+    Args:
+        session: Database session on the user's shard.
+        user_id: ID of the user whose changes to fetch.
+        since: The `next_since` of the client's last sync; 0 for everything.
+        limit: Maximum number of changes to return.
+
+    Returns:
+        The page of changes, the `since` for the next request, and whether
+        more changes are already waiting.
+    """
+    rows = session.exec(changes_statement(user_id, since, limit)).all()
+    return build_changes_page(rows, since=since, limit=limit)
@@ -0,0 +1,255 @@
+"""
+Admission control and load shedding for MoodMap.
+
+Each request is classified by path and method into a route class (reads,
+writes, auth, bulk import/export, everything else), and each class has a
+concurrency limit with a bounded FIFO wait queue. A request that cannot
+start in time is rejected straight away rather than queued behind work
+that will not finish before the client gives up:
+
+- if the class's queue is full
+- if the estimated wait (queue position x recent service time) already
+  exceeds the request's deadline
+- if it waited in the queue until its deadline passed
+
+The deadline is `ADMISSION_DEADLINE_MS`, optionally shortened per request
+by an `X-Request-Deadline-Ms` header. Rejected requests get a 503 with a
+`Retry-After` estimate. Health and monitoring routes and the entry event
+stream are never limited.
+
+Limiters are per process and run on the event loop, so they need no
+locks. Limits should be sized against the threadpool and the DB pool.
+"""
+
+import asyncio
+import collections
+import math
+import time
+from collections.abc import Mapping
+from typing import Any
+
+from app.core import metrics
+from app.core.config import settings
+
+# Cheap health and monitoring routes, never queued or shed so they keep
+# answering under overload
+EXEMPT_PATHS = frozenset(
+    {"/", "/utils/check-running", "/utils/metrics", "/utils/admission"}
+)
+
+# Long-lived event streams, which would hold a slot for their whole life;
+# capped by `ENTRY_STREAM_MAX_SUBSCRIBERS` instead
+STREAM_PATHS = frozenset({"/entries/stream"})
+
+# Long-running streaming routes, limited separately so they can't hold
+# every read or write slot
+BULK_PATHS = frozenset({"/entries/import", "/entries/export"})
+
+READ_METHODS = frozenset({"GET", "HEAD"})
+
+
+class Shed(Exception):
+    """
+    Raised when a request is rejected by admission control.
+    """
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionLimiter:
+    """
+    Concurrency limit with a bounded FIFO wait queue for one route class.
+
+    Must only be used from the event loop thread.
+    """
+
+    def __init__(self, name: str, concurrency: int, queue_size: int):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.in_flight = 0
+        self.admitted = 0
+        self.shed: collections.Counter[str] = collections.Counter()
+        self.queue_time_total = 0.0
+        # Exponentially weighted moving average of the time a slot is held
+        self.service_time = 0.05
+        self._waiters: collections.deque[asyncio.Future] = collections.deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def estimated_wait(self, position: int) -> float:
+        """
+        Estimate how long the request at `position` in the queue will wait.
+        """
+        return position * self.service_time / self.concurrency
+
+    def _reject(self, reason: str, position: int) -> Shed:
+        self.shed[reason] += 1
+        metrics.admission_shed_total.inc((self.name, reason))
+        return Shed(reason, self.estimated_wait(position))
+
+    async def acquire(self, deadline: float) -> float:
+        """
+        Wait for a slot, or fail fast if it can't be had before `deadline`.
+
+        Args:
+            deadline: `time.monotonic()` value by which the request must start.
+
+        Raises:
+            Shed: If the queue is full or the deadline cannot be met.
+
+        Returns:
+            Seconds spent waiting in the queue.
+        """
+        if self.in_flight < self.concurrency and not self._waiters:
+            self.in_flight += 1
+            self._admit(0.0)
+            return 0.0
+
+        position = len(self._waiters) + 1
+        if position > self.queue_size:
+            raise self._reject("queue_full", position)
+        now = time.monotonic()
+        if now + self.estimated_wait(position) > deadline:
+            raise self._reject("deadline", position)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait({waiter}, timeout=max(deadline - now, 0))
+        except asyncio.CancelledError:
+            # Client went away while queued; pass on a slot we were handed
+            if waiter.done() and not waiter.cancelled():
+                self.release(0.0)
+            else:
+                waiter.cancel()
+            raise
+        if not waiter.done():
+            waiter.cancel()
+            self._waiters.remove(waiter)
+            raise self._reject("timeout", len(self._waiters) + 1)
+
+        waited = time.monotonic() - now
+        self._admit(waited)
+        return waited
+
+    def _admit(self, waited: float) -> None:
+        self.admitted += 1
+        self.queue_time_total += waited
+        metrics.admission_queue_seconds.observe(waited, (self.name,))
+
+    def release(self, service_time: float) -> None:
+        """
+        Free a slot, handing it straight to the oldest waiter if any.
+        """
+        if service_time:
+            self.service_time += 0.2 * (service_time - self.service_time)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "concurrency": self.concurrency,
+            "queue_size": self.queue_size,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "shed": dict(self.shed),
+            "queue_time_avg_ms": self.queue_time_total * 1000 / self.admitted
+            if self.admitted
+            else 0.0,
+            "service_time_ms": self.service_time * 1000,
+        }
+
+
+def _build_limiters() -> dict[str, AdmissionLimiter]:
+    queue_size = settings.ADMISSION_QUEUE_SIZE
+    return {
+        name: AdmissionLimiter(name, concurrency, queue_size)
+        for name, concurrency in (
+            ("read", settings.ADMISSION_READ_CONCURRENCY),
+            ("write", settings.ADMISSION_WRITE_CONCURRENCY),
+            ("auth", settings.ADMISSION_AUTH_CONCURRENCY),
+            ("bulk", settings.ADMISSION_BULK_CONCURRENCY),
+            ("default", settings.ADMISSION_DEFAULT_CONCURRENCY),
+        )
+    }
+
+
+# Per-process limiters, one per route class
+limiters = _build_limiters()
+
+
+def classify(method: str, path: str) -> str | None:
+    """
+    Return the route class for a request, or `None` if it is exempt.
+    """
+    if method == "OPTIONS" or path in EXEMPT_PATHS or path in STREAM_PATHS:
+        return None
+    path = path.rstrip("/") or "/"
+    if path in BULK_PATHS:
+        return "bulk"
+    if path.startswith(("/login", "/users")):
+        return "auth"
+    if path.startswith("/entries"):
+        return "read" if method in READ_METHODS else "write"
+    return "default"
+
+
+def request_deadline(headers: Mapping[str, str], now: float) -> float:
+    """
+    Compute the monotonic time by which a request must have started.
+
+    The `X-Request-Deadline-Ms` header can shorten, but not extend, the
+    server's `ADMISSION_DEADLINE_MS`.
+    """
+    budget = settings.ADMISSION_DEADLINE_MS
+    requested = headers.get("x-request-deadline-ms")
+    if requested:
+        try:
+            budget = min(budget, max(float(requested), 0.0))
+        except ValueError:
+            pass
+    return now + budget / 1000
+
+
+def retry_after_seconds(shed: Shed) -> int:
+    """
+    Whole seconds a shed client should wait before retrying (at least 1).
+    """
+    return max(1, math.ceil(shed.retry_after))
+
+
+def stats() -> dict[str, Any]:
+    """
+    Report the state and counters of every limiter.
+    """
+    return {name: limiter.stats() for name, limiter in limiters.items()}
+
+
+def _admission_metrics() -> list[str]:
+    lines = metrics.gauge_lines(
+        "moodmap_admission_in_flight",
+        "Requests holding an admission slot, by route class.",
+        {(name,): limiter.in_flight for name, limiter in limiters.items()},
+        ("class",),
+    )
+    lines += metrics.gauge_lines(
+        "moodmap_admission_queued",
+        "Requests waiting for an admission slot, by route class.",
+        {(name,): limiter.queued for name, limiter in limiters.items()},
+        ("class",),
+    )
+    return lines
+
+
+metrics.registry.add_collector(_admission_metrics)
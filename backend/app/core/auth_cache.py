@@ -0,0 +1,113 @@
+"""
+In-process cache of authenticated principals for MoodMap.
+
+Every authenticated request resolves the JWT `sub` claim to a user. This
+module keeps a small, bounded TTL + LRU cache of those lookups so that
+repeated requests with the same token skip the database round trip.
+
+The cache is per process: writes that change or remove a user must call
+`invalidate` (the CRUD layer does this), and the TTL bounds how long other
+worker processes may keep serving a stale principal.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from app.core.config import settings
+from app.models import UserPublic
+
+
+class PrincipalCache:
+    """
+    Thread-safe TTL + LRU cache mapping user IDs to `UserPublic` principals.
+
+    Entries expire after `ttl` seconds or when the token they were cached
+    for expires, whichever comes first. When the cache is full the least
+    recently used entry is evicted.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[uuid.UUID, tuple[float, UserPublic]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0 and self.ttl > 0
+
+    def get(self, user_id: uuid.UUID) -> UserPublic | None:
+        """
+        Return the cached principal for `user_id`, or `None` on a miss.
+        """
+        with self._lock:
+            cached = self._entries.get(user_id)
+            if cached is None or cached[0] <= time.monotonic():
+                if cached is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return cached[1]
+
+    def set(
+        self, principal: UserPublic, token_expires_at: float | None = None
+    ) -> None:
+        """
+        Cache `principal`, never beyond the expiry of the token it came from.
+
+        Args:
+            principal: The principal to cache.
+            token_expires_at: The token's `exp` claim as a Unix timestamp.
+        """
+        if not self.enabled:
+            return
+        lifetime = self.ttl
+        if token_expires_at is not None:
+            lifetime = min(lifetime, token_expires_at - time.time())
+        if lifetime <= 0:
+            return
+        with self._lock:
+            self._entries[principal.id] = (time.monotonic() + lifetime, principal)
+            self._entries.move_to_end(principal.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: uuid.UUID) -> None:
+        """
+        Drop any cached principal for `user_id`.
+        """
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        """
+        Drop every cached principal and reset the counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict[str, int]:
+        """
+        Return hit/miss counters and the current cache size.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+            }
+
+
+# Global principal cache shared by the auth dependency and the CRUD layer
+principal_cache = PrincipalCache(
+    max_size=settings.AUTH_CACHE_MAX_SIZE, ttl=settings.AUTH_CACHE_TTL_SECONDS
+)
@@ -6,16 +6,25 @@ from environment variables (via pydantic-settings), including:
 
 - JWT configuration (secret and algorithm)
 - Access token expiry duration
-- Database connection URL
+- Database connection URL and engine profile / pool tuning
+- Read replica connection URLs and read routing
+- Entry shard connection URLs
 - Frontend host URL
 - Backend CORS origins and a derived list of allowed CORS origins
+- Sizing of the in-process authenticated principal cache
+- Sizing of the bcrypt password hashing pool
+- Server-Timing headers and the sampling request profiler
+- Admission control limits for each route class
+- Group commit of entry creation
+- Live entry event streams (Server-Sent Events)
+- Sizing of the per-user mood insights cache
 
 An instance of `Settings` is created at the bottom of the file and
 is intended to be imported wherever configuration values are needed.
 """
 
 from pydantic_settings import BaseSettings
-from typing import Any, Annotated
+from typing import Any, Annotated, Literal
 
 from pydantic import AnyUrl, BeforeValidator, computed_field
 
@@ -56,14 +65,109 @@ class Settings(BaseSettings):
         JWT_ALGORITHM: Algorithm used for JWT signing (e.g., "HS256").
         ACCESS_TOKEN_EXPIRY: Access token lifetime in minutes.
         DATABASE_URL: Database connection string for SQLModel.
+        DATABASE_ASYNC: Serve the entries routes through an async engine and
+            `AsyncSession` instead of sync sessions on the threadpool.
+        DATABASE_AUTO_MIGRATE: Apply pending schema migrations on startup
+            instead of refusing to start (see `app.migrations`).
+        ASYNC_DATABASE_URL: Connection string for the async engine; derived from
+            DATABASE_URL (aiosqlite / asyncpg drivers) when not set.
+        DATABASE_REPLICA_URLS: Connection strings of read replicas (list or
+            comma-separated); read-only routes are spread across them.
+        ASYNC_DATABASE_REPLICA_URLS: Async connection strings of the replicas;
+            derived from DATABASE_REPLICA_URLS when not set.
+        REPLICA_STICKY_SECONDS: How long after committing a write a user's
+            reads stay on the primary (read-your-writes).
+        REPLICA_RETRY_SECONDS: How long a replica that failed to connect is
+            left out of rotation.
+        DATABASE_SHARD_URLS: Connection strings of additional entry shards
+            (list or comma-separated); DATABASE_URL is shard 0 and holds the
+            user directory.
+        ASYNC_DATABASE_SHARD_URLS: Async connection strings of the shards;
+            derived from DATABASE_SHARD_URLS when not set.
+        SHARD_CACHE_TTL_SECONDS: How long a user's shard is cached per process.
+        DATABASE_PROFILE: Engine profile: `dev` (echo SQL), `prod` (sized pool,
+            pre-ping, recycling) or `sqlite` (single-node SQLite with WAL).
+        DB_POOL_SIZE: Persistent connections per engine (prod / sqlite profiles).
+        DB_MAX_OVERFLOW: Extra connections allowed above DB_POOL_SIZE under load.
+        DB_POOL_TIMEOUT: Seconds to wait for a free connection before failing.
+        DB_POOL_RECYCLE: Seconds after which pooled connections are replaced.
+        SQLITE_BUSY_TIMEOUT_MS: How long SQLite writers wait for a lock (sqlite profile).
         FRONTEND_HOST: Base URL of the frontend application.
         BACKEND_CORS_ORIGINS: Raw CORS origins configuration, parsed via `parse_cors`.
+        AUTH_CACHE_TTL_SECONDS: How long a resolved principal is cached per process
+            (0 disables the cache).
+        AUTH_CACHE_MAX_SIZE: Maximum number of cached principals per process.
+        PASSWORD_HASH_WORKERS: Number of bcrypt worker processes per server process
+            (0 hashes inline on the request thread).
+        PASSWORD_HASH_QUEUE_SIZE: How many password operations may wait for a
+            worker before new ones are rejected.
+        IMPORT_BATCH_SIZE: Entries inserted per transaction by bulk imports.
+        IMPORT_MAX_ERRORS: Maximum number of row errors listed in an import report.
+        EXPORT_BATCH_SIZE: Entries fetched and written per chunk by exports.
+        GROUP_COMMIT_ENABLED: Commit entries created via `POST /entries` in
+            batches from a background writer (see `app.group_commit`).
+        GROUP_COMMIT_MAX_DELAY_MS: How long the writer waits for more entries
+            after the first one of a batch.
+        GROUP_COMMIT_MAX_ROWS: Maximum number of entries per batch.
+        GROUP_COMMIT_QUEUE_SIZE: Entries a writer may hold waiting for a
+            batch; further creations get a 503.
+        GROUP_COMMIT_TIMEOUT_SECONDS: How long a request waits for its entry
+            to be committed before giving up with a 503.
+        ENTRY_STREAM_HEARTBEAT_SECONDS: Interval of keep-alive comments on idle
+            `/entries/stream` connections.
+        ENTRY_STREAM_QUEUE_SIZE: Events buffered per stream connection before a
+            slow client is disconnected.
+        ENTRY_STREAM_REPLAY_SIZE: Recent events kept per user so reconnecting
+            clients can resume from `Last-Event-ID`.
+        ENTRY_STREAM_MAX_SUBSCRIBERS: Maximum number of open stream connections
+            per process.
+        INSIGHTS_CACHE_MAX_SIZE: Maximum number of cached `/entries/insights`
+            results per process (0 disables the cache).
+        SEARCH_TEXT_CONFIG: Postgres text search configuration (language) used
+            for the full-text index.
+        SERVER_TIMING_ENABLED: Add a `Server-Timing` header (db / auth /
+            serialize / total) to every response.
+        PROFILING_ENABLED: Turn on the sampling request profiler.
+        PROFILE_SAMPLE_RATE: Fraction of requests to profile (0 to 1).
+        PROFILE_SLOW_REQUEST_MS: Also keep the profile of any request slower
+            than this; every request is profiled when set.
+        PROFILE_INTERVAL_MS: Stack sampling interval of the profiler.
+        PROFILE_BUFFER_SIZE: Number of recent profiles kept in memory.
+        PROFILES_TOKEN: Secret required (as `X-Profiles-Token`) to read
+            the operational `/utils` endpoints (profiles, metrics, pool,
+            cache and admission stats); they are disabled when not set.
+        ADMISSION_CONTROL_ENABLED: Limit concurrent requests per route class
+            and shed load with 503s when limits and deadlines can't be met.
+        ADMISSION_READ_CONCURRENCY: Concurrent entry reads per process.
+        ADMISSION_WRITE_CONCURRENCY: Concurrent entry writes per process.
+        ADMISSION_AUTH_CONCURRENCY: Concurrent login / registration requests.
+        ADMISSION_BULK_CONCURRENCY: Concurrent imports and exports.
+        ADMISSION_DEFAULT_CONCURRENCY: Concurrent requests to other routes.
+        ADMISSION_QUEUE_SIZE: Requests allowed to wait per route class.
+        ADMISSION_DEADLINE_MS: How long a request may wait for a slot before
+            it is shed.
     """
 
     JWT_SECRET: str
     JWT_ALGORITHM: str
     ACCESS_TOKEN_EXPIRY: int
     DATABASE_URL: str
+    DATABASE_ASYNC: bool = False
+    DATABASE_AUTO_MIGRATE: bool = False
+    ASYNC_DATABASE_URL: str | None = None
+    DATABASE_REPLICA_URLS: Annotated[list[str] | str, BeforeValidator(parse_cors)] = []
+    ASYNC_DATABASE_REPLICA_URLS: Annotated[list[str] | str, BeforeValidator(parse_cors)] = []
+    REPLICA_STICKY_SECONDS: float = 5
+    REPLICA_RETRY_SECONDS: float = 30
+    DATABASE_SHARD_URLS: Annotated[list[str] | str, BeforeValidator(parse_cors)] = []
+    ASYNC_DATABASE_SHARD_URLS: Annotated[list[str] | str, BeforeValidator(parse_cors)] = []
+    SHARD_CACHE_TTL_SECONDS: float = 300
+    DATABASE_PROFILE: Literal["dev", "prod", "sqlite"] = "dev"
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
     FRONTEND_HOST: str = "http://localhost:3000"
 
     # Accept either a list of URLs or a comma-separated string from the environment.
@@ -71,6 +175,48 @@ class Settings(BaseSettings):
         list[AnyUrl] | str, BeforeValidator(parse_cors)
     ]
 
+    AUTH_CACHE_TTL_SECONDS: float = 60
+    AUTH_CACHE_MAX_SIZE: int = 10_000
+
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_QUEUE_SIZE: int = 8
+
+    IMPORT_BATCH_SIZE: int = 500
+    IMPORT_MAX_ERRORS: int = 1000
+    EXPORT_BATCH_SIZE: int = 1000
+
+    GROUP_COMMIT_ENABLED: bool = False
+    GROUP_COMMIT_MAX_DELAY_MS: float = 2
+    GROUP_COMMIT_MAX_ROWS: int = 200
+    GROUP_COMMIT_QUEUE_SIZE: int = 10000
+    GROUP_COMMIT_TIMEOUT_SECONDS: float = 30
+
+    ENTRY_STREAM_HEARTBEAT_SECONDS: float = 15
+    ENTRY_STREAM_QUEUE_SIZE: int = 64
+    ENTRY_STREAM_REPLAY_SIZE: int = 100
+    ENTRY_STREAM_MAX_SUBSCRIBERS: int = 10_000
+
+    INSIGHTS_CACHE_MAX_SIZE: int = 1000
+
+    SEARCH_TEXT_CONFIG: str = "english"
+
+    SERVER_TIMING_ENABLED: bool = True
+    PROFILING_ENABLED: bool = False
+    PROFILE_SAMPLE_RATE: float = 0.0
+    PROFILE_SLOW_REQUEST_MS: float | None = None
+    PROFILE_INTERVAL_MS: float = 5
+    PROFILE_BUFFER_SIZE: int = 50
+    PROFILES_TOKEN: str | None = None
+
+    ADMISSION_CONTROL_ENABLED: bool = True
+    ADMISSION_READ_CONCURRENCY: int = 16
+    ADMISSION_WRITE_CONCURRENCY: int = 8
+    ADMISSION_AUTH_CONCURRENCY: int = 8
+    ADMISSION_BULK_CONCURRENCY: int = 2
+    ADMISSION_DEFAULT_CONCURRENCY: int = 8
+    ADMISSION_QUEUE_SIZE: int = 64
+    ADMISSION_DEADLINE_MS: float = 2000
+
     @computed_field
     @property
     def all_cors_origins(self) -> list[str]:
@@ -2,20 +2,435 @@
 Database setup and initialization for MoodMap.
 
 This module is responsible for:
-- Creating the SQLModel engine from the configured DATABASE_URL
+- Creating the SQLModel engine from the configured DATABASE_URL, tuned by
+  the DATABASE_PROFILE setting (dev / prod / sqlite single node)
+- Creating an async engine when DATABASE_ASYNC is enabled
+- Routing read-only sessions to read replicas (DATABASE_REPLICA_URLS)
+- Tracking connection pool checkout wait times and reporting pool status
+- Recording query counts and durations for the metrics endpoint
 - Providing a Session generator suitable for dependency injection
-- Initializing database tables on application startup
+- Checking the database schema version on application startup
 """
 
-from sqlmodel import SQLModel, create_engine, Session
+import itertools
+import threading
+import time
+import uuid
+from typing import Any, Generic, TypeVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import QueuePool
+from sqlmodel import create_engine, Session
+from app.core import metrics, profiling
 from app.core.config import settings
 
 # Connection string loaded from application settings
 DATABASE_URL = settings.DATABASE_URL
 
+# Async drivers used when deriving the async URL from DATABASE_URL
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "postgresql+psycopg": "postgresql+psycopg_async",
+}
+
+
+class PoolWaitStats:
+    """
+    Thread-safe accumulator for connection pool checkout wait times.
+    """
+
+    def __init__(self):
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, wait: float) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def snapshot(self) -> dict[str, float]:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "wait_total_ms": self.total_wait * 1000,
+                "wait_avg_ms": self.total_wait * 1000 / self.checkouts
+                if self.checkouts
+                else 0.0,
+                "wait_max_ms": self.max_wait * 1000,
+            }
+
+
+# Checkout wait times across the sync engines' pools
+pool_wait_stats = PoolWaitStats()
+
+
+class TimedQueuePool(QueuePool):
+    """
+    QueuePool that records how long each checkout waited for a connection.
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_wait_stats.record(time.perf_counter() - start)
+
+
+def _is_sqlite_memory(url: str) -> bool:
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:")
+
+
+def engine_options(profile: str, url: str) -> dict[str, Any]:
+    """
+    Build `create_engine` keyword arguments for an engine profile.
+
+    Profiles:
+    - `dev`: echo every SQL statement, default pool sizing
+    - `prod`: no echo, sized pool with pre-ping and connection recycling
+    - `sqlite`: no echo, a single-node SQLite file tuned with WAL pragmas
+      (see `set_sqlite_pragmas`)
+
+    Args:
+        profile: Name of the engine profile.
+        url: Database connection string the engine is created for.
+
+    Returns:
+        Keyword arguments for `create_engine` / `create_async_engine`.
+    """
+    options: dict[str, Any] = {"echo": profile == "dev"}
+    if profile == "prod":
+        options.update(
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            pool_pre_ping=True,
+        )
+    elif profile == "sqlite" and not _is_sqlite_memory(url):
+        # Connections are handed between threadpool threads by the pool
+        options.update(
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            connect_args={"check_same_thread": False},
+        )
+    return options
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """
+    Tune a new SQLite connection for a single-node deployment.
+
+    WAL lets readers proceed while a write is in progress,
+    `synchronous=NORMAL` only fsyncs at WAL checkpoints, and `busy_timeout`
+    makes writers wait for the lock instead of failing immediately.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.close()
+
+
+_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE"}
+
+
+def _operation(statement: str) -> str:
+    keyword = statement.lstrip().split(None, 1)[:1]
+    operation = keyword[0].upper() if keyword else ""
+    return operation if operation in _OPERATIONS else "OTHER"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    profiling.add_timing("db", elapsed)
+    labels = (_operation(statement),)
+    metrics.db_queries_total.inc(labels)
+    metrics.db_query_duration_seconds.observe(elapsed, labels)
+
+
+def _handle_error(exception_context) -> None:
+    connection = exception_context.connection
+    starts = connection.info.get("query_start") if connection is not None else None
+    if starts:
+        starts.pop()
+    metrics.db_query_errors_total.inc((_operation(exception_context.statement or ""),))
+
+
+def instrument_queries(target: Engine) -> None:
+    """
+    Record every statement's type and execution time in `app.core.metrics`.
+    """
+    event.listen(target, "before_cursor_execute", _before_cursor_execute)
+    event.listen(target, "after_cursor_execute", _after_cursor_execute)
+    event.listen(target, "handle_error", _handle_error)
+
+
+def build_engine(url: str) -> Engine:
+    """
+    Create a sync engine for `url` using the configured DATABASE_PROFILE.
+    """
+    options = engine_options(settings.DATABASE_PROFILE, url)
+    if not _is_sqlite_memory(url):
+        options["poolclass"] = TimedQueuePool
+    new_engine = create_engine(url, **options)
+    if settings.DATABASE_PROFILE == "sqlite":
+        event.listen(new_engine, "connect", set_sqlite_pragmas)
+    instrument_queries(new_engine)
+    return new_engine
+
+
+def build_async_engine(url: str) -> AsyncEngine:
+    """
+    Create an async engine for `url` using the configured DATABASE_PROFILE.
+    """
+    options = engine_options(settings.DATABASE_PROFILE, url)
+    options.pop("connect_args", None)
+    new_engine = create_async_engine(url, **options)
+    if settings.DATABASE_PROFILE == "sqlite":
+        event.listen(new_engine.sync_engine, "connect", set_sqlite_pragmas)
+    instrument_queries(new_engine.sync_engine)
+    return new_engine
+
+
 # Global SQLModel engine used throughout the application
-# echo=True logs SQL statements to the console (useful during development)
-engine = create_engine(DATABASE_URL, echo=True)
+# The dev profile logs SQL statements to the console; prod and sqlite don't
+engine = build_engine(DATABASE_URL)
+
+
+def to_async_url(url: str) -> str:
+    """
+    Swap the driver in a sync connection string for its async counterpart
+    (e.g. `sqlite://` becomes `sqlite+aiosqlite://`).
+    """
+    scheme, sep, rest = url.partition("://")
+    return ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+
+def get_async_database_url() -> str:
+    """
+    Return the connection string for the async engine.
+
+    Uses ASYNC_DATABASE_URL when set, otherwise derives it from DATABASE_URL
+    with `to_async_url`.
+    """
+    if settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
+    return to_async_url(DATABASE_URL)
+
+
+# Global async engine, only created when the async mode is enabled
+async_engine: AsyncEngine | None = (
+    build_async_engine(get_async_database_url()) if settings.DATABASE_ASYNC else None
+)
+
+
+EngineT = TypeVar("EngineT", Engine, AsyncEngine)
+
+
+class ReplicaSet(Generic[EngineT]):
+    """
+    A primary engine plus read replicas, picking the engine for each read.
+
+    Reads go to the replicas round-robin, skipping any replica that failed
+    to connect in the last `retry_seconds`. A user who committed a write
+    in the last `sticky_seconds` reads from the primary instead, so they
+    see their own writes despite replication lag. Falls back to the
+    primary when there are no healthy replicas.
+
+    Write times are tracked per process: with several server workers, a
+    read served by another worker is not sticky.
+    """
+
+    def __init__(
+        self,
+        primary: EngineT,
+        replicas: list[EngineT],
+        sticky_seconds: float,
+        retry_seconds: float,
+    ):
+        self.primary = primary
+        self.replicas = replicas
+        self.sticky_seconds = sticky_seconds
+        self.retry_seconds = retry_seconds
+        self._next = itertools.count()
+        self._down_until = [0.0] * len(replicas)
+        # user_id -> monotonic time until which their reads stay on the primary
+        self._recent_writes: dict[uuid.UUID, float] = {}
+        for index, replica in enumerate(replicas):
+            sync_engine = replica.sync_engine if isinstance(replica, AsyncEngine) else replica
+            event.listen(sync_engine, "handle_error", self._error_listener(index))
+
+    def _error_listener(self, index: int):
+        def on_error(exception_context) -> None:
+            # Connect failures have no connection yet; drops are disconnects
+            if exception_context.connection is None or exception_context.is_disconnect:
+                self.mark_down(index)
+
+        return on_error
+
+    def mark_down(self, index: int) -> None:
+        """
+        Take a replica out of rotation for `retry_seconds`.
+        """
+        self._down_until[index] = time.monotonic() + self.retry_seconds
+
+    def note_write(self, user_id: uuid.UUID) -> None:
+        """
+        Send the user's reads to the primary for the next `sticky_seconds`.
+        """
+        if not self.replicas:
+            return
+        now = time.monotonic()
+        if len(self._recent_writes) > 10_000:
+            for key, until in list(self._recent_writes.items()):
+                if until <= now:
+                    self._recent_writes.pop(key, None)
+        self._recent_writes[user_id] = now + self.sticky_seconds
+
+    def read_engine(self, user_id: uuid.UUID | None = None) -> EngineT:
+        """
+        Pick the engine to serve a read for `user_id`.
+        """
+        if not self.replicas:
+            return self.primary
+        now = time.monotonic()
+        if user_id is not None and self._recent_writes.get(user_id, 0.0) > now:
+            metrics.db_read_sessions_total.inc(("primary",))
+            return self.primary
+        for _ in range(len(self.replicas)):
+            index = next(self._next) % len(self.replicas)
+            if self._down_until[index] <= now:
+                metrics.db_read_sessions_total.inc((f"replica-{index}",))
+                return self.replicas[index]
+        metrics.db_read_sessions_total.inc(("primary",))
+        return self.primary
+
+    def status(self) -> list[dict[str, Any]]:
+        """
+        Report each replica's health and pool state.
+        """
+        now = time.monotonic()
+        return [
+            {
+                "replica": index,
+                "healthy": self._down_until[index] <= now,
+                **pool_status(
+                    replica.sync_engine if isinstance(replica, AsyncEngine) else replica
+                ),
+            }
+            for index, replica in enumerate(self.replicas)
+        ]
+
+
+# Read routing for the sync engine
+replicas: ReplicaSet[Engine] = ReplicaSet(
+    engine,
+    [build_engine(url) for url in settings.DATABASE_REPLICA_URLS],
+    sticky_seconds=settings.REPLICA_STICKY_SECONDS,
+    retry_seconds=settings.REPLICA_RETRY_SECONDS,
+)
+
+# Read routing for the async engine, only created when the async mode is enabled
+async_replicas: ReplicaSet[AsyncEngine] | None = (
+    ReplicaSet(
+        async_engine,
+        [
+            build_async_engine(url)
+            for url in settings.ASYNC_DATABASE_REPLICA_URLS
+            or [to_async_url(url) for url in settings.DATABASE_REPLICA_URLS]
+        ],
+        sticky_seconds=settings.REPLICA_STICKY_SECONDS,
+        retry_seconds=settings.REPLICA_RETRY_SECONDS,
+    )
+    if async_engine is not None
+    else None
+)
+
+
+def note_write(user_id: uuid.UUID) -> None:
+    """
+    Keep a user's reads on the primary for a while after they wrote.
+    """
+    replicas.note_write(user_id)
+    if async_replicas is not None:
+        async_replicas.note_write(user_id)
+
+
+def pool_status(target: Engine) -> dict[str, Any]:
+    """
+    Report the live state of an engine's connection pool.
+
+    Args:
+        target: The engine whose pool to inspect.
+
+    Returns:
+        Pool class, configured size, checked-out, idle and overflow
+        connection counts (where the pool type tracks them). Overflow is
+        the number of connections open beyond `size`, so never negative.
+    """
+    pool = target.pool
+    status: dict[str, Any] = {"pool": type(pool).__name__}
+    for key, method in (
+        ("size", "size"),
+        ("checked_out", "checkedout"),
+        ("idle", "checkedin"),
+        ("overflow", "overflow"),
+    ):
+        if hasattr(pool, method):
+            status[key] = getattr(pool, method)()
+    if "overflow" in status:
+        # QueuePool counts overflow from -size while the pool is filling
+        status["overflow"] = max(0, status["overflow"])
+    return status
+
+
+def _pool_metrics() -> list[str]:
+    # Imported here: the shard router is built from this module's engines
+    from app.core.sharding import shards
+
+    engines = shards.pools()
+    lines = []
+    for key, help in (
+        ("checked_out", "Connections currently checked out of the pool."),
+        ("idle", "Idle connections held by the pool."),
+        ("overflow", "Connections opened beyond the pool size."),
+    ):
+        samples = {
+            labels: status[key]
+            for labels, target in engines.items()
+            if key in (status := pool_status(target))
+        }
+        if samples:
+            lines += metrics.gauge_lines(
+                f"moodmap_db_pool_{key}", help, samples, ("engine", "shard")
+            )
+    waits = pool_wait_stats.snapshot()
+    lines += [
+        "# HELP moodmap_db_pool_checkouts_total Connection checkouts from the sync pools.",
+        "# TYPE moodmap_db_pool_checkouts_total counter",
+        f"moodmap_db_pool_checkouts_total {waits['checkouts']}",
+        "# HELP moodmap_db_pool_wait_seconds_total Time spent waiting for a pooled connection.",
+        "# TYPE moodmap_db_pool_wait_seconds_total counter",
+        f"moodmap_db_pool_wait_seconds_total {waits['wait_total_ms'] / 1000}",
+    ]
+    return lines
+
+
+metrics.registry.add_collector(_pool_metrics)
 
 
 def get_session():
@@ -34,11 +449,15 @@ def get_session():
 
 def init_db():
     """
-    Initialize the database schema.
+    Check the database schema on application startup.
 
-    Imports the models to ensure they are registered with SQLModel's metadata,
-    then creates all tables defined on the metadata if they do not already exist.
+    Only reads the schema version, so workers start quickly; migrations are
+    applied separately with `python -m app.migrations upgrade`, or here
+    when DATABASE_AUTO_MIGRATE is set (see `app.migrations.check_schema`).
+    Every shard database is checked.
     """
-    from app.models import User, Entry  # Import models so their tables are registered
+    from app.core.sharding import shards
+    from app.migrations import check_schema
 
-    SQLModel.metadata.create_all(engine)
+    for shard_engine in shards.engines:
+        check_schema(shard_engine)
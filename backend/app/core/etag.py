@@ -0,0 +1,72 @@
+"""
+Entity tags for conditional GET requests.
+
+ETags are derived from cheap version information (a user's entry
+watermark, or a single entry's `updated_at`) together with the request
+parameters that shape the response, never from the response body. That
+lets a route answer `If-None-Match` with `304 Not Modified` before it
+loads or serialises any entries.
+"""
+
+import hashlib
+from typing import Any
+
+from fastapi import Response
+
+# Responses are per user, so shared caches must not store them and clients
+# must revalidate before reusing a cached copy
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    Build a strong, quoted ETag from the given version parts.
+
+    Args:
+        parts: Values identifying the representation, e.g. a user ID, a
+            watermark and the query parameters. Order matters.
+
+    Returns:
+        The ETag header value, e.g. `"3f1c..."`.
+    """
+    key = "\x1f".join("" if part is None else str(part) for part in parts)
+    return '"' + hashlib.blake2b(key.encode(), digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Check an `If-None-Match` header against the current ETag.
+
+    Uses the weak comparison RFC 9110 prescribes for `If-None-Match`, so a
+    `W/` prefix on either side is ignored; `*` matches any current ETag.
+
+    Args:
+        if_none_match: Raw header value, if the client sent one.
+        etag: The representation's current ETag.
+
+    Returns:
+        True if the client's cached copy is still current.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
+
+
+def etag_headers(etag: str) -> dict[str, str]:
+    """
+    Build the ETag and revalidation headers for a response.
+    """
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+
+def not_modified(etag: str) -> Response:
+    """
+    Build an empty `304 Not Modified` response carrying the current ETag.
+    """
+    return Response(status_code=304, headers=etag_headers(etag))
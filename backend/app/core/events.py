@@ -0,0 +1,302 @@
+"""
+In-process pub/sub of entry changes for the `/entries/stream` SSE endpoint.
+
+The `crud` write functions publish a `created`, `updated`, `deleted` or
+`imported` event after committing. `entry_events` fans each one out to the
+open streams of the entry's owner.
+
+Each user with a stream has a channel holding the last
+`ENTRY_STREAM_REPLAY_SIZE` events. Event IDs are `<channel epoch>-<seq>`,
+so a client reconnecting with `Last-Event-ID` gets the events it missed
+replayed. If they are no longer buffered, or the ID is from another
+channel or process, it gets a single `reset` event and should refetch.
+
+Idle streams are cheap: writes for users without a channel cost one dict
+lookup, and an idle connection is a coroutine waiting on an
+`asyncio.Event` that wakes once per heartbeat. Each connection buffers at
+most `ENTRY_STREAM_QUEUE_SIZE` undelivered events. A client that falls
+further behind is disconnected and resumes from the replay buffer when
+it reconnects, so it never holds an unbounded queue.
+
+Events are per process. With several server workers, a stream only sees
+writes handled by its own worker.
+"""
+
+import asyncio
+import collections
+import itertools
+import os
+import threading
+import uuid
+from collections.abc import AsyncIterator
+from typing import Any
+
+from pydantic_core import to_json
+
+from app.core import metrics
+from app.core.config import settings
+
+# Reconnect delay suggested to EventSource clients, in milliseconds
+RETRY_MS = 3000
+
+# Distinguishes event IDs issued by different processes
+_PROCESS = f"{os.getpid():x}{os.urandom(3).hex()}"
+
+
+class EntryEvent:
+    """
+    A single event, pre-encoded in the SSE wire format.
+    """
+
+    __slots__ = ("seq", "encoded")
+
+    def __init__(self, channel: "_Channel", seq: int, type: str, data: bytes):
+        self.seq = seq
+        self.encoded = (
+            f"id: {channel.epoch}-{seq}\nevent: {type}\ndata: ".encode() + data + b"\n\n"
+        )
+
+
+class SubscriberDropped(Exception):
+    """
+    Raised to a subscription that fell too far behind its events.
+    """
+
+
+class TooManySubscribers(Exception):
+    """
+    Raised when `ENTRY_STREAM_MAX_SUBSCRIBERS` streams are already open.
+    """
+
+
+class _Channel:
+    """
+    One user's replay buffer and open subscriptions. Guarded by the hub's lock.
+    """
+
+    def __init__(self, epoch: str, replay_size: int):
+        self.epoch = epoch
+        self.seq = 0
+        self.events: collections.deque[EntryEvent] = collections.deque(maxlen=replay_size)
+        self.subscribers: set[Subscription] = set()
+
+
+class Subscription:
+    """
+    One open stream's bounded queue of events, consumed on its event loop.
+    """
+
+    def __init__(self, channel: _Channel, loop: asyncio.AbstractEventLoop, queue_size: int):
+        self.channel = channel
+        self.loop = loop
+        self.queue_size = queue_size
+        self.dropped = False
+        self._events: collections.deque[EntryEvent] = collections.deque()
+        self._ready = asyncio.Event()
+
+    def deliver(self, event: EntryEvent) -> None:
+        """
+        Queue an event; must run on the subscription's event loop.
+        """
+        if self.dropped:
+            return
+        if len(self._events) >= self.queue_size:
+            self.dropped = True
+            self._events.clear()
+            metrics.entry_stream_dropped_total.inc()
+        else:
+            self._events.append(event)
+        self._ready.set()
+
+    async def get(self, timeout: float) -> EntryEvent | None:
+        """
+        Wait for the next event.
+
+        Raises:
+            SubscriberDropped: If the queue overflowed.
+
+        Returns:
+            The next event, or `None` if none arrived within `timeout`.
+        """
+        if not self._events and not self.dropped:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        if self.dropped:
+            raise SubscriberDropped
+        return self._events.popleft()
+
+
+class EntryEventHub:
+    """
+    Per-user fan-out of entry events to open streams.
+
+    `publish` may be called from any thread; events are handed to each
+    subscription on its own event loop.
+    """
+
+    def __init__(self, queue_size: int, replay_size: int, max_subscribers: int):
+        self.queue_size = queue_size
+        self.replay_size = replay_size
+        self.max_subscribers = max_subscribers
+        # Channels in least recently subscribed order; at most
+        # `max_subscribers` are kept once their streams have closed
+        self._channels: collections.OrderedDict[uuid.UUID, _Channel] = (
+            collections.OrderedDict()
+        )
+        self._epochs = itertools.count(1)
+        self._subscribers = 0
+        self._lock = threading.Lock()
+
+    @property
+    def subscribers(self) -> int:
+        return self._subscribers
+
+    @property
+    def full(self) -> bool:
+        return self._subscribers >= self.max_subscribers
+
+    def publish(self, user_id: uuid.UUID, type: str, data: Any) -> None:
+        """
+        Publish an event to a user's streams.
+
+        Args:
+            user_id: ID of the user whose entries changed.
+            type: Event name, e.g. `created`.
+            data: JSON-serialisable payload (models, dicts, UUIDs, datetimes);
+                only serialised if the user has a channel.
+        """
+        # Unlocked fast path for the common case of nobody listening
+        if user_id not in self._channels:
+            return
+        payload = to_json(data)
+        with self._lock:
+            channel = self._channels.get(user_id)
+            if channel is None:
+                return
+            channel.seq += 1
+            event = EntryEvent(channel, channel.seq, type, payload)
+            channel.events.append(event)
+            subscribers = list(channel.subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # Event loop already closed (shutdown)
+                pass
+
+    def subscribe(
+        self, user_id: uuid.UUID, last_event_id: str | None
+    ) -> tuple[Subscription, list[bytes]]:
+        """
+        Open a subscription to a user's events.
+
+        Must be called on the event loop that will consume the subscription.
+
+        Args:
+            user_id: ID of the user whose events to receive.
+            last_event_id: The client's `Last-Event-ID`, if reconnecting.
+
+        Raises:
+            TooManySubscribers: If the per-process limit is reached.
+
+        Returns:
+            The subscription and the encoded events to send before any new
+            ones: the missed events when resuming, otherwise a single
+            `ready` (new stream) or `reset` (cannot resume) event.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self.full:
+                raise TooManySubscribers
+            channel = self._channels.get(user_id)
+            if channel is None:
+                channel = self._channels[user_id] = _Channel(
+                    f"{_PROCESS}.{next(self._epochs):x}", self.replay_size
+                )
+            self._channels.move_to_end(user_id)
+            subscription = Subscription(channel, loop, self.queue_size)
+            channel.subscribers.add(subscription)
+            self._subscribers += 1
+            opening = self._opening(channel, last_event_id)
+            self._evict()
+        return subscription, opening
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            if subscription in subscription.channel.subscribers:
+                subscription.channel.subscribers.discard(subscription)
+                self._subscribers -= 1
+
+    def _opening(self, channel: _Channel, last_event_id: str | None) -> list[bytes]:
+        if last_event_id is not None:
+            epoch, _, seq = last_event_id.rpartition("-")
+            if epoch == channel.epoch and seq.isdigit():
+                last_seq = int(seq)
+                oldest = channel.events[0].seq if channel.events else channel.seq + 1
+                if last_seq <= channel.seq and oldest <= last_seq + 1:
+                    return [event.encoded for event in channel.events if event.seq > last_seq]
+            kind = "reset"
+        else:
+            kind = "ready"
+        # Carries the current position, so the client resumes from here
+        return [
+            f"id: {channel.epoch}-{channel.seq}\nevent: {kind}\ndata: {{}}\n\n".encode()
+        ]
+
+    def _evict(self) -> None:
+        excess = len(self._channels) - self.max_subscribers
+        if excess <= 0:
+            return
+        idle = [key for key, channel in self._channels.items() if not channel.subscribers]
+        for key in idle[:excess]:
+            del self._channels[key]
+
+
+async def stream(user_id: uuid.UUID, last_event_id: str | None) -> AsyncIterator[bytes]:
+    """
+    Produce a user's SSE byte stream until the client goes away.
+
+    The subscription is opened on the first iteration and closed when the
+    generator is closed, so a response that never starts holds nothing.
+    Heartbeat comments are sent every `ENTRY_STREAM_HEARTBEAT_SECONDS`
+    while no events arrive. A subscriber that falls behind is disconnected
+    and resumes with `Last-Event-ID`.
+    """
+    try:
+        subscription, opening = entry_events.subscribe(user_id, last_event_id)
+    except TooManySubscribers:
+        # Lost a race for the last slot after the route's check; the client
+        # reconnects after `RETRY_MS`
+        yield f"retry: {RETRY_MS}\n\n".encode()
+        return
+    try:
+        yield f"retry: {RETRY_MS}\n\n".encode() + b"".join(opening)
+        while True:
+            event = await subscription.get(settings.ENTRY_STREAM_HEARTBEAT_SECONDS)
+            yield b": ping\n\n" if event is None else event.encoded
+    except SubscriberDropped:
+        return
+    finally:
+        entry_events.unsubscribe(subscription)
+
+
+# Global hub fed by the crud write functions
+entry_events = EntryEventHub(
+    queue_size=settings.ENTRY_STREAM_QUEUE_SIZE,
+    replay_size=settings.ENTRY_STREAM_REPLAY_SIZE,
+    max_subscribers=settings.ENTRY_STREAM_MAX_SUBSCRIBERS,
+)
+
+
+def _stream_metrics() -> list[str]:
+    return metrics.gauge_lines(
+        "moodmap_entry_stream_subscribers",
+        "Open /entries/stream connections.",
+        {(): entry_events.subscribers},
+    )
+
+
+metrics.registry.add_collector(_stream_metrics)
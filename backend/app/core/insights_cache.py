@@ -0,0 +1,93 @@
+"""
+In-process cache of computed mood insights for MoodMap.
+
+`GET /entries/insights` (see `app.insights`) stores its results here,
+keyed by the user and the request parameters. Each result is stamped with
+the watermark it was computed at and only served while the caller's
+watermark matches, so writes never have to invalidate it explicitly.
+Deleting or moving a user calls `invalidate` (the CRUD layer does this),
+so their results do not linger until evicted.
+"""
+
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any
+
+from app.core.config import settings
+from app.models import MoodInsightsPublic
+
+
+class InsightsCache:
+    """
+    Thread-safe LRU cache of insights, validated by a per-user watermark.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[tuple, tuple[Any, MoodInsightsPublic]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def get(self, key: tuple, watermark: Any) -> MoodInsightsPublic | None:
+        """
+        Return the cached insights for `key` if computed at `watermark`.
+        """
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is None or cached[0] != watermark:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return cached[1]
+
+    def set(self, key: tuple, watermark: Any, insights: MoodInsightsPublic) -> None:
+        """
+        Cache `insights` for `key`, valid while the watermark is unchanged.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (watermark, insights)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: uuid.UUID) -> None:
+        """
+        Drop every cached result for a user.
+        """
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == user_id]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        """
+        Drop every cached result and reset the counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict[str, int]:
+        """
+        Return hit/miss counters and the current cache size.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+            }
+
+
+# Global insights cache shared by the insights route and the CRUD layer
+insights_cache = InsightsCache(max_size=settings.INSIGHTS_CACHE_MAX_SIZE)
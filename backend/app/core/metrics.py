@@ -0,0 +1,328 @@
+"""
+In-process metrics for MoodMap, exposed in the Prometheus text format.
+
+Metrics are updated on every request and every database query, so the
+hot path avoids locks: each thread writes only to its own shard of a
+metric's values, and shards are summed when `/utils/metrics` is scraped.
+A lock is only taken the first time a thread touches a metric, to
+register its shard.
+
+Values are per process. With several server workers, each worker serves
+its own numbers; scrape them individually or run a single worker.
+"""
+
+import bisect
+import math
+import threading
+from collections.abc import Callable, Iterable, Sequence
+
+# Prometheus text exposition format served by `render`
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Default latency buckets in seconds
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+HASH_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0, 5.0)
+
+Labels = tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Iterable[str]) -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """
+    Base class holding per-thread shards of `labels -> list[float]` values.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: list[dict[Labels, list[float]]] = []
+        self._lock = threading.Lock()
+
+    def _width(self) -> int:
+        return 1
+
+    def _shard(self) -> dict[Labels, list[float]]:
+        try:
+            return self._local.values
+        except AttributeError:
+            values: dict[Labels, list[float]] = {}
+            with self._lock:
+                self._shards.append(values)
+            self._local.values = values
+            return values
+
+    def _slot(self, labels: Labels) -> list[float]:
+        shard = self._shard()
+        slot = shard.get(labels)
+        if slot is None:
+            slot = shard[labels] = [0.0] * self._width()
+        return slot
+
+    def collect(self) -> dict[Labels, list[float]]:
+        """
+        Sum all threads' shards into one `labels -> values` mapping.
+        """
+        with self._lock:
+            shards = list(self._shards)
+        totals: dict[Labels, list[float]] = {}
+        for shard in shards:
+            # dict.copy() is atomic, so a concurrent insert can't break iteration
+            for labels, values in shard.copy().items():
+                total = totals.get(labels)
+                if total is None:
+                    totals[labels] = list(values)
+                else:
+                    for i, value in enumerate(values):
+                        total[i] += value
+        return totals
+
+    def _samples(self) -> Iterable[str]:
+        for labels, values in sorted(self.collect().items()):
+            yield (
+                f"{self.name}{_format_labels(self.labelnames, labels)} "
+                f"{_format_value(values[0])}"
+            )
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """
+    Monotonically increasing count, optionally split by labels.
+    """
+
+    kind = "counter"
+
+    def inc(self, labels: Labels = (), amount: float = 1.0) -> None:
+        self._slot(labels)[0] += amount
+
+
+class Gauge(_Metric):
+    """
+    Value that can go up and down, e.g. requests in flight.
+    """
+
+    kind = "gauge"
+
+    def inc(self, labels: Labels = (), amount: float = 1.0) -> None:
+        self._slot(labels)[0] += amount
+
+    def dec(self, labels: Labels = (), amount: float = 1.0) -> None:
+        self._slot(labels)[0] -= amount
+
+
+class Histogram(_Metric):
+    """
+    Distribution of observed values over fixed, cumulative buckets.
+
+    Each slot holds one count per bucket (non-cumulative), then the
+    overflow count, the sum and the total count.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = HTTP_BUCKETS,
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _width(self) -> int:
+        return len(self.buckets) + 3
+
+    def observe(self, value: float, labels: Labels = ()) -> None:
+        slot = self._slot(labels)
+        slot[bisect.bisect_left(self.buckets, value)] += 1
+        slot[-2] += value
+        slot[-1] += 1
+
+    def _samples(self) -> Iterable[str]:
+        bounds = [*self.buckets, math.inf]
+        for labels, values in sorted(self.collect().items()):
+            cumulative = 0.0
+            for bound, count in zip(bounds, values):
+                cumulative += count
+                bucket_labels = _format_labels(
+                    (*self.labelnames, "le"), (*labels, _format_value(bound))
+                )
+                yield f"{self.name}_bucket{bucket_labels} {_format_value(cumulative)}"
+            label_text = _format_labels(self.labelnames, labels)
+            yield f"{self.name}_sum{label_text} {_format_value(values[-2])}"
+            yield f"{self.name}_count{label_text} {_format_value(values[-1])}"
+
+
+class Registry:
+    """
+    Set of metrics rendered together, plus callbacks for values that are
+    read at scrape time (e.g. connection pool state).
+    """
+
+    def __init__(self):
+        self._metrics: list[_Metric] = []
+        self._collectors: list[Callable[[], Iterable[str]]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[str]]) -> None:
+        """
+        Register a callback returning extra exposition lines at scrape time.
+        """
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format.
+        """
+        parts = [metric.render() for metric in self._metrics]
+        for collector in self._collectors:
+            parts.extend(collector())
+        return "\n".join(parts) + "\n"
+
+
+def gauge_lines(
+    name: str, help: str, samples: dict[Labels, float], labelnames: Sequence[str] = ()
+) -> list[str]:
+    """
+    Format a gauge whose values are computed at scrape time.
+    """
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} gauge"]
+    for labels, value in sorted(samples.items()):
+        lines.append(f"{name}{_format_labels(labelnames, labels)} {_format_value(value)}")
+    return lines
+
+
+# Global registry served by `/utils/metrics`
+registry = Registry()
+
+http_requests_total = registry.register(
+    Counter(
+        "moodmap_http_requests_total",
+        "HTTP requests handled, by method, route template and status code.",
+        ("method", "route", "status"),
+    )
+)
+http_request_duration_seconds = registry.register(
+    Histogram(
+        "moodmap_http_request_duration_seconds",
+        "HTTP request latency in seconds, by method and route template.",
+        ("method", "route"),
+        HTTP_BUCKETS,
+    )
+)
+http_requests_in_progress = registry.register(
+    Gauge(
+        "moodmap_http_requests_in_progress",
+        "HTTP requests currently being handled.",
+    )
+)
+db_queries_total = registry.register(
+    Counter(
+        "moodmap_db_queries_total",
+        "Database statements executed, by statement type.",
+        ("operation",),
+    )
+)
+db_query_errors_total = registry.register(
+    Counter(
+        "moodmap_db_query_errors_total",
+        "Database statements that raised an error, by statement type.",
+        ("operation",),
+    )
+)
+db_query_duration_seconds = registry.register(
+    Histogram(
+        "moodmap_db_query_duration_seconds",
+        "Database statement execution time in seconds, by statement type.",
+        ("operation",),
+        DB_BUCKETS,
+    )
+)
+db_read_sessions_total = registry.register(
+    Counter(
+        "moodmap_db_read_sessions_total",
+        "Read-only sessions opened while replicas are configured, by target engine.",
+        ("engine",),
+    )
+)
+group_commit_batch_rows = registry.register(
+    Histogram(
+        "moodmap_group_commit_batch_rows",
+        "Entries committed per group commit transaction.",
+        (),
+        (1, 2, 5, 10, 20, 50, 100, 200, 500),
+    )
+)
+group_commit_seconds = registry.register(
+    Histogram(
+        "moodmap_group_commit_seconds",
+        "Time to insert and commit one group commit batch.",
+        (),
+        DB_BUCKETS,
+    )
+)
+entry_stream_dropped_total = registry.register(
+    Counter(
+        "moodmap_entry_stream_dropped_total",
+        "Entry stream connections closed because the client fell behind.",
+    )
+)
+password_hash_duration_seconds = registry.register(
+    Histogram(
+        "moodmap_password_hash_duration_seconds",
+        "bcrypt hash/verify wall time in seconds, including pool queueing.",
+        ("operation",),
+        HASH_BUCKETS,
+    )
+)
+password_hash_rejected_total = registry.register(
+    Counter(
+        "moodmap_password_hash_rejected_total",
+        "Password operations rejected because the hashing pool was full.",
+        ("operation",),
+    )
+)
+admission_shed_total = registry.register(
+    Counter(
+        "moodmap_admission_shed_total",
+        "Requests rejected by admission control, by route class and reason.",
+        ("class", "reason"),
+    )
+)
+admission_queue_seconds = registry.register(
+    Histogram(
+        "moodmap_admission_queue_seconds",
+        "Time admitted requests waited for a slot, by route class.",
+        ("class",),
+        DB_BUCKETS,
+    )
+)
@@ -0,0 +1,292 @@
+"""
+Per-request timing breakdowns and an opt-in sampling profiler.
+
+Timings: every request gets a `RequestTimings` (via a context variable
+that is inherited by threadpool workers) into which the DB layer, the
+auth dependency and response serialisation add their elapsed time. The
+middleware reports them in a `Server-Timing` header.
+
+Profiling: when `PROFILING_ENABLED` is set, a fraction of requests
+(`PROFILE_SAMPLE_RATE`) is profiled, and with `PROFILE_SLOW_REQUEST_MS`
+every request is profiled but only kept if it turns out to be slow. A
+single background thread samples the Python stack of each thread that is
+running a profiled endpoint every `PROFILE_INTERVAL_MS`, so the cost is
+a periodic stack walk rather than a hook on every function call. The
+most recent `PROFILE_BUFFER_SIZE` profiles are kept in a ring buffer in
+collapsed-stack format (`frame;frame;frame count`), which flamegraph.pl,
+speedscope and similar tools read directly.
+
+Endpoints are attached to a profile by `ProfiledRoute`; async endpoints
+share the event loop thread, so their profiles may include samples from
+other requests' coroutines.
+"""
+
+import collections
+import contextlib
+import contextvars
+import functools
+import inspect
+import itertools
+import random
+import sys
+import threading
+import time
+from collections.abc import Callable, Iterator
+from types import FrameType
+from typing import Any
+
+from fastapi.routing import APIRoute
+
+from app.core.config import settings
+
+# Phases reported in the Server-Timing header, in order
+TIMING_PHASES = ("db", "auth", "serialize")
+
+
+class RequestTimings:
+    """
+    Time spent in each phase of a single request, in seconds.
+
+    Phases may overlap: the auth dependency's own user lookup is also
+    counted as DB time.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases: dict[str, float] = dict.fromkeys(TIMING_PHASES, 0.0)
+
+    def add(self, phase: str, seconds: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def server_timing(self) -> str:
+        """
+        Format the phases and the total so far as a `Server-Timing` value.
+        """
+        total = time.perf_counter() - self.start
+        parts = [f"{phase};dur={seconds * 1000:.2f}" for phase, seconds in self.phases.items()]
+        parts.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(parts)
+
+
+current_timings: contextvars.ContextVar[RequestTimings | None] = contextvars.ContextVar(
+    "current_timings", default=None
+)
+
+
+def add_timing(phase: str, seconds: float) -> None:
+    """
+    Add time to a phase of the current request, if there is one.
+    """
+    timings = current_timings.get()
+    if timings is not None:
+        timings.add(phase, seconds)
+
+
+@contextlib.contextmanager
+def timed(phase: str) -> Iterator[None]:
+    """
+    Count the time spent in the `with` block towards a phase of the current request.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_timing(phase, time.perf_counter() - start)
+
+
+class Profile:
+    """
+    Stack samples collected for one request.
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, method: str, path: str, reason: str):
+        self.id = next(self._ids)
+        self.method = method
+        self.path = path
+        self.reason = reason
+        self.started_at = time.time()
+        self.route: str | None = None
+        self.status: int | None = None
+        self.duration_ms: float | None = None
+        self.server_timing: str | None = None
+        self.threads: set[int] = set()
+        self.stacks: collections.Counter[str] = collections.Counter()
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status": self.status,
+            "reason": self.reason,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "server_timing": self.server_timing,
+            "samples": sum(dict(self.stacks).values()),
+        }
+
+    def collapsed(self) -> str:
+        """
+        Render the samples in collapsed-stack format, heaviest stacks first.
+        """
+        # dict() takes an atomic copy in case the sampler is still writing
+        stacks = sorted(dict(self.stacks).items(), key=lambda item: item[1], reverse=True)
+        return "".join(f"{stack} {count}\n" for stack, count in stacks)
+
+
+current_profile: contextvars.ContextVar[Profile | None] = contextvars.ContextVar(
+    "current_profile", default=None
+)
+
+
+def _frame_name(frame: FrameType) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", "?")
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{module}:{name}:{code.co_firstlineno}"
+
+
+def _collapse(frame: FrameType | None) -> str:
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    """
+    Background stack sampler plus a ring buffer of finished profiles.
+    """
+
+    def __init__(self, interval: float, buffer_size: int):
+        self.interval = interval
+        self.profiles: collections.deque[Profile] = collections.deque(maxlen=buffer_size)
+        self._active: set[Profile] = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self, profile: Profile) -> None:
+        with self._lock:
+            self._active.add(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="moodmap-profiler", daemon=True
+                )
+                self._thread.start()
+        self._wakeup.set()
+
+    def stop(self, profile: Profile, keep: bool) -> None:
+        with self._lock:
+            self._active.discard(profile)
+            if keep:
+                self.profiles.append(profile)
+
+    def get(self, profile_id: int) -> Profile | None:
+        with self._lock:
+            return next((p for p in self.profiles if p.id == profile_id), None)
+
+    def list(self) -> list[Profile]:
+        with self._lock:
+            return list(reversed(self.profiles))
+
+    def _run(self) -> None:
+        own_thread = threading.get_ident()
+        while True:
+            with self._lock:
+                idle = not self._active
+                if idle:
+                    self._wakeup.clear()
+                active = [profile for profile in self._active if profile.threads]
+            if idle:
+                self._wakeup.wait()
+                continue
+            frames = sys._current_frames()
+            for profile in active:
+                for thread_id in list(profile.threads):
+                    frame = frames.get(thread_id)
+                    if frame is not None and thread_id != own_thread:
+                        profile.stacks[_collapse(frame)] += 1
+            del frames
+            time.sleep(self.interval)
+
+
+# Global profiler, used only when PROFILING_ENABLED is set
+profiler = SamplingProfiler(
+    interval=settings.PROFILE_INTERVAL_MS / 1000,
+    buffer_size=settings.PROFILE_BUFFER_SIZE,
+)
+
+
+def should_profile() -> str | None:
+    """
+    Decide whether to profile a new request.
+
+    Returns:
+        `"sampled"` or `"slow"` (kept only if it exceeds the threshold),
+        or `None` to skip profiling.
+    """
+    if not settings.PROFILING_ENABLED:
+        return None
+    if settings.PROFILE_SAMPLE_RATE and random.random() < settings.PROFILE_SAMPLE_RATE:
+        return "sampled"
+    if settings.PROFILE_SLOW_REQUEST_MS is not None:
+        return "slow"
+    return None
+
+
+@contextlib.contextmanager
+def _attach_thread() -> Iterator[None]:
+    profile = current_profile.get()
+    if profile is None:
+        yield
+        return
+    thread_id = threading.get_ident()
+    profile.threads.add(thread_id)
+    try:
+        yield
+    finally:
+        profile.threads.discard(thread_id)
+
+
+def attach_endpoint(endpoint: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Wrap an endpoint so the thread running it is sampled for the current profile.
+
+    The wrapper keeps the endpoint's signature, so dependency injection and
+    the OpenAPI schema are unaffected.
+    """
+    # Routes are re-created each time a router is included in another one
+    if getattr(endpoint, "__profiled__", False):
+        return endpoint
+
+    if inspect.iscoroutinefunction(endpoint):
+
+        @functools.wraps(endpoint)
+        async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+            with _attach_thread():
+                return await endpoint(*args, **kwargs)
+
+        async_wrapper.__profiled__ = True
+        return async_wrapper
+
+    @functools.wraps(endpoint)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        with _attach_thread():
+            return endpoint(*args, **kwargs)
+
+    wrapper.__profiled__ = True
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """
+    `APIRoute` whose endpoint can be sampled by the request profiler.
+    """
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any):
+        super().__init__(path, attach_endpoint(endpoint), **kwargs)
@@ -4,20 +4,128 @@ Security utilities for MoodMap authentication.
 This module provides helpers for:
 - Hashing and verifying user passwords with bcrypt (via passlib)
 - Creating signed JWT access tokens with configurable expiry
+- Recording password hashing times for the metrics endpoint
+
+bcrypt is deliberately slow and CPU-bound. Password work is therefore sent
+to a dedicated, bounded process pool instead of running on the shared
+request threadpool, so a burst of logins cannot starve other routes. The
+login and registration routes await the `_async` variants, so no request
+thread is held while a hash runs.
 """
 
+import asyncio
+import multiprocessing
+import threading
+import time
 import uuid
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 
 import jwt
 from passlib.context import CryptContext
+from starlette.concurrency import run_in_threadpool
 
+from app.core import metrics
 from app.core.config import settings
 
 # Password hashing context using bcrypt
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
+# Module-level wrappers so the work can be pickled to pool processes
+def _verify(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+class PasswordHasherBusy(Exception):
+    """
+    Raised when the password hashing pool and its queue are full.
+
+    Callers should surface this as a 503 so clients back off instead of
+    piling more requests onto the pool.
+    """
+
+
+class PasswordHasher:
+    """
+    Bounded process pool for bcrypt hashing and verification.
+
+    At most `workers + queue_size` password operations may be in flight at
+    once; further calls fail immediately with `PasswordHasherBusy`. With
+    `workers == 0` hashing runs inline in the calling thread.
+    """
+
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = workers
+        self._slots = threading.BoundedSemaphore(max(workers, 1) + queue_size)
+        self._pool: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        # Created lazily so each server worker process gets its own pool.
+        # "spawn" avoids forking a process that already runs request threads.
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._pool
+
+    def run(self, fn, *args):
+        """
+        Run `fn(*args)` on the pool and wait for the result.
+
+        Raises:
+            PasswordHasherBusy: If no pool slot or queue slot is free.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHasherBusy()
+        try:
+            if self.workers == 0:
+                return fn(*args)
+            return self._get_pool().submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    async def run_async(self, fn, *args):
+        """
+        Run `fn(*args)` on the pool and await the result without holding a
+        thread; with no pool workers it runs on the request threadpool.
+
+        Raises:
+            PasswordHasherBusy: If no pool slot or queue slot is free.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHasherBusy()
+        try:
+            if self.workers == 0:
+                return await run_in_threadpool(fn, *args)
+            return await asyncio.wrap_future(self._get_pool().submit(fn, *args))
+        finally:
+            self._slots.release()
+
+    def shutdown(self) -> None:
+        """
+        Shut down the worker processes, if any were started.
+        """
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
+
+
+# Global password hasher used by the CRUD layer
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    queue_size=settings.PASSWORD_HASH_QUEUE_SIZE,
+)
+
+
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     """
     Create a signed JWT access token from the given payload.
@@ -56,6 +164,33 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     return encoded_jwt
 
 
+def _timed(operation: str, fn, *args):
+    # Wall time as seen by the request, including any wait for a pool worker
+    start = time.perf_counter()
+    try:
+        result = password_hasher.run(fn, *args)
+    except PasswordHasherBusy:
+        metrics.password_hash_rejected_total.inc((operation,))
+        raise
+    metrics.password_hash_duration_seconds.observe(
+        time.perf_counter() - start, (operation,)
+    )
+    return result
+
+
+async def _timed_async(operation: str, fn, *args):
+    start = time.perf_counter()
+    try:
+        result = await password_hasher.run_async(fn, *args)
+    except PasswordHasherBusy:
+        metrics.password_hash_rejected_total.inc((operation,))
+        raise
+    metrics.password_hash_duration_seconds.observe(
+        time.perf_counter() - start, (operation,)
+    )
+    return result
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
     Verify that a plain-text password matches a stored bcrypt hash.
@@ -64,10 +199,13 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         plain_password: The password provided by the user.
         hashed_password: The bcrypt-hashed password stored in the database.
 
+    Raises:
+        PasswordHasherBusy: If the password hashing pool is saturated.
+
     Returns:
         True if the password is valid for the hash, otherwise False.
     """
-    return pwd_context.verify(plain_password, hashed_password)
+    return _timed("verify", _verify, plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
@@ -77,7 +215,32 @@ def get_password_hash(password: str) -> str:
     Args:
         password: The plain-text password to hash.
 
+    Raises:
+        PasswordHasherBusy: If the password hashing pool is saturated.
+
     Returns:
         A bcrypt hash suitable for persisting in the database.
     """
-    return pwd_context.hash(password)
+    return _timed("hash", _hash, password)
+
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    Async counterpart of `verify_password`; awaits the pool without holding
+    a request thread.
+
+    Raises:
+        PasswordHasherBusy: If the password hashing pool is saturated.
+    """
+    return await _timed_async("verify", _verify, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """
+    Async counterpart of `get_password_hash`.
+
+    Raises:
+        PasswordHasherBusy: If the password hashing pool is saturated.
+    """
+    return await _timed_async("hash", _hash, password)
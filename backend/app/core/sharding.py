@@ -0,0 +1,217 @@
+"""
+User-keyed horizontal sharding of entry data for MoodMap.
+
+Shard 0 is the primary database (`DATABASE_URL`); `DATABASE_SHARD_URLS`
+adds shards 1..N. A user's entries, daily rollups and search index rows
+live together on one shard, so every per-user query stays on a single
+database.
+
+The primary also holds the user directory: the full `user` table,
+including each user's `shard`. Logins and email lookups therefore work
+the same however many shards there are. Other shards keep a stub row per
+user (no password hash) to satisfy the entries' foreign key.
+
+New users are placed with rendezvous hashing over the configured shards,
+and their shard is stored in the directory, so adding shards does not
+move anyone implicitly. `python -m app.shards rebalance` moves users to
+the shard the hash now picks for them (about 1/N of users when growing to
+N shards), and `python -m app.shards move` moves a single user.
+
+User to shard lookups are cached per process for `SHARD_CACHE_TTL_SECONDS`.
+"""
+
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.core.db import (
+    async_engine,
+    async_replicas,
+    build_async_engine,
+    build_engine,
+    engine,
+    replicas,
+    to_async_url,
+)
+from app.models import User
+
+
+class ShardRouter:
+    """
+    Maps user IDs to the shard (and engine) holding their entry data.
+
+    Thread-safe; the user to shard cache is a bounded TTL + LRU map.
+    """
+
+    def __init__(
+        self,
+        engines: list[Engine],
+        async_engines: list[AsyncEngine] | None,
+        cache_ttl: float,
+        cache_size: int = 100_000,
+    ):
+        self.engines = engines
+        self.async_engines = async_engines
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self._cache: OrderedDict[uuid.UUID, tuple[float, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def directory(self) -> Engine:
+        """
+        Engine of the database holding the user directory (shard 0).
+        """
+        return self.engines[0]
+
+    @property
+    def count(self) -> int:
+        return len(self.engines)
+
+    def pools(self) -> dict[tuple[str, str], Engine]:
+        """
+        Every engine with a connection pool, keyed by `(engine, shard)`.
+
+        `engine` is `sync`, `async` or `replica-<n>`; only shard 0 has
+        replicas. Async engines are given as their underlying sync engine.
+        """
+        pools: dict[tuple[str, str], Engine] = {}
+        for index, target in enumerate(self.engines):
+            pools[("sync", str(index))] = target
+            if self.async_engines is not None:
+                pools[("async", str(index))] = self.async_engines[index].sync_engine
+        for index, replica in enumerate(replicas.replicas):
+            pools[(f"replica-{index}", "0")] = replica
+        return pools
+
+    def placement(self, user_id: uuid.UUID) -> int:
+        """
+        Pick the shard a user belongs on, by rendezvous hashing.
+
+        Growing from N to N + 1 shards only changes the placement of the
+        users that the new shard wins, about 1 / (N + 1) of them.
+        """
+        if self.count == 1:
+            return 0
+        return max(
+            range(self.count),
+            key=lambda shard: hashlib.blake2b(
+                user_id.bytes + shard.to_bytes(4, "big"), digest_size=8
+            ).digest(),
+        )
+
+    def shard_for(self, user_id: uuid.UUID) -> int:
+        """
+        Look up the shard holding a user's data, via the per-process cache.
+
+        Unknown users are mapped to their hash placement without caching.
+        """
+        if self.count == 1:
+            return 0
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(user_id)
+            if cached is not None and cached[0] > now:
+                self._cache.move_to_end(user_id)
+                return cached[1]
+
+        with Session(self.directory) as session:
+            shard = session.exec(select(User.shard).where(User.id == user_id)).first()
+        if shard is None:
+            return self.placement(user_id)
+        self.remember(user_id, shard)
+        return shard
+
+    def remember(self, user_id: uuid.UUID, shard: int) -> None:
+        """
+        Cache a user's shard, e.g. right after assigning it.
+        """
+        with self._lock:
+            self._cache[user_id] = (time.monotonic() + self.cache_ttl, shard)
+            self._cache.move_to_end(user_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def invalidate(self, user_id: uuid.UUID) -> None:
+        with self._lock:
+            self._cache.pop(user_id, None)
+
+    def engine_for(self, user_id: uuid.UUID) -> Engine:
+        """
+        Engine of the shard holding a user's data.
+        """
+        return self.engines[self.shard_for(user_id)]
+
+    def async_engine_for(self, user_id: uuid.UUID) -> AsyncEngine:
+        """
+        Async engine of the shard holding a user's data (async mode only).
+        """
+        return self.async_engines[self.shard_for(user_id)]
+
+    def read_engine(self, user_id: uuid.UUID | None) -> Engine:
+        """
+        Engine to serve a read of a user's data.
+
+        Users on shard 0 are routed through its read replicas (see
+        `app.core.db.ReplicaSet`); other shards are read directly.
+        """
+        shard = self.shard_for(user_id) if user_id is not None else 0
+        if shard == 0:
+            return replicas.read_engine(user_id)
+        return self.engines[shard]
+
+    def async_read_engine(self, user_id: uuid.UUID | None) -> AsyncEngine:
+        """
+        Async counterpart of `read_engine` (async mode only).
+        """
+        shard = self.shard_for(user_id) if user_id is not None else 0
+        if shard == 0:
+            return async_replicas.read_engine(user_id)
+        return self.async_engines[shard]
+
+
+def ensure_user_on_shard(user: User, shard: int) -> None:
+    """
+    Create the user's stub row on a non-directory shard if it is missing.
+    """
+    if shard == 0:
+        return
+    with Session(shards.engines[shard]) as session:
+        if session.get(User, user.id) is None:
+            session.add(
+                User(
+                    id=user.id,
+                    email=user.email,
+                    first_name=user.first_name,
+                    last_name=user.last_name,
+                    hashed_password="",
+                    shard=shard,
+                    created_at=user.created_at,
+                    updated_at=user.updated_at,
+                )
+            )
+            session.commit()
+
+
+# Global shard router; a single shard (the primary) unless DATABASE_SHARD_URLS is set
+shards = ShardRouter(
+    [engine, *(build_engine(url) for url in settings.DATABASE_SHARD_URLS)],
+    [
+        async_engine,
+        *(
+            build_async_engine(url)
+            for url in settings.ASYNC_DATABASE_SHARD_URLS
+            or [to_async_url(url) for url in settings.DATABASE_SHARD_URLS]
+        ),
+    ]
+    if async_engine is not None
+    else None,
+    cache_ttl=settings.SHARD_CACHE_TTL_SECONDS,
+)
@@ -5,23 +5,45 @@ This module centralizes database operations for authentication, user
 management, and journal entry lifecycle (create, read, update, delete),
 so that FastAPI route handlers can stay thin and focused on HTTP concerns.
 """
-from typing import Any
+import base64
+import binascii
+import datetime
+from collections.abc import Iterator, Sequence
+from typing import Any, Literal
 
+import numpy as np
 from pydantic import EmailStr
-from sqlmodel import Session, select
+from sqlmodel import Session, and_, delete, func, insert, or_, select
+from starlette.concurrency import run_in_threadpool
 
 from app.models import (
     User,
+    UserPublic,
     UserUpdate,
     UserCreate,
     Entry,
     EntryCreate,
+    EntryImport,
     EntryUpdate,
     EntriesPublic,
+    EntrySummariesPublic,
+)
+from app import changes, rollups, search
+from app.core.auth_cache import principal_cache
+from app.core.insights_cache import insights_cache
+from app.core.events import entry_events
+from app.core.sharding import ensure_user_on_shard, shards
+from app.core.security import (
+    get_password_hash,
+    get_password_hash_async,
+    verify_password,
+    verify_password_async,
 )
-from app.core.security import get_password_hash, verify_password
 import uuid
 
+# Sort direction of entry lists by creation time
+EntryOrder = Literal["desc", "asc"]
+
 
 def authenticate_user(*, session: Session, email: str, password: str) -> User | None:
     """
@@ -43,29 +65,71 @@ def authenticate_user(*, session: Session, email: str, password: str) -> User |
     return db_user
 
 
-def create_user(*, session: Session, user_to_create: UserCreate) -> User | None:
+async def authenticate_user_async(
+    *, session: Session, email: str, password: str
+) -> User | None:
+    """
+    Async counterpart of `authenticate_user` for async route handlers.
+
+    Only the user lookup runs on the request threadpool; the bcrypt check
+    is awaited on the password hashing pool, so no thread is held for it.
+    """
+    db_user = await run_in_threadpool(get_user_by_email, session=session, email=email)
+    if not db_user:
+        return None
+    if not await verify_password_async(password, db_user.hashed_password):
+        return None
+    return db_user
+
+
+def create_user(
+    *, session: Session, user_to_create: UserCreate, hashed_password: str | None = None
+) -> User | None:
     """
     Create and persist a new user.
 
     The plain-text password from `user_to_create` is hashed and stored
-    on the resulting `User` record.
+    on the resulting `User` record. The user is placed on a shard (see
+    `app.core.sharding`), whose stub row is created before the directory
+    row is committed.
 
     Args:
-        session: Database session.
+        session: Database session on the user directory (shard 0).
         user_to_create: Validated user creation payload.
+        hashed_password: The password's hash, if the caller already
+            computed it (see `create_user_async`).
 
     Returns:
         The newly created `User` instance.
     """
     user_data = user_to_create.dict(exclude={"password"})
     user = User(**user_data)
-    user.hashed_password = get_password_hash(user_to_create.password)
+    user.hashed_password = hashed_password or get_password_hash(user_to_create.password)
+    user.shard = shards.placement(user.id)
+    ensure_user_on_shard(user, user.shard)
     session.add(user)
     session.commit()
     session.refresh(user)
+    shards.remember(user.id, user.shard)
     return user
 
 
+async def create_user_async(*, session: Session, user_to_create: UserCreate) -> User | None:
+    """
+    Async counterpart of `create_user` for async route handlers.
+
+    The password is hashed on the password hashing pool without holding a
+    request thread; only the inserts run on the threadpool.
+    """
+    hashed_password = await get_password_hash_async(user_to_create.password)
+    return await run_in_threadpool(
+        create_user,
+        session=session,
+        user_to_create=user_to_create,
+        hashed_password=hashed_password,
+    )
+
+
 def get_user_by_email(*, session: Session, email: str) -> User | None:
     """
     Look up a user by email.
@@ -106,6 +170,7 @@ def update_user(
     current_user.sqlmodel_update(new_data)
     session.add(current_user)
     session.commit()
+    principal_cache.invalidate(id)
     session.refresh(current_user)
     return current_user
 
@@ -114,35 +179,148 @@ def delete_user(*, session: Session, user: User) -> None:
     """
     Permanently delete a user.
 
+    The user's entries, rollups, search index rows and tombstones are
+    deleted first, as the entries reference the user row. On shard 0 that
+    happens in the same transaction as the user row; on another shard the
+    data and the stub user row are committed there first.
+
     Args:
-        session: Database session.
+        session: Database session on the user directory (shard 0).
         user: The user instance to delete.
     """
+    user_id, shard = user.id, user.shard
+    if shard == 0:
+        delete_user_data(session=session, user_id=user_id)
+    else:
+        with Session(shards.engines[shard]) as shard_session:
+            delete_user_data(session=shard_session, user_id=user_id)
+            shard_session.exec(delete(User).where(User.id == user_id))
+            shard_session.commit()
     session.delete(user)
     session.commit()
+    principal_cache.invalidate(user_id)
+    insights_cache.invalidate(user_id)
+    shards.invalidate(user_id)
+
+
+def delete_user_data(*, session: Session, user_id: uuid.UUID) -> int:
+    """
+    Delete all of a user's entries, rollups and search index rows.
+
+    Used when a user is deleted or moved to another shard. The user row is
+    left alone; delete tombstones and cached insights are removed too.
+
+    Args:
+        session: Database session on the shard holding the data; the caller
+            commits.
+        user_id: ID of the user whose data to delete.
+
+    Returns:
+        The number of deleted entries.
+    """
+    search.remove_user_entries(session, user_id)
+    rollups.remove_user(session, user_id)
+    changes.remove_user(session, user_id)
+    insights_cache.invalidate(user_id)
+    return session.exec(delete(Entry).where(Entry.user_id == user_id)).rowcount
+
+
+def new_entry_row(
+    user_id: uuid.UUID,
+    entry: EntryCreate | EntryImport,
+    now: datetime.datetime | None = None,
+) -> dict[str, Any]:
+    """
+    Build the column values of a new entry.
+
+    The ID and timestamps are assigned here in Python rather than by the
+    database, so nothing has to be read back after the insert.
+
+    Args:
+        user_id: ID of the owning user.
+        entry: Validated entry payload; an import's `created_at` is kept,
+            converted to naive UTC if it carries an offset.
+        now: Creation time to use; defaults to the current UTC time.
+
+    Returns:
+        A dict of `Entry` column values.
+    """
+    now = now or datetime.datetime.utcnow()
+    created_at = getattr(entry, "created_at", None)
+    return {
+        "id": uuid.uuid4(),
+        "user_id": user_id,
+        "mood": entry.mood,
+        "title": entry.title,
+        "body": entry.body,
+        "created_at": utc_naive(created_at) if created_at else now,
+        "updated_at": now,
+    }
+
+
+def insert_entry_rows(session: Session, rows: list[dict[str, Any]]) -> None:
+    """
+    Insert entry rows with one executemany `INSERT`, and add them to the
+    search index and daily rollups, within the caller's transaction.
+
+    Each row is stamped with its owner's next change sequence number first.
+    """
+    changes.stamp_rows(session, rows)
+    session.exec(insert(Entry), params=rows)
+    search.index_entries(session, rows)
+    rollups.add_entries(session, rows)
 
 
 def create_entry(
-    *, session: Session, user: User, entry_to_create: EntryCreate
+    *, session: Session, user: User | UserPublic, entry_to_create: EntryCreate
 ) -> Entry | None:
     """
     Create a new journal entry owned by the given user.
 
+    The row is built in Python (see `new_entry_row`), so the returned entry
+    is complete without a `refresh()` after the commit.
+
     Args:
         session: Database session.
         user: The owning user.
         entry_to_create: Validated entry creation payload.
 
     Returns:
-        The newly created `Entry` instance.
+        The newly created `Entry` instance (not attached to the session).
     """
-    entry = Entry(**entry_to_create.dict())
-    entry.user_id = user.id
-    entry.user = user
-    session.add(entry)
+    row = new_entry_row(user.id, entry_to_create)
+    insert_entry_rows(session, [row])
     session.commit()
-    session.refresh(entry)
-    return entry
+    entry_events.publish(user.id, "created", row)
+    return Entry(**row)
+
+
+def bulk_create_entries(
+    *, session: Session, user_id: uuid.UUID, entries: list[EntryImport]
+) -> int:
+    """
+    Insert many entries for a user in a single transaction.
+
+    Rows are written with one executemany `INSERT` and are not loaded back
+    into the session, so IDs and timestamps are assigned here in Python.
+
+    Args:
+        session: Database session.
+        user_id: ID of the owning user.
+        entries: Validated entries to insert.
+
+    Returns:
+        The number of inserted entries.
+    """
+    if not entries:
+        return 0
+    now = datetime.datetime.utcnow()
+    rows = [new_entry_row(user_id, entry, now) for entry in entries]
+    insert_entry_rows(session, rows)
+    session.commit()
+    # One event per batch rather than per row; streams refetch on it
+    entry_events.publish(user_id, "imported", {"count": len(rows)})
+    return len(rows)
 
 
 def get_entry_by_id(
@@ -182,32 +360,386 @@ def get_all_entries(*, session: Session) -> Any:
     return EntriesPublic(data=entries, count=len(entries))
 
 
-def get_all_entries_by_user_id(
+def encode_entry_cursor(entry: Any) -> str:
+    """
+    Build an opaque pagination cursor pointing just past `entry`.
+
+    The cursor encodes the `(created_at, id)` pair of the last entry on a
+    page; clients should treat it as an opaque string.
+
+    Args:
+        entry: The last entry (or summary row) returned on the current page.
+
+    Returns:
+        A URL-safe cursor string.
+    """
+    raw = f"{entry.created_at.isoformat()}|{entry.id.hex}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_entry_cursor(cursor: str) -> tuple[datetime.datetime, uuid.UUID]:
+    """
+    Decode a cursor produced by `encode_entry_cursor`.
+
+    Args:
+        cursor: Opaque cursor string supplied by the client.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+
+    Returns:
+        The `(created_at, id)` pair the cursor points past.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        created_at, entry_id = raw.split("|", 1)
+        return datetime.datetime.fromisoformat(created_at), uuid.UUID(entry_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+def utc_naive(moment: datetime.datetime) -> datetime.datetime:
+    """
+    Convert a timestamp to naive UTC, the form entry timestamps are stored in.
+
+    Naive timestamps are assumed to be UTC already.
+    """
+    if moment.tzinfo is None:
+        return moment
+    return moment.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def entry_filter_clauses(
+    *,
+    created_from: datetime.datetime | None = None,
+    created_to: datetime.datetime | None = None,
+    min_mood: int | None = None,
+    max_mood: int | None = None,
+) -> list[Any]:
+    """
+    Compile optional entry list filters into `WHERE` clauses.
+
+    Each clause is a plain range on an indexed column, so together with
+    `Entry.user_id == ...` they are answered from `ix_entry_user_id_created_at_id`
+    (date ranges) or `ix_entry_user_id_mood_created_at` (mood ranges).
+
+    Args:
+        created_from: Only entries created at or after this time.
+        created_to: Only entries created before this time.
+        min_mood: Only entries with at least this mood.
+        max_mood: Only entries with at most this mood.
+
+    Returns:
+        The clauses to AND together; empty when no filter is set.
+    """
+    clauses = []
+    if created_from is not None:
+        clauses.append(Entry.created_at >= utc_naive(created_from))
+    if created_to is not None:
+        clauses.append(Entry.created_at < utc_naive(created_to))
+    if min_mood is not None:
+        clauses.append(Entry.mood >= min_mood)
+    if max_mood is not None:
+        clauses.append(Entry.mood <= max_mood)
+    return clauses
+
+
+def count_entries_statement(user_id: uuid.UUID, *filters: Any) -> Any:
+    """
+    Build a `COUNT(*)` statement over a user's entries.
+
+    The count is answered from the `(user_id, ...)` index, so no entry rows
+    are loaded. `filters` are extra clauses from `entry_filter_clauses`.
+    """
+    return select(func.count()).select_from(Entry).where(Entry.user_id == user_id, *filters)
+
+
+def count_entries_by_user_id(*, session: Session, user_id: uuid.UUID) -> int:
+    """
+    Count the entries belonging to a specific user.
+
+    Args:
+        session: Database session.
+        user_id: ID of the user whose entries to count.
+
+    Returns:
+        The number of entries owned by the user.
+    """
+    return session.exec(count_entries_statement(user_id)).one()
+
+
+def entries_watermark_statement(user_id: uuid.UUID) -> Any:
+    """
+    Build a statement returning a user's entry count and latest `updated_at`.
+
+    Together these change whenever an entry is created, updated or deleted.
+    Both are answered from the `(user_id, updated_at)` index.
+    """
+    return select(func.count(), func.max(Entry.updated_at)).where(
+        Entry.user_id == user_id
+    )
+
+
+def get_entries_watermark(
     *, session: Session, user_id: uuid.UUID
+) -> tuple[int, datetime.datetime | None]:
+    """
+    Return the change watermark of a user's entries.
+
+    Args:
+        session: Database session.
+        user_id: ID of the user whose entries to inspect.
+
+    Returns:
+        A `(count, max_updated_at)` tuple; `max_updated_at` is `None` when
+        the user has no entries.
+    """
+    count, updated_at = session.exec(entries_watermark_statement(user_id)).one()
+    return count, updated_at
+
+
+def entry_version_statement(id: uuid.UUID, user_id: uuid.UUID) -> Any:
+    """
+    Build a statement returning only an entry's `updated_at`, scoped to a user.
+    """
+    return select(Entry.updated_at).where(Entry.id == id, Entry.user_id == user_id)
+
+
+def get_entry_version(
+    *, session: Session, id: uuid.UUID, user_id: uuid.UUID
+) -> datetime.datetime | None:
+    """
+    Return an entry's `updated_at` without loading the entry.
+
+    Args:
+        session: Database session.
+        id: ID of the entry.
+        user_id: ID of the user who must own the entry.
+
+    Returns:
+        The entry's last update time, or `None` if it does not exist or is
+        not owned by the given user.
+    """
+    return session.exec(entry_version_statement(id, user_id)).first()
+
+
+def user_entries_page_statement(
+    *,
+    user_id: uuid.UUID,
+    limit: int,
+    cursor: str | None = None,
+    summary: bool = False,
+    filters: Sequence[Any] = (),
+    order: EntryOrder = "desc",
 ) -> Any:
     """
-    Retrieve all entries belonging to a specific user, newest first.
+    Build the keyset-paginated `SELECT` for one page of a user's entries.
+
+    One row more than `limit` is selected so `build_entries_page` can tell
+    whether another page exists. `filters` are extra clauses from
+    `entry_filter_clauses`.
+
+    Oldest-first pages sort by `(created_at, id desc)`, the exact reverse
+    of the newest-first order, so both directions are a single range scan
+    of `ix_entry_user_id_created_at_id`.
+
+    Raises:
+        ValueError: If `cursor` is malformed.
+    """
+    # Plain column rows rather than ORM entities: pages are read-only, and
+    # skipping identity-map hydration roughly halves the per-row cost
+    if summary:
+        statement = select(Entry.id, Entry.title, Entry.mood, Entry.created_at)
+    else:
+        statement = select(
+            Entry.id,
+            Entry.user_id,
+            Entry.mood,
+            Entry.title,
+            Entry.body,
+            Entry.created_at,
+            Entry.updated_at,
+        )
+    statement = statement.where(Entry.user_id == user_id, *filters)
+    if cursor:
+        created_at, entry_id = decode_entry_cursor(cursor)
+        if order == "asc":
+            after = or_(
+                Entry.created_at > created_at,
+                and_(Entry.created_at == created_at, Entry.id < entry_id),
+            )
+        else:
+            after = or_(
+                Entry.created_at < created_at,
+                and_(Entry.created_at == created_at, Entry.id > entry_id),
+            )
+        statement = statement.where(after)
+    if order == "asc":
+        statement = statement.order_by(Entry.created_at, Entry.id.desc())
+    else:
+        statement = statement.order_by(Entry.created_at.desc(), Entry.id)
+    return statement.limit(limit + 1)
+
+
+def build_entries_page(
+    rows: Any, *, limit: int, count: int, summary: bool = False
+) -> Any:
+    """
+    Wrap the rows selected by `user_entries_page_statement` in a response.
+
+    Returns:
+        An `EntriesPublic` (or `EntrySummariesPublic` in summary mode)
+        wrapper with at most `limit` rows and the next page's cursor.
+    """
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_entry_cursor(rows[-1])
+    wrapper = EntrySummariesPublic if summary else EntriesPublic
+    return wrapper(data=rows, count=count, next_cursor=next_cursor)
+
+
+def get_all_entries_by_user_id(
+    *,
+    session: Session,
+    user_id: uuid.UUID,
+    limit: int = 100,
+    cursor: str | None = None,
+    summary: bool = False,
+    created_from: datetime.datetime | None = None,
+    created_to: datetime.datetime | None = None,
+    min_mood: int | None = None,
+    max_mood: int | None = None,
+    order: EntryOrder = "desc",
+    total: int | None = None,
+) -> Any:
+    """
+    Retrieve one page of entries belonging to a specific user, newest first.
+
+    Pages are fetched with keyset pagination over `(created_at, id)`, so the
+    cost of a page does not grow with how far into the history it is.
+
+    In summary mode only `id`, `title`, `mood` and `created_at` are selected,
+    so the (potentially large) `body` column is never read from the database.
+
+    Date and mood filters are applied in SQL (see `entry_filter_clauses`),
+    and `count` is the number of entries matching them.
 
     Args:
         session: Database session.
         user_id: ID of the user whose entries to fetch.
+        limit: Maximum number of entries to return.
+        cursor: Optional cursor from a previous page's `next_cursor`.
+        summary: Whether to return slim summaries instead of full entries.
+        created_from: Only entries created at or after this time.
+        created_to: Only entries created before this time.
+        min_mood: Only entries with at least this mood.
+        max_mood: Only entries with at most this mood.
+        order: `desc` for newest first, `asc` for oldest first.
+        total: The user's entry count, if the caller already has it (e.g.
+            from `get_entries_watermark`); used as `count` when no filters
+            are set instead of counting again.
+
+    Raises:
+        ValueError: If `cursor` is malformed.
 
     Returns:
-        An `EntriesPublic` wrapper with the user's entries and count.
+        An `EntriesPublic` (or `EntrySummariesPublic` in summary mode) wrapper
+        with the page of entries, the matching entry count and the cursor
+        for the next page (if any).
     """
-    entries = (
-        session.exec(
-            select(Entry)
-            .where(Entry.user_id == user_id)
-            .order_by(Entry.created_at.desc())
+    filters = entry_filter_clauses(
+        created_from=created_from,
+        created_to=created_to,
+        min_mood=min_mood,
+        max_mood=max_mood,
+    )
+    statement = user_entries_page_statement(
+        user_id=user_id,
+        limit=limit,
+        cursor=cursor,
+        summary=summary,
+        filters=filters,
+        order=order,
+    )
+    rows = session.exec(statement).all()
+    if total is not None and not filters:
+        count = total
+    else:
+        count = session.exec(count_entries_statement(user_id, *filters)).one()
+    return build_entries_page(rows, limit=limit, count=count, summary=summary)
+
+
+def iter_entry_batches_by_user_id(
+    *, session: Session, user_id: uuid.UUID, batch_size: int
+) -> Iterator[Sequence[Any]]:
+    """
+    Stream all of a user's entries, oldest first, in batches of rows.
+
+    Uses `yield_per`, which makes drivers that support it (e.g. psycopg2)
+    fetch through a server-side cursor, so only one batch is held in memory
+    at a time. Plain column rows are returned instead of ORM objects.
+
+    Args:
+        session: Database session; must stay open while iterating.
+        user_id: ID of the user whose entries to stream.
+        batch_size: Number of rows fetched per round trip.
+
+    Yields:
+        Sequences of rows with `id`, `mood`, `title`, `body`, `created_at`,
+        `updated_at` and `change_seq`.
+    """
+    statement = (
+        select(
+            Entry.id,
+            Entry.mood,
+            Entry.title,
+            Entry.body,
+            Entry.created_at,
+            Entry.updated_at,
+            Entry.change_seq,
         )
-        .all()
+        .where(Entry.user_id == user_id)
+        .order_by(Entry.created_at, Entry.id)
+        .execution_options(yield_per=batch_size)
+    )
+    yield from session.exec(statement).partitions()
+
+
+def get_mood_series_by_user_id(
+    *, session: Session, user_id: uuid.UUID
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Load a user's entry timestamps and moods as column arrays.
+
+    Only the `created_at` and `mood` columns are selected, so entry bodies
+    are never read or hydrated into ORM objects.
+
+    Args:
+        session: Database session.
+        user_id: ID of the user whose entries to load.
+
+    Returns:
+        A `(timestamps, moods)` pair of NumPy arrays ordered oldest first;
+        timestamps are `datetime64[us]` in UTC.
+    """
+    rows = session.exec(
+        select(Entry.created_at, Entry.mood)
+        .where(Entry.user_id == user_id)
+        .order_by(Entry.created_at)
+    ).all()
+    if not rows:
+        return np.array([], dtype="datetime64[us]"), np.array([], dtype=np.int64)
+    timestamps, moods = zip(*rows)
+    return (
+        np.array(timestamps, dtype="datetime64[us]"),
+        np.array(moods, dtype=np.int64),
     )
-    return EntriesPublic(data=entries, count=len(entries))
 
 
 def update_entry(
-    *, session: Session, user: User, id: uuid.UUID, request_data: EntryUpdate
+    *, session: Session, user: User | UserPublic, id: uuid.UUID, request_data: EntryUpdate
 ) -> Any:
     """
     Partially update an entry owned by the given user.
@@ -227,15 +759,24 @@ def update_entry(
     current_entry = session.get(Entry, id)
     if not current_entry or current_entry.user_id != user.id:
         return None
+    old_created_at, old_mood = current_entry.created_at, current_entry.mood
     new_data = request_data.model_dump(exclude_unset=True)
     current_entry.sqlmodel_update(new_data)
+    current_entry.updated_at = datetime.datetime.utcnow()
+    current_entry.change_seq = changes.reserve(session, user.id)
     session.add(current_entry)
+    if "title" in new_data or "body" in new_data:
+        search.index_entry(session, current_entry)
+    rollups.move_entry(session, current_entry, old_created_at, old_mood)
     session.commit()
     session.refresh(current_entry)
+    entry_events.publish(user.id, "updated", current_entry)
     return current_entry
 
 
-def delete_entry(*, session: Session, user: User, entry: Entry) -> None:
+def delete_entry(
+    *, session: Session, user: User | UserPublic, entry: Entry
+) -> None:
     """
     Delete an entry if it is owned by the given user.
 
@@ -246,5 +787,9 @@ def delete_entry(*, session: Session, user: User, entry: Entry) -> None:
     """
     if entry.user_id != user.id:
         return
+    search.remove_entry(session, entry.id)
+    changes.record_delete(session, entry)
     session.delete(entry)
+    rollups.remove_entry(session, entry.user_id, entry.created_at, entry.mood)
     session.commit()
+    entry_events.publish(user.id, "deleted", {"id": entry.id})
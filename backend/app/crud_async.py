@@ -0,0 +1,261 @@
+"""
+Async CRUD helpers for journal entries.
+
+Async counterparts of the entry functions in `app.crud`, used by the
+entries routes when `DATABASE_ASYNC` is enabled. Statements, response
+wrappers, search index and rollup maintenance are shared with `app.crud` so both
+modes behave identically; only the session type and the awaiting differ.
+"""
+import datetime
+import uuid
+from typing import Any
+
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app import changes, crud, rollups, search
+from app.core.events import entry_events
+from app.models import (
+    User,
+    UserPublic,
+    Entry,
+    EntryCreate,
+    EntryUpdate,
+)
+
+
+async def get_user_by_email(*, session: AsyncSession, email: str) -> User | None:
+    """
+    Look up a user by email.
+
+    Args:
+        session: Async database session.
+        email: Email address to search for.
+
+    Returns:
+        The matching `User` or `None` if no record is found.
+    """
+    result = await session.exec(select(User).where(User.email == email))
+    return result.first()
+
+
+async def create_entry(
+    *, session: AsyncSession, user: User | UserPublic, entry_to_create: EntryCreate
+) -> Entry | None:
+    """
+    Create a new journal entry owned by the given user.
+
+    Args:
+        session: Async database session.
+        user: The owning user.
+        entry_to_create: Validated entry creation payload.
+
+    Returns:
+        The newly created `Entry` instance (not attached to the session).
+    """
+    row = crud.new_entry_row(user.id, entry_to_create)
+    await session.run_sync(crud.insert_entry_rows, [row])
+    await session.commit()
+    entry_events.publish(user.id, "created", row)
+    return Entry(**row)
+
+
+async def get_entry_by_id(
+    *, session: AsyncSession, id: uuid.UUID, user_id: uuid.UUID
+) -> Any:
+    """
+    Retrieve a single entry by ID, scoped to a specific user.
+
+    Args:
+        session: Async database session.
+        id: ID of the entry to fetch.
+        user_id: ID of the user who must own the entry.
+
+    Returns:
+        The matching `Entry`, or `None` if it does not exist or is not
+        owned by the given user.
+    """
+    entry = await session.get(Entry, id)
+    if not entry or entry.user_id != user_id:
+        return None
+    return entry
+
+
+async def count_entries_by_user_id(*, session: AsyncSession, user_id: uuid.UUID) -> int:
+    """
+    Count the entries belonging to a specific user.
+
+    Args:
+        session: Async database session.
+        user_id: ID of the user whose entries to count.
+
+    Returns:
+        The number of entries owned by the user.
+    """
+    result = await session.exec(crud.count_entries_statement(user_id))
+    return result.one()
+
+
+async def get_entries_watermark(
+    *, session: AsyncSession, user_id: uuid.UUID
+) -> tuple[int, datetime.datetime | None]:
+    """
+    Return the change watermark of a user's entries.
+
+    See `app.crud.get_entries_watermark`.
+
+    Args:
+        session: Async database session.
+        user_id: ID of the user whose entries to inspect.
+
+    Returns:
+        A `(count, max_updated_at)` tuple.
+    """
+    result = await session.exec(crud.entries_watermark_statement(user_id))
+    count, updated_at = result.one()
+    return count, updated_at
+
+
+async def get_entry_version(
+    *, session: AsyncSession, id: uuid.UUID, user_id: uuid.UUID
+) -> datetime.datetime | None:
+    """
+    Return an entry's `updated_at` without loading the entry.
+
+    Args:
+        session: Async database session.
+        id: ID of the entry.
+        user_id: ID of the user who must own the entry.
+
+    Returns:
+        The entry's last update time, or `None` if it does not exist or is
+        not owned by the given user.
+    """
+    result = await session.exec(crud.entry_version_statement(id, user_id))
+    return result.first()
+
+
+async def get_all_entries_by_user_id(
+    *,
+    session: AsyncSession,
+    user_id: uuid.UUID,
+    limit: int = 100,
+    cursor: str | None = None,
+    summary: bool = False,
+    created_from: datetime.datetime | None = None,
+    created_to: datetime.datetime | None = None,
+    min_mood: int | None = None,
+    max_mood: int | None = None,
+    order: crud.EntryOrder = "desc",
+    total: int | None = None,
+) -> Any:
+    """
+    Retrieve one page of entries belonging to a specific user, newest first.
+
+    See `app.crud.get_all_entries_by_user_id` for the pagination and
+    filtering semantics.
+
+    Args:
+        session: Async database session.
+        user_id: ID of the user whose entries to fetch.
+        limit: Maximum number of entries to return.
+        cursor: Optional cursor from a previous page's `next_cursor`.
+        summary: Whether to return slim summaries instead of full entries.
+        created_from: Only entries created at or after this time.
+        created_to: Only entries created before this time.
+        min_mood: Only entries with at least this mood.
+        max_mood: Only entries with at most this mood.
+        order: `desc` for newest first, `asc` for oldest first.
+        total: The user's entry count, if the caller already has it (e.g.
+            from `get_entries_watermark`); used as `count` when no filters
+            are set instead of counting again.
+
+    Raises:
+        ValueError: If `cursor` is malformed.
+
+    Returns:
+        An `EntriesPublic` (or `EntrySummariesPublic` in summary mode) wrapper
+        with the page of entries, the matching entry count and the cursor
+        for the next page (if any).
+    """
+    filters = crud.entry_filter_clauses(
+        created_from=created_from,
+        created_to=created_to,
+        min_mood=min_mood,
+        max_mood=max_mood,
+    )
+    statement = crud.user_entries_page_statement(
+        user_id=user_id,
+        limit=limit,
+        cursor=cursor,
+        summary=summary,
+        filters=filters,
+        order=order,
+    )
+    rows = (await session.exec(statement)).all()
+    if total is not None and not filters:
+        count = total
+    else:
+        count = (await session.exec(crud.count_entries_statement(user_id, *filters))).one()
+    return crud.build_entries_page(rows, limit=limit, count=count, summary=summary)
+
+
+async def update_entry(
+    *,
+    session: AsyncSession,
+    user: User | UserPublic,
+    id: uuid.UUID,
+    request_data: EntryUpdate,
+) -> Any:
+    """
+    Partially update an entry owned by the given user.
+
+    Args:
+        session: Async database session.
+        user: The user attempting the update.
+        id: ID of the entry to update.
+        request_data: Pydantic model containing the updated fields.
+
+    Returns:
+        The updated `Entry` instance, or `None` if the entry does not exist
+        or is not owned by the user.
+    """
+    current_entry = await session.get(Entry, id)
+    if not current_entry or current_entry.user_id != user.id:
+        return None
+    old_created_at, old_mood = current_entry.created_at, current_entry.mood
+    new_data = request_data.model_dump(exclude_unset=True)
+    current_entry.sqlmodel_update(new_data)
+    current_entry.updated_at = datetime.datetime.utcnow()
+    current_entry.change_seq = await session.run_sync(changes.reserve, user.id)
+    session.add(current_entry)
+    if "title" in new_data or "body" in new_data:
+        await session.run_sync(search.index_entry, current_entry)
+    await session.run_sync(rollups.move_entry, current_entry, old_created_at, old_mood)
+    await session.commit()
+    await session.refresh(current_entry)
+    entry_events.publish(user.id, "updated", current_entry)
+    return current_entry
+
+
+async def delete_entry(
+    *, session: AsyncSession, user: User | UserPublic, entry: Entry
+) -> None:
+    """
+    Delete an entry if it is owned by the given user.
+
+    Args:
+        session: Async database session.
+        user: The user attempting the delete.
+        entry: The entry instance to delete.
+    """
+    if entry.user_id != user.id:
+        return
+    await session.run_sync(search.remove_entry, entry.id)
+    await session.run_sync(changes.record_delete, entry)
+    await session.delete(entry)
+    await session.run_sync(
+        rollups.remove_entry, entry.user_id, entry.created_at, entry.mood
+    )
+    await session.commit()
+    entry_events.publish(user.id, "deleted", {"id": entry.id})
@@ -0,0 +1,258 @@
+"""
+Streaming import and export of journal entries as NDJSON and CSV.
+
+Uploads are consumed chunk by chunk. Each record is validated as it
+arrives and valid ones are inserted in fixed-size batches, so memory use
+stays flat regardless of file size. Parsing is plain synchronous code
+meant to run on a worker thread; `iter_stream_from_thread` bridges an
+async request body into it.
+
+Exports are generated batch by batch from a streaming query, optionally
+gzip-compressed on the fly, so the first bytes go out as soon as the first
+batch is fetched. Exported files can be imported again unchanged.
+"""
+
+import codecs
+import csv
+import io
+import json
+import zlib
+from collections.abc import AsyncIterator, Iterable, Iterator
+from typing import Any, Literal
+import uuid
+
+import anyio.from_thread
+from pydantic import ValidationError
+from sqlalchemy.engine import Engine
+from sqlmodel import Session
+
+from app import crud
+from app.models import EntryImport, EntryImportError, EntryImportReport
+
+EntryFormat = Literal["ndjson", "csv"]
+
+
+def iter_stream_from_thread(stream: AsyncIterator[bytes]) -> Iterator[bytes]:
+    """
+    Iterate an async byte stream from a worker thread.
+
+    Each chunk is pulled on the event loop via `anyio.from_thread`, so the
+    calling thread must have been started by AnyIO (e.g. `run_in_threadpool`).
+    """
+
+    async def next_chunk() -> bytes:
+        return await stream.__anext__()
+
+    while True:
+        try:
+            chunk = anyio.from_thread.run(next_chunk)
+        except StopAsyncIteration:
+            return
+        if chunk:
+            yield chunk
+
+
+def iter_lines(chunks: Iterable[bytes]) -> Iterator[str]:
+    """
+    Decode UTF-8 byte chunks into lines, keeping their `\\n` endings.
+
+    A leading byte order mark is dropped. Lines are only split on `\\n`, so
+    other Unicode line separators inside values are preserved.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+def iter_records(
+    lines: Iterable[str], fmt: EntryFormat
+) -> Iterator[tuple[int, dict[str, Any] | None, str | None]]:
+    """
+    Parse lines into raw records.
+
+    NDJSON blank lines are skipped. CSV input must start with a header row;
+    empty CSV cells are treated as missing values.
+
+    Yields:
+        `(row, record, error)` tuples where `row` is the 1-based record
+        number and exactly one of `record` / `error` is set.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        for row, record in enumerate(reader, start=1):
+            if None in record:
+                yield row, None, "Too many columns"
+                continue
+            yield row, {k: v for k, v in record.items() if v not in ("", None)}, None
+        return
+
+    row = 0
+    for line in lines:
+        if not line.strip():
+            continue
+        row += 1
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as exc:
+            yield row, None, f"Invalid JSON: {exc.msg}"
+            continue
+        if not isinstance(record, dict):
+            yield row, None, "Expected a JSON object"
+            continue
+        yield row, record, None
+
+
+def _describe(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc']) or 'entry'}: {error['msg']}"
+        for error in exc.errors()
+    )
+
+
+def import_entries(
+    *,
+    session: Session,
+    user_id: uuid.UUID,
+    chunks: Iterable[bytes],
+    fmt: EntryFormat,
+    batch_size: int,
+    max_errors: int,
+) -> EntryImportReport:
+    """
+    Validate and insert entries streamed from an NDJSON or CSV upload.
+
+    Valid records are inserted `batch_size` at a time, one transaction per
+    batch. Invalid records are skipped and reported by row number; at most
+    `max_errors` of them are listed to keep the report bounded.
+
+    Args:
+        session: Database session.
+        user_id: ID of the user who will own the imported entries.
+        chunks: Raw upload bytes, in arbitrary chunk sizes.
+        fmt: Upload format, `ndjson` or `csv`.
+        batch_size: Number of entries per insert batch.
+        max_errors: Maximum number of row errors included in the report.
+
+    Returns:
+        An `EntryImportReport` with imported/failed counts and row errors.
+    """
+    report = EntryImportReport(imported=0, failed=0, errors=[])
+    batch: list[EntryImport] = []
+
+    def record_error(row: int, message: str) -> None:
+        report.failed += 1
+        if len(report.errors) < max_errors:
+            report.errors.append(EntryImportError(row=row, error=message))
+        else:
+            report.errors_truncated = True
+
+    try:
+        for row, record, error in iter_records(iter_lines(chunks), fmt):
+            if error is not None:
+                record_error(row, error)
+                continue
+            try:
+                batch.append(EntryImport.model_validate(record))
+            except ValidationError as exc:
+                record_error(row, _describe(exc))
+                continue
+            if len(batch) >= batch_size:
+                report.imported += crud.bulk_create_entries(
+                    session=session, user_id=user_id, entries=batch
+                )
+                batch = []
+    except (csv.Error, UnicodeDecodeError) as exc:
+        # The rest of the upload cannot be parsed; keep what was imported
+        record_error(report.imported + report.failed + len(batch) + 1, str(exc))
+
+    if batch:
+        report.imported += crud.bulk_create_entries(
+            session=session, user_id=user_id, entries=batch
+        )
+    return report
+
+
+# Columns written by exports, in CSV column order
+EXPORT_COLUMNS = ("id", "mood", "title", "body", "created_at", "updated_at")
+
+
+def _format_batch(rows: Iterable[Any], fmt: EntryFormat) -> str:
+    if fmt == "csv":
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator="\n").writerows(
+            (
+                row.id,
+                row.mood,
+                row.title,
+                row.body if row.body is not None else "",
+                row.created_at.isoformat(),
+                row.updated_at.isoformat(),
+            )
+            for row in rows
+        )
+        return buffer.getvalue()
+    return "".join(
+        json.dumps(
+            {
+                "id": str(row.id),
+                "mood": row.mood,
+                "title": row.title,
+                "body": row.body,
+                "created_at": row.created_at.isoformat(),
+                "updated_at": row.updated_at.isoformat(),
+            },
+            ensure_ascii=False,
+        )
+        + "\n"
+        for row in rows
+    )
+
+
+def export_entries(
+    *,
+    bind: Engine,
+    user_id: uuid.UUID,
+    fmt: EntryFormat,
+    batch_size: int,
+    compress: bool = False,
+) -> Iterator[bytes]:
+    """
+    Generate a user's entries as NDJSON or CSV, one batch at a time.
+
+    The generator opens its own session on `bind`, because it keeps running
+    after the request's dependencies have been cleaned up.
+
+    Args:
+        bind: Engine to read the entries from.
+        user_id: ID of the user whose entries to export.
+        fmt: Output format, `ndjson` or `csv`.
+        batch_size: Number of entries fetched and encoded per chunk.
+        compress: Whether to gzip the output on the fly.
+
+    Yields:
+        Encoded (and optionally gzip-compressed) chunks of the export.
+    """
+    compressor = zlib.compressobj(wbits=31) if compress else None
+
+    def encode(text: str) -> bytes:
+        data = text.encode()
+        return compressor.compress(data) if compressor else data
+
+    if fmt == "csv":
+        yield encode(",".join(EXPORT_COLUMNS) + "\n")
+    with Session(bind) as session:
+        for rows in crud.iter_entry_batches_by_user_id(
+            session=session, user_id=user_id, batch_size=batch_size
+        ):
+            chunk = encode(_format_batch(rows, fmt))
+            if chunk:
+                yield chunk
+    if compressor:
+        yield compressor.flush()
@@ -0,0 +1,275 @@
+"""
+Group commit ("write-behind") for entry creation.
+
+When `GROUP_COMMIT_ENABLED` is set, `POST /entries` hands its row to a
+background writer instead of committing on its own. The writer collects
+the rows submitted while it waits, up to `GROUP_COMMIT_MAX_DELAY_MS` after
+the first one or until `GROUP_COMMIT_MAX_ROWS` have arrived. It then
+inserts them, updates their search index rows and rollups, and commits
+them in a single transaction. One fsync now covers many requests instead
+of one each.
+
+Durability is unchanged: each caller waits on its own future, which only
+resolves once the transaction holding its row has committed. If a batch
+fails, its rows are retried one by one so that only the offending row's
+caller sees the error.
+
+Each writer queues at most `GROUP_COMMIT_QUEUE_SIZE` rows; beyond that,
+and while shutting down, `GroupCommitBusy` is raised so the route can
+answer 503 rather than pile up rows behind a slow database. Callers wait
+at most `GROUP_COMMIT_TIMEOUT_SECONDS` for their commit.
+
+There is one writer thread per shard database, started on first use.
+IDs and timestamps are assigned when the row is built (see
+`crud.new_entry_row`), so responses need no read-back.
+"""
+
+import asyncio
+import concurrent.futures
+import contextlib
+import logging
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from typing import Any
+
+from sqlalchemy.engine import Engine
+from sqlmodel import Session
+
+from app import crud
+from app.core import metrics
+from app.core.config import settings
+from app.core.db import note_write
+from app.core.events import entry_events
+from app.models import Entry, EntryCreate
+
+logger = logging.getLogger(__name__)
+
+_Item = tuple[dict[str, Any], Future]
+
+
+class GroupCommitBusy(Exception):
+    """
+    Raised when a writer's queue is full or the writers are shutting down.
+    """
+
+
+class GroupCommitTimeout(Exception):
+    """
+    Raised when a row was not committed within `GROUP_COMMIT_TIMEOUT_SECONDS`.
+
+    The row is dropped if its batch has not started yet, but may still be
+    committed if it has.
+    """
+
+
+def _fail(future: Future, exc: BaseException) -> None:
+    # The caller may cancel a queued row concurrently (on timeout)
+    if not future.done():
+        with contextlib.suppress(concurrent.futures.InvalidStateError):
+            future.set_exception(exc)
+
+
+class GroupCommitWriter:
+    """
+    Background thread that commits submitted entry rows in batches.
+    """
+
+    def __init__(self, bind: Engine, max_delay: float, max_rows: int, queue_size: int):
+        self.bind = bind
+        self.max_delay = max_delay
+        self.max_rows = max_rows
+        self._queue: queue.Queue[_Item | None] = queue.Queue(maxsize=queue_size)
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name="moodmap-group-commit", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, row: dict[str, Any]) -> Future:
+        """
+        Queue a row for the next batch.
+
+        Raises:
+            GroupCommitBusy: If the queue is full or the writer is closing.
+
+        Returns:
+            A future that resolves once the row is committed, or raises the
+            error that prevented it from being written.
+        """
+        if self._closed:
+            raise GroupCommitBusy()
+        future: Future = Future()
+        try:
+            self._queue.put_nowait((row, future))
+        except queue.Full:
+            raise GroupCommitBusy() from None
+        return future
+
+    def close(self) -> None:
+        """
+        Commit the rows already queued, then stop the writer thread.
+
+        Rows that raced in behind the stop marker are failed with
+        `GroupCommitBusy`.
+        """
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not None:
+                _fail(item[1], GroupCommitBusy())
+
+    def _collect(self, first: _Item) -> tuple[list[_Item], bool]:
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_rows:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch, stop = [item], False
+            try:
+                batch, stop = self._collect(item)
+                # Skip rows whose callers have already given up
+                batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+                if batch:
+                    self._flush(batch)
+            except Exception as exc:
+                # Never let the thread die: fail this batch's callers instead
+                logger.exception("Group commit writer failed a batch")
+                for _, future in batch:
+                    _fail(future, exc)
+            if stop:
+                return
+
+    def _flush(self, batch: list[_Item]) -> None:
+        start = time.perf_counter()
+        try:
+            with Session(self.bind) as session:
+                crud.insert_entry_rows(session, [row for row, _ in batch])
+                session.commit()
+        except Exception as exc:
+            if len(batch) == 1:
+                batch[0][1].set_exception(exc)
+                return
+            for item in batch:
+                self._flush([item])
+            return
+        for _, future in batch:
+            future.set_result(None)
+        metrics.group_commit_batch_rows.observe(len(batch))
+        metrics.group_commit_seconds.observe(time.perf_counter() - start)
+
+
+_writers: dict[Engine, GroupCommitWriter] = {}
+_writers_lock = threading.Lock()
+_closed = False
+
+
+def get_writer(bind: Engine) -> GroupCommitWriter:
+    """
+    Return the writer for a database, starting it on first use.
+
+    Raises:
+        GroupCommitBusy: If the writers are shutting down.
+    """
+    writer = _writers.get(bind)
+    if writer is None:
+        with _writers_lock:
+            if _closed:
+                raise GroupCommitBusy()
+            writer = _writers.get(bind)
+            if writer is None:
+                writer = _writers[bind] = GroupCommitWriter(
+                    bind,
+                    max_delay=settings.GROUP_COMMIT_MAX_DELAY_MS / 1000,
+                    max_rows=settings.GROUP_COMMIT_MAX_ROWS,
+                    queue_size=settings.GROUP_COMMIT_QUEUE_SIZE,
+                )
+    return writer
+
+
+def create_entry(*, bind: Engine, user_id: uuid.UUID, entry_to_create: EntryCreate) -> Entry:
+    """
+    Create an entry through the group commit writer, blocking until committed.
+
+    Args:
+        bind: Engine of the shard holding the user's entries.
+        user_id: ID of the owning user.
+        entry_to_create: Validated entry creation payload.
+
+    Raises:
+        GroupCommitBusy: If the writer's queue is full or shutting down.
+        GroupCommitTimeout: If the row was not committed in time.
+
+    Returns:
+        The newly created `Entry` instance (not attached to a session).
+    """
+    row = crud.new_entry_row(user_id, entry_to_create)
+    future = get_writer(bind).submit(row)
+    try:
+        future.result(timeout=settings.GROUP_COMMIT_TIMEOUT_SECONDS)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        raise GroupCommitTimeout() from None
+    note_write(user_id)
+    entry_events.publish(user_id, "created", row)
+    return Entry(**row)
+
+
+async def create_entry_async(
+    *, bind: Engine, user_id: uuid.UUID, entry_to_create: EntryCreate
+) -> Entry:
+    """
+    Async counterpart of `create_entry`; awaits the commit without blocking
+    the event loop.
+    """
+    row = crud.new_entry_row(user_id, entry_to_create)
+    future = get_writer(bind).submit(row)
+    try:
+        # Cancelling the wrapper on timeout also cancels the queued row
+        await asyncio.wait_for(
+            asyncio.wrap_future(future), settings.GROUP_COMMIT_TIMEOUT_SECONDS
+        )
+    except asyncio.TimeoutError:
+        raise GroupCommitTimeout() from None
+    note_write(user_id)
+    entry_events.publish(user_id, "created", row)
+    return Entry(**row)
+
+
+def shutdown() -> None:
+    """
+    Flush and stop every writer; called when the app shuts down.
+
+    New submissions are refused with `GroupCommitBusy` from here on, so no
+    writer is started again while the existing ones drain.
+    """
+    global _closed
+    with _writers_lock:
+        _closed = True
+        writers = list(_writers.values())
+    for writer in writers:
+        writer.close()
+    with _writers_lock:
+        _writers.clear()
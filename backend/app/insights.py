@@ -0,0 +1,213 @@
+"""
+Mood insights for `GET /entries/insights`, cached per user.
+
+Only the `(created_at, mood)` columns of a user's entries are loaded, as
+NumPy arrays (see `crud.get_mood_series_by_user_id`). `build_insights`
+then computes every statistic with the vectorised helpers in
+`app.analytics` over dense per-day arrays, with no Python loop over
+entries.
+
+Results are cached per process in a bounded LRU map keyed by the user and
+the request parameters (see `app.core.insights_cache`). Each cached
+result is stamped with the user's change sequence
+(`app.changes.current_seq`) and local date. It is served only while both
+are unchanged, so any write to the user's entries, or midnight passing,
+invalidates it. Reading the watermark is a single
+primary-key lookup, which also makes it a cheap ETag.
+
+The cache is per process; with several server workers each computes its
+own copy.
+"""
+
+import datetime
+import math
+import uuid
+from zoneinfo import ZoneInfo
+
+import numpy as np
+from sqlmodel import Session
+
+from app import analytics, changes, crud
+from app.core.insights_cache import insights_cache
+from app.models import (
+    MoodDropPublic,
+    MoodInsightsPublic,
+    MoodStreaksPublic,
+    MoodVolatilityPublic,
+    RollingMoodPublic,
+    SeasonalMoodPublic,
+)
+
+# Most recent sharp drops returned
+MAX_DROPS = 20
+
+
+def _optional(value: float) -> float | None:
+    return None if math.isnan(value) else value
+
+
+def _day(first: np.datetime64, offset: int) -> datetime.date:
+    return (first + np.timedelta64(offset, "D")).astype(datetime.date)
+
+
+def build_insights(
+    timestamps: np.ndarray,
+    moods: np.ndarray,
+    *,
+    tz: ZoneInfo | None,
+    today: datetime.date,
+    drop_threshold: float,
+    max_points: int,
+) -> MoodInsightsPublic:
+    """
+    Compute the insights for one user's history.
+
+    Args:
+        timestamps: `datetime64[us]` array of UTC entry timestamps.
+        moods: Integer array of mood scores aligned with `timestamps`.
+        tz: Time zone that days and hours are taken in, or `None` for UTC.
+        today: The current date in `tz`, for the current streak and the
+            recent volatility window.
+        drop_threshold: Minimum fall below the preceding week's average for
+            a day to count as a sharp drop.
+        max_points: Maximum number of rolling average points (LTTB
+            downsampled).
+
+    Returns:
+        The insights as a `MoodInsightsPublic` model.
+    """
+    timezone = str(tz) if tz else "UTC"
+    local = analytics.to_local_time(timestamps, tz)
+    season = analytics.seasonality(local, moods)
+    by_weekday = [
+        SeasonalMoodPublic(key=key, avg=_optional(avg), n=n)
+        for key, (avg, n) in enumerate(
+            zip(season["weekday_avg"].tolist(), season["weekday_n"].tolist())
+        )
+    ]
+    by_hour = [
+        SeasonalMoodPublic(key=key, avg=_optional(avg), n=n)
+        for key, (avg, n) in enumerate(
+            zip(season["hour_avg"].tolist(), season["hour_n"].tolist())
+        )
+    ]
+    if timestamps.size == 0:
+        return MoodInsightsPublic(
+            count=0,
+            timezone=timezone,
+            by_weekday=by_weekday,
+            by_hour=by_hour,
+            rolling=[],
+            streaks=MoodStreaksPublic(
+                current=0, longest=0, longest_start=None, longest_end=None
+            ),
+            volatility=MoodVolatilityPublic(std=None, std_30d=None, mean_abs_change=None),
+            drops=[],
+        )
+
+    first, counts, sums = analytics.daily_totals(local, moods)
+    today_offset = int((np.datetime64(today, "D") - first) // np.timedelta64(1, "D"))
+
+    # Rolling averages as of each day with entries, downsampled for charts
+    logged = np.flatnonzero(counts)
+    avg_7d = analytics.rolling_averages(counts, sums, 7)[logged]
+    avg_30d = analytics.rolling_averages(counts, sums, 30)[logged]
+    keep = analytics.lttb_indices(logged, avg_30d, max_points)
+    days = first + logged[keep].astype("timedelta64[D]")
+    rolling = [
+        RollingMoodPublic(day=day, avg_7d=week, avg_30d=month)
+        for day, week, month in zip(
+            days.tolist(), avg_7d[keep].tolist(), avg_30d[keep].tolist()
+        )
+    ]
+
+    runs = analytics.streaks(counts, today_offset)
+    spread = analytics.volatility(counts, sums, today_offset)
+    drops = analytics.mood_drops(counts, sums, drop_threshold)
+    recent_drops = slice(None, -MAX_DROPS - 1, -1)
+    return MoodInsightsPublic(
+        count=int(timestamps.size),
+        timezone=timezone,
+        by_weekday=by_weekday,
+        by_hour=by_hour,
+        rolling=rolling,
+        streaks=MoodStreaksPublic(
+            current=runs["current"],
+            longest=runs["longest"],
+            longest_start=_day(first, runs["longest_start"]),
+            longest_end=_day(first, runs["longest_end"]),
+        ),
+        volatility=MoodVolatilityPublic(
+            std=_optional(spread["std"]),
+            std_30d=_optional(spread["recent_std"]),
+            mean_abs_change=_optional(spread["mean_abs_change"]),
+        ),
+        drops=[
+            MoodDropPublic(day=_day(first, offset), avg=avg, baseline=baseline, drop=drop)
+            for offset, avg, baseline, drop in zip(
+                drops["offset"][recent_drops].tolist(),
+                drops["avg"][recent_drops].tolist(),
+                drops["baseline"][recent_drops].tolist(),
+                drops["drop"][recent_drops].tolist(),
+            )
+        ],
+    )
+
+
+def watermark(
+    *, session: Session, user_id: uuid.UUID, tz: ZoneInfo | None = None
+) -> tuple[int, datetime.date]:
+    """
+    Return the state a user's insights depend on besides the parameters.
+
+    Args:
+        session: Database session on the user's shard.
+        user_id: ID of the user.
+        tz: Optional time zone the insights are computed in.
+
+    Returns:
+        The user's change sequence number and the current date in `tz`.
+    """
+    today = datetime.datetime.now(tz or datetime.timezone.utc).date()
+    return changes.current_seq(session, user_id), today
+
+
+def get_insights(
+    *,
+    session: Session,
+    user_id: uuid.UUID,
+    tz: ZoneInfo | None = None,
+    drop_threshold: float = 3.0,
+    max_points: int = 365,
+    mark: tuple[int, datetime.date] | None = None,
+) -> MoodInsightsPublic:
+    """
+    Return a user's insights, from the cache while their entries are unchanged.
+
+    Args:
+        session: Database session on the user's shard.
+        user_id: ID of the user whose history to analyse.
+        tz: Optional time zone for days and hours.
+        drop_threshold: Minimum fall that counts as a sharp drop.
+        max_points: Maximum number of rolling average points.
+        mark: The user's `watermark`, if the caller already read it.
+
+    Returns:
+        The insights as a `MoodInsightsPublic` model.
+    """
+    if mark is None:
+        mark = watermark(session=session, user_id=user_id, tz=tz)
+    key = (user_id, str(tz) if tz else None, drop_threshold, max_points)
+    insights = insights_cache.get(key, mark)
+    if insights is None:
+        timestamps, moods = crud.get_mood_series_by_user_id(session=session, user_id=user_id)
+        insights = build_insights(
+            timestamps,
+            moods,
+            tz=tz,
+            today=mark[1],
+            drop_threshold=drop_threshold,
+            max_points=max_points,
+        )
+        insights_cache.set(key, mark, insights)
+    return insights
@@ -1,16 +1,19 @@
 """
 Main FastAPI application for MoodMap.
 
-This module configures the FastAPI app instance, sets up CORS middleware
-for allowed frontend origins, initializes the database on startup, and
-mounts the main API router.
+This module configures the FastAPI app instance, sets up CORS and metrics
+middleware, checks the database schema on startup, and mounts the main API
+router.
 """
 
 from fastapi import FastAPI
 from starlette.middleware.cors import CORSMiddleware
+from app import group_commit
 from app.api.main import api_router
-from app.core.db import init_db
+from app.api.middleware import AdmissionMiddleware, MetricsMiddleware, TimingMiddleware
+from app.core.db import async_engine, init_db
 from app.core.config import settings
+from app.core.security import password_hasher
 
 # Create the FastAPI app instance
 app = FastAPI()
@@ -26,15 +29,33 @@ if settings.all_cors_origins:
         allow_headers=["*"],
     )
 
+# Server-Timing headers and the opt-in request profiler
+app.add_middleware(TimingMiddleware)
+
+# Per-route-class concurrency limits; sheds load with 503s when overloaded
+app.add_middleware(AdmissionMiddleware)
+
+# Request counts and latencies for /utils/metrics.
+# Added last so it wraps everything else, including CORS preflights.
+app.add_middleware(MetricsMiddleware)
+
 # Simple health / sanity-check endpoint
 @app.get("/")
 async def root():
     return {"message": "Welcome to MoodMap"}
 
-# Run database initialization (e.g., create tables) when the app starts up
+# Check the database schema version when the app starts up
 @app.on_event("startup")
 def on_startup():
     init_db()
 
+# Stop the bcrypt worker processes and flush group commits when the app shuts down
+@app.on_event("shutdown")
+async def on_shutdown():
+    password_hasher.shutdown()
+    group_commit.shutdown()
+    if async_engine is not None:
+        await async_engine.dispose()
+
 # Register the main API router with all sub-routes (users, login, entries, etc.)
 app.include_router(api_router)
@@ -0,0 +1,329 @@
+"""
+Versioned schema migrations for MoodMap.
+
+The applied schema version is recorded in a `schema_version` table. On
+startup the app only reads that version (`check_schema`), a single
+indexed query, and refuses to start if migrations are pending, unless
+`DATABASE_AUTO_MIGRATE` is set (handy for local development and tests).
+Migrations are otherwise applied as a separate deployment step, before
+the new workers start:
+
+    python -m app.migrations upgrade
+    python -m app.migrations status
+
+Both commands cover every shard database (see `app.core.sharding`).
+
+Each migration runs at most once, in version order. Transactional
+migrations run inside a transaction together with recording their
+version. Online migrations (`transactional=False`) run in autocommit
+mode, so indexes can be built with `CREATE INDEX CONCURRENTLY` on
+Postgres without blocking writes. They must be safe to re-run (e.g. `IF
+NOT EXISTS`) because a failure can leave them partly applied.
+
+Version 1 creates the tables from the current models, so a fresh database
+already has every later column and index. Later migrations must
+therefore check before adding anything, too.
+
+On Postgres, concurrent `upgrade` runs are serialised with an advisory
+lock. On SQLite, run `upgrade` once before starting the server.
+"""
+
+import argparse
+import datetime
+import re
+from collections.abc import Callable
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Index,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    func,
+    inspect,
+    select,
+    text,
+)
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.schema import CreateIndex
+from sqlmodel import SQLModel
+
+from app.core.config import settings
+
+# Kept out of SQLModel.metadata so creating the app tables never touches it
+schema_version = Table(
+    "schema_version",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("name", String(255), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+# Arbitrary key for the Postgres advisory lock held while migrating
+ADVISORY_LOCK_KEY = 0x6D6F6F64
+
+_CREATE_INDEX = re.compile(r"^CREATE (UNIQUE )?INDEX ")
+
+
+class Migration:
+    """
+    A single schema change.
+
+    Args:
+        version: Position in the migration order, starting at 1.
+        name: Short description recorded in `schema_version`.
+        apply: Function performing the change on a connection.
+        transactional: Run inside a transaction; `False` runs the migration
+            in autocommit mode so it can build indexes online.
+    """
+
+    def __init__(
+        self,
+        version: int,
+        name: str,
+        apply: Callable[[Connection], None],
+        transactional: bool = True,
+    ):
+        self.version = version
+        self.name = name
+        self.apply = apply
+        self.transactional = transactional
+
+
+class SchemaOutOfDateError(RuntimeError):
+    """
+    Raised on startup when the database is behind the code's schema version.
+    """
+
+
+def create_index(connection: Connection, index: Index) -> None:
+    """
+    Create an index if it does not exist yet.
+
+    On Postgres the index is built with `CREATE INDEX CONCURRENTLY` when the
+    connection is in autocommit mode (i.e. from an online migration), so
+    reads and writes to the table continue while it builds.
+    """
+    ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=connection.dialect))
+    autocommit = connection.get_execution_options().get("isolation_level") == "AUTOCOMMIT"
+    if connection.dialect.name == "postgresql" and autocommit:
+        ddl = _CREATE_INDEX.sub(r"CREATE \1INDEX CONCURRENTLY ", ddl, count=1)
+    connection.exec_driver_sql(ddl)
+
+
+def _baseline(connection: Connection) -> None:
+    import app.models  # noqa: F401  Register the tables on SQLModel.metadata
+
+    SQLModel.metadata.create_all(connection)
+
+
+def _entry_indexes(*names: str) -> Callable[[Connection], None]:
+    # Databases created before these indexes were added to the models only
+    # got the indexes that existed when their tables were first created.
+    # Each migration names its indexes, as later ones may need later columns.
+    def apply(connection: Connection) -> None:
+        from app.models import Entry
+
+        for index in Entry.__table__.indexes:
+            if index.name in names:
+                create_index(connection, index)
+
+    return apply
+
+
+def _search_index(connection: Connection) -> None:
+    from app.search import create_search_index
+
+    create_search_index(connection)
+
+
+def _rollups(connection: Connection) -> None:
+    from app.rollups import backfill_rollups
+
+    backfill_rollups(connection)
+
+
+def _user_shard(connection: Connection) -> None:
+    columns = {column["name"] for column in inspect(connection).get_columns("user")}
+    if "shard" not in columns:
+        connection.execute(
+            text('ALTER TABLE "user" ADD COLUMN shard INTEGER NOT NULL DEFAULT 0')
+        )
+
+
+def _change_seqs(connection: Connection) -> None:
+    from app.changes import backfill_change_seqs
+    from app.models import EntryTombstone
+
+    for table in ("entry", "user"):
+        columns = {column["name"] for column in inspect(connection).get_columns(table)}
+        if "change_seq" not in columns:
+            connection.execute(
+                text(f'ALTER TABLE "{table}" ADD COLUMN change_seq INTEGER NOT NULL DEFAULT 0')
+            )
+    EntryTombstone.__table__.create(connection, checkfirst=True)
+    backfill_change_seqs(connection)
+
+
+# Every migration, in order; append new ones at the end
+MIGRATIONS = (
+    Migration(1, "create tables", _baseline),
+    Migration(
+        2,
+        "entry list and watermark indexes",
+        _entry_indexes("ix_entry_user_id_created_at_id", "ix_entry_user_id_updated_at"),
+        transactional=False,
+    ),
+    Migration(3, "full-text search index", _search_index),
+    Migration(4, "backfill daily mood rollups", _rollups),
+    Migration(5, "user shard column", _user_shard),
+    Migration(
+        6,
+        "entry mood filter index",
+        _entry_indexes("ix_entry_user_id_mood_created_at"),
+        transactional=False,
+    ),
+    Migration(7, "entry change sequence and delete tombstones", _change_seqs),
+    Migration(
+        8,
+        "entry change sequence index",
+        _entry_indexes("ix_entry_user_id_change_seq"),
+        transactional=False,
+    ),
+)
+
+# Schema version this code expects
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def current_version(bind: Engine | Connection) -> int:
+    """
+    Read the database's schema version, 0 if it has never been migrated.
+    """
+    statement = select(func.max(schema_version.c.version))
+    try:
+        if isinstance(bind, Connection):
+            return bind.execute(statement).scalar() or 0
+        with bind.connect() as connection:
+            return connection.execute(statement).scalar() or 0
+    except (OperationalError, ProgrammingError):
+        # No schema_version table yet
+        return 0
+
+
+def pending_migrations(bind: Engine | Connection) -> list[Migration]:
+    """
+    Return the migrations not yet applied to the database, in order.
+    """
+    version = current_version(bind)
+    return [migration for migration in MIGRATIONS if migration.version > version]
+
+
+def _record(connection: Connection, migration: Migration) -> None:
+    connection.execute(
+        schema_version.insert().values(
+            version=migration.version,
+            name=migration.name,
+            applied_at=datetime.datetime.utcnow(),
+        )
+    )
+
+
+def upgrade(bind: Engine, log: Callable[[str], None] | None = None) -> list[Migration]:
+    """
+    Apply all pending migrations.
+
+    Args:
+        bind: Engine of the database to migrate.
+        log: Called with a message before each migration, if given.
+
+    Returns:
+        The migrations that were applied.
+    """
+    with bind.connect() as lock_connection:
+        is_postgres = lock_connection.dialect.name == "postgresql"
+        if is_postgres:
+            lock_connection.execute(
+                text("SELECT pg_advisory_lock(:key)"), {"key": ADVISORY_LOCK_KEY}
+            )
+            lock_connection.commit()
+        try:
+            with bind.begin() as connection:
+                schema_version.create(connection, checkfirst=True)
+
+            applied = []
+            # Re-read under the lock in case another process just migrated
+            for migration in pending_migrations(bind):
+                if log is not None:
+                    log(f"Applying {migration.version}: {migration.name}")
+                if migration.transactional:
+                    with bind.begin() as connection:
+                        migration.apply(connection)
+                        _record(connection, migration)
+                else:
+                    with bind.connect() as connection:
+                        connection.execution_options(isolation_level="AUTOCOMMIT")
+                        migration.apply(connection)
+                    with bind.begin() as connection:
+                        _record(connection, migration)
+                applied.append(migration)
+            return applied
+        finally:
+            if is_postgres:
+                lock_connection.execute(
+                    text("SELECT pg_advisory_unlock(:key)"), {"key": ADVISORY_LOCK_KEY}
+                )
+                lock_connection.commit()
+
+
+def check_schema(bind: Engine) -> None:
+    """
+    Make sure the database schema is up to date before serving requests.
+
+    Applies pending migrations when `DATABASE_AUTO_MIGRATE` is set.
+
+    Raises:
+        SchemaOutOfDateError: If migrations are pending and auto-migration
+            is disabled.
+    """
+    version = current_version(bind)
+    if version >= LATEST_VERSION:
+        return
+    if settings.DATABASE_AUTO_MIGRATE:
+        upgrade(bind)
+        return
+    raise SchemaOutOfDateError(
+        f"Database schema is at version {version}, expected {LATEST_VERSION}; "
+        "run `python -m app.migrations upgrade`"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Manage the MoodMap database schema.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    subcommands.add_parser("upgrade", help="Apply all pending migrations.")
+    subcommands.add_parser("status", help="Show the schema version and pending migrations.")
+    args = parser.parse_args()
+
+    from app.core.sharding import shards
+
+    for shard, shard_engine in enumerate(shards.engines):
+        prefix = f"[shard {shard}] " if shards.count > 1 else ""
+        if args.command == "upgrade":
+            applied = upgrade(shard_engine, log=lambda message: print(prefix + message))
+            print(
+                f"{prefix}Applied {len(applied)} migrations; "
+                f"schema is at version {LATEST_VERSION}"
+            )
+            continue
+
+        print(f"{prefix}Schema version {current_version(shard_engine)} (latest {LATEST_VERSION})")
+        for migration in pending_migrations(shard_engine):
+            print(f"{prefix}Pending {migration.version}: {migration.name}")
+
+
+if __name__ == "__main__":
+    main()
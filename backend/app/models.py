@@ -4,14 +4,22 @@ Pydantic/SQLModel models for MoodMap.
 Defines:
 - User models (DB model + create/update/public schemas)
 - Entry models (DB model + create/update/public schemas)
+- Daily mood rollup table and mood stats schemas
 - Container for paginated entry lists
+- Full-text search results
+- Delete tombstones and the delta sync change feed
+- Bulk import rows and reports
+- Aggregated mood time series for charts
+- Mood insights (seasonality, rolling averages, streaks, volatility, drops)
 - Auth token models for JWT-based authentication
 """
 
 import datetime
 import uuid
+from typing import Literal
 
 from pydantic import EmailStr, BaseModel
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel, Relationship
 
 
@@ -54,11 +62,16 @@ class User(UserBase, table=True):
     Inherits core profile fields from UserBase and adds:
     - UUID primary key
     - hashed_password
+    - the shard holding the user's entries (see `app.core.sharding`)
+    - the last change sequence number issued for their entries (see
+      `app.changes`)
     - created/updated timestamps
     - relationship to the user's journal entries
     """
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     hashed_password: str = Field(nullable=False)
+    shard: int = Field(default=0, nullable=False, sa_column_kwargs={"server_default": "0"})
+    change_seq: int = Field(default=0, nullable=False, sa_column_kwargs={"server_default": "0"})
     created_at: datetime.datetime = Field(default_factory=datetime.datetime.utcnow)
     updated_at: datetime.datetime = Field(default_factory=datetime.datetime.utcnow)
 
@@ -96,6 +109,16 @@ class EntryCreate(EntryBase):
     pass
 
 
+class EntryImport(EntryCreate):
+    """
+    Schema for a single entry in a bulk import.
+
+    Extends EntryCreate with an optional original creation time so entries
+    brought over from other journaling apps keep their dates.
+    """
+    created_at: datetime.datetime | None = None
+
+
 class EntryUpdate(SQLModel):
     """
     Partial update schema for an existing journal entry.
@@ -116,6 +139,7 @@ class Entry(EntryBase, table=True):
     - Foreign key to owning user
     - Relationship back to the User model
     - created_at / updated_at timestamps
+    - the per-user change sequence number of its last write
     """
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     user_id: uuid.UUID = Field(foreign_key="user.id", nullable=False, ondelete="CASCADE")
@@ -123,6 +147,67 @@ class Entry(EntryBase, table=True):
     user: User | None = Relationship(back_populates="entries")
     created_at: datetime.datetime = Field(default_factory=datetime.datetime.utcnow)
     updated_at: datetime.datetime = Field(default_factory=datetime.datetime.utcnow)
+    change_seq: int = Field(default=0, nullable=False, sa_column_kwargs={"server_default": "0"})
+
+
+# Composite index backing keyset pagination of a user's entries.
+# Matches the list ordering (newest first, ties broken by id) so a page is a
+# single index range scan instead of a sort over the user's whole history.
+Index(
+    "ix_entry_user_id_created_at_id",
+    Entry.user_id,
+    Entry.created_at.desc(),
+    Entry.id,
+)
+
+# Lets a user's change watermark (latest `updated_at`) be read with a single
+# index seek, which is what conditional GETs on entry lists check first.
+Index("ix_entry_user_id_updated_at", Entry.user_id, Entry.updated_at)
+
+# Serves mood-filtered entry lists ("bad days") by seeking to the user's
+# mood range instead of scanning their whole history. Date-only filters use
+# the `(user_id, created_at, id)` pagination index above.
+Index("ix_entry_user_id_mood_created_at", Entry.user_id, Entry.mood, Entry.created_at)
+
+# Lets delta sync read only the entries written since a client's last sync.
+Index("ix_entry_user_id_change_seq", Entry.user_id, Entry.change_seq)
+
+
+class EntryTombstone(SQLModel, table=True):
+    """
+    Record of a deleted entry, so delta sync can report the delete.
+
+    Stamped with the user's change sequence like entry writes (see
+    `app.changes`).
+    """
+    entry_id: uuid.UUID = Field(primary_key=True)
+    user_id: uuid.UUID = Field(foreign_key="user.id", nullable=False, ondelete="CASCADE")
+    change_seq: int = Field(nullable=False)
+    deleted_at: datetime.datetime = Field(default_factory=datetime.datetime.utcnow)
+
+
+Index(
+    "ix_entrytombstone_user_id_change_seq",
+    EntryTombstone.user_id,
+    EntryTombstone.change_seq,
+)
+
+
+class DailyMoodRollup(SQLModel, table=True):
+    """
+    Database model for a user's per-day mood aggregates.
+
+    Maintained incrementally by the CRUD layer in the same transaction as
+    the entry writes (see `app.rollups`), so stats over a user's history
+    cost O(days) instead of O(entries). `day` is the UTC date of the
+    entries' `created_at`.
+    """
+    user_id: uuid.UUID = Field(foreign_key="user.id", primary_key=True, ondelete="CASCADE")
+    day: datetime.date = Field(primary_key=True)
+    count: int = Field(nullable=False)
+    sum: int = Field(nullable=False)
+    min: int = Field(nullable=False)
+    max: int = Field(nullable=False)
 
 
 class EntryPublic(EntryBase):
@@ -142,10 +227,224 @@ class EntriesPublic(SQLModel):
     """
     Wrapper for a list of entries plus the total count.
 
-    Useful for list endpoints and pagination responses.
+    Useful for list endpoints and pagination responses. `next_cursor` is an
+    opaque token for fetching the following page, or `None` on the last page.
     """
     data: list[EntryPublic]
     count: int
+    next_cursor: str | None = None
+
+
+class EntrySummaryPublic(SQLModel):
+    """
+    Slim representation of a journal entry for list views and charts.
+
+    Omits the entry body, which is by far the largest column.
+    """
+    id: uuid.UUID
+    title: str
+    mood: int
+    created_at: datetime.datetime
+
+
+class EntrySummariesPublic(SQLModel):
+    """
+    Wrapper for a page of entry summaries plus the total count.
+    """
+    data: list[EntrySummaryPublic]
+    count: int
+    next_cursor: str | None = None
+
+
+class EntrySearchHit(SQLModel):
+    """
+    A single full-text search result.
+
+    `snippet` is an HTML excerpt: the entry text is escaped, and matched
+    terms are wrapped in `<mark>` tags, the only markup it contains.
+    """
+    id: uuid.UUID
+    title: str
+    mood: int
+    created_at: datetime.datetime
+    snippet: str
+    rank: float
+
+
+class EntrySearchResults(SQLModel):
+    """
+    A page of full-text search results, best matches first.
+
+    `next_offset` is the offset of the following page, or `None` on the last page.
+    """
+    data: list[EntrySearchHit]
+    next_offset: int | None = None
+
+
+class EntryChangePublic(SQLModel):
+    """
+    A single change in a user's delta sync feed.
+
+    `op` is `upsert` (the entry was created or updated; `entry` holds its
+    current state) or `delete` (`entry` is `None`).
+    """
+    seq: int
+    op: Literal["upsert", "delete"]
+    id: uuid.UUID
+    entry: EntryPublic | None = None
+
+
+class EntryChangesPublic(SQLModel):
+    """
+    A page of changes to a user's entries, oldest first.
+
+    Pass `next_since` as `since` to fetch the following page, or on the
+    next sync once `has_more` is false.
+    """
+    data: list[EntryChangePublic]
+    next_since: int
+    has_more: bool
+
+
+class EntryImportError(SQLModel):
+    """
+    A single rejected row from a bulk import.
+    """
+    # 1-based record number within the uploaded file (excluding CSV header)
+    row: int
+    error: str
+
+
+class EntryImportReport(SQLModel):
+    """
+    Outcome of a bulk entry import.
+
+    `errors` lists rejected rows up to a configured limit; `errors_truncated`
+    is set when more rows failed than are listed.
+    """
+    imported: int
+    failed: int
+    errors: list[EntryImportError]
+    errors_truncated: bool = False
+
+
+class DailyMoodPublic(SQLModel):
+    """
+    Mood statistics for a single (UTC) day.
+    """
+    day: datetime.date
+    count: int
+    avg: float
+    min: int
+    max: int
+
+
+class MoodStatsPublic(SQLModel):
+    """
+    Mood statistics over a date range, with a per-day breakdown.
+
+    The overall `avg`, `min` and `max` are `None` when the range has no entries.
+    """
+    days: list[DailyMoodPublic]
+    count: int
+    avg: float | None
+    min: int | None
+    max: int | None
+
+
+class MoodBucketPublic(SQLModel):
+    """
+    Aggregated mood statistics for a single day/week/month bucket.
+    """
+    # Local start date of the bucket
+    bucket: datetime.date
+    avg: float
+    min: int
+    max: int
+    # Number of entries in the bucket
+    n: int
+
+
+class MoodTimeSeriesPublic(SQLModel):
+    """
+    Downsampled mood time series used by the dashboard chart.
+    """
+    data: list[MoodBucketPublic]
+    bucket: str
+    timezone: str
+
+
+class SeasonalMoodPublic(SQLModel):
+    """
+    Average mood for one weekday (0 = Monday) or hour of the day.
+
+    `avg` is `None` when there are no entries in that slot.
+    """
+    key: int
+    avg: float | None
+    n: int
+
+
+class RollingMoodPublic(SQLModel):
+    """
+    Trailing 7- and 30-day average mood as of a day with entries.
+    """
+    day: datetime.date
+    avg_7d: float
+    avg_30d: float
+
+
+class MoodStreaksPublic(SQLModel):
+    """
+    Runs of consecutive days with at least one entry.
+
+    `current` counts a run ending today or yesterday. `longest_start` and
+    `longest_end` are `None` without entries.
+    """
+    current: int
+    longest: int
+    longest_start: datetime.date | None
+    longest_end: datetime.date | None
+
+
+class MoodVolatilityPublic(SQLModel):
+    """
+    Spread of daily average moods; `None` with fewer than two days.
+
+    `std` covers the whole history and `std_30d` the last 30 days.
+    `mean_abs_change` is the average change between consecutive days with
+    entries.
+    """
+    std: float | None
+    std_30d: float | None
+    mean_abs_change: float | None
+
+
+class MoodDropPublic(SQLModel):
+    """
+    A day whose average mood fell sharply below the preceding week's.
+    """
+    day: datetime.date
+    avg: float
+    baseline: float
+    drop: float
+
+
+class MoodInsightsPublic(SQLModel):
+    """
+    Derived statistics over a user's whole mood history.
+
+    Days and hours are in `timezone`. `drops` lists the most recent
+    sharp drops first.
+    """
+    count: int
+    timezone: str
+    by_weekday: list[SeasonalMoodPublic]
+    by_hour: list[SeasonalMoodPublic]
+    rolling: list[RollingMoodPublic]
+    streaks: MoodStreaksPublic
+    volatility: MoodVolatilityPublic
+    drops: list[MoodDropPublic]
 
 
 class Token(BaseModel):
@@ -162,6 +461,7 @@ class TokenData(BaseModel):
     """
     Data extracted from a validated access token.
 
-    Currently only stores the user ID (subject) as a UUID.
+    Stores the user ID (subject) as a UUID and the expiry as a Unix timestamp.
     """
     sub: uuid.UUID | None = None
+    exp: int | None = None
@@ -0,0 +1,126 @@
+"""
+Query plan checks for MoodMap's indexed entry queries.
+
+`explain` returns the database's plan for a statement (`EXPLAIN QUERY
+PLAN` on SQLite, `EXPLAIN` on Postgres). `check_entry_list_plans` runs it
+over the filter shapes `GET /entries` supports and reports whether each
+one is answered by searching the index it was designed for, rather than
+by scanning the `entry` table or a whole index.
+
+Run it against a migrated database after changing entry queries or
+indexes; it exits non-zero if any check fails:
+
+    python -m app.query_plans
+
+On Postgres, sequential scans are disabled for the checks. A small table
+is otherwise often scanned anyway, which says nothing about whether the
+index is usable on a large one.
+"""
+
+import datetime
+import re
+import sys
+import uuid
+from typing import Any
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app import crud
+
+_BY_DATE = ("ix_entry_user_id_created_at_id",)
+_BY_MOOD = ("ix_entry_user_id_mood_created_at",)
+
+# Filter shapes of the entry list, with the indexes their page query may use
+ENTRY_LIST_CHECKS: list[tuple[str, dict[str, Any], tuple[str, ...]]] = [
+    ("unfiltered", {}, _BY_DATE),
+    ("oldest first", {"order": "asc"}, _BY_DATE),
+    (
+        "date range",
+        {
+            "created_from": datetime.datetime(2024, 1, 1),
+            "created_to": datetime.datetime(2024, 2, 1),
+        },
+        _BY_DATE,
+    ),
+    ("mood range", {"max_mood": 3}, _BY_MOOD),
+    (
+        # Either index narrows the search; which is cheaper depends on the data
+        "mood and date range",
+        {"min_mood": 8, "created_from": datetime.datetime(2024, 1, 1)},
+        _BY_DATE + _BY_MOOD,
+    ),
+]
+
+# Plan lines of a scan over the whole table or one of its indexes
+# (SQLite `SCAN entry ...`, Postgres `Seq Scan on entry`)
+_FULL_SCAN = re.compile(r"^\s*SCAN entry\b|Seq Scan on entry")
+
+
+def explain(bind: Engine, statement: Any) -> list[str]:
+    """
+    Return the query plan for a statement, one line per plan node.
+
+    Bound values are rendered inline, so the plan is the one the database
+    picks for these specific values.
+    """
+    with bind.connect() as connection:
+        sql = str(
+            statement.compile(
+                dialect=connection.dialect, compile_kwargs={"literal_binds": True}
+            )
+        )
+        if connection.dialect.name == "sqlite":
+            rows = connection.exec_driver_sql("EXPLAIN QUERY PLAN " + sql).all()
+            return [row[-1] for row in rows]
+        if connection.dialect.name == "postgresql":
+            connection.execute(text("SET LOCAL enable_seqscan = off"))
+        rows = connection.exec_driver_sql("EXPLAIN " + sql).all()
+        return [row[0] for row in rows]
+
+
+def check_entry_list_plans(bind: Engine) -> list[tuple[str, bool, list[str]]]:
+    """
+    Check that every entry list filter shape uses its intended index.
+
+    A check passes when the page query searches one of its indexes and
+    neither the page query nor its `COUNT(*)` scans the table.
+
+    Returns:
+        One `(name, passed, plan)` tuple per check, where `plan` holds the
+        page query's plan followed by the count query's.
+    """
+    user_id = uuid.uuid4()
+    results = []
+    for name, params, indexes in ENTRY_LIST_CHECKS:
+        order = params.get("order", "desc")
+        filters = crud.entry_filter_clauses(
+            **{key: value for key, value in params.items() if key != "order"}
+        )
+        page = crud.user_entries_page_statement(
+            user_id=user_id, limit=100, summary=True, filters=filters, order=order
+        )
+        page_plan = explain(bind, page)
+        count_plan = explain(bind, crud.count_entries_statement(user_id, *filters))
+        plan = page_plan + count_plan
+        passed = any(index in line for line in page_plan for index in indexes) and not any(
+            _FULL_SCAN.search(line) for line in plan
+        )
+        results.append((name, passed, plan))
+    return results
+
+
+def main() -> None:
+    from app.core.sharding import shards
+
+    failed = 0
+    for name, passed, plan in check_entry_list_plans(shards.directory):
+        print(f"{'ok  ' if passed else 'FAIL'} {name}")
+        for line in plan:
+            print(f"       {line}")
+        failed += not passed
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
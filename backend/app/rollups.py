@@ -0,0 +1,308 @@
+"""
+Incremental maintenance of the per-user daily mood rollup table.
+
+The CRUD layer calls into this module whenever entries are created,
+updated or deleted, inside the same transaction, so `DailyMoodRollup`
+always matches the entry table:
+- additions are folded in with a single upsert (`count + n`, `sum + s`,
+  `min(min, m)`, `max(max, m)`)
+- removals decrement `count`/`sum` and recompute `min`/`max` for the
+  affected day only, from the `(user_id, created_at)` index
+
+`rebuild` recomputes rollups from scratch and backs the command line
+entry point used for backfills:
+
+    python -m app.rollups rebuild [--user-id UUID]
+"""
+
+import argparse
+import datetime
+import uuid
+from collections.abc import Iterable
+from typing import Any
+
+import numpy as np
+from sqlalchemy import delete, func, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+from sqlmodel import Session, select
+
+from app.models import DailyMoodRollup, Entry
+
+_table = DailyMoodRollup.__table__
+
+
+def _day_bounds(day: datetime.date) -> tuple[datetime.datetime, datetime.datetime]:
+    start = datetime.datetime.combine(day, datetime.time())
+    return start, start + datetime.timedelta(days=1)
+
+
+def _upsert(session: Session, rows: list[dict[str, Any]]) -> None:
+    dialect = session.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            statement = sqlite.insert(_table)
+            least, greatest = func.min, func.max
+        else:
+            statement = postgresql.insert(_table)
+            least, greatest = func.least, func.greatest
+        excluded = statement.excluded
+        statement = statement.on_conflict_do_update(
+            index_elements=[_table.c.user_id, _table.c.day],
+            set_={
+                "count": _table.c.count + excluded.count,
+                "sum": _table.c.sum + excluded.sum,
+                "min": least(_table.c.min, excluded.min),
+                "max": greatest(_table.c.max, excluded.max),
+            },
+        )
+        session.exec(statement, params=rows)
+        return
+
+    # Portable fallback: read-modify-write through the ORM
+    for row in rows:
+        rollup = session.get(DailyMoodRollup, (row["user_id"], row["day"]))
+        if rollup is None:
+            session.add(DailyMoodRollup(**row))
+            continue
+        rollup.count += row["count"]
+        rollup.sum += row["sum"]
+        rollup.min = min(rollup.min, row["min"])
+        rollup.max = max(rollup.max, row["max"])
+        session.add(rollup)
+    session.flush()
+
+
+def add_entries(session: Session, entries: Iterable[Any]) -> None:
+    """
+    Fold new entries into their users' daily rollups.
+
+    Args:
+        session: Database session; the caller commits.
+        entries: Entries (or row dicts) with `user_id`, `created_at` and `mood`.
+    """
+    deltas: dict[tuple[uuid.UUID, datetime.date], dict[str, Any]] = {}
+    for entry in entries:
+        if isinstance(entry, dict):
+            user_id, created_at, mood = entry["user_id"], entry["created_at"], entry["mood"]
+        else:
+            user_id, created_at, mood = entry.user_id, entry.created_at, entry.mood
+        key = (user_id, created_at.date())
+        delta = deltas.get(key)
+        if delta is None:
+            deltas[key] = {
+                "user_id": user_id,
+                "day": key[1],
+                "count": 1,
+                "sum": mood,
+                "min": mood,
+                "max": mood,
+            }
+        else:
+            delta["count"] += 1
+            delta["sum"] += mood
+            delta["min"] = min(delta["min"], mood)
+            delta["max"] = max(delta["max"], mood)
+    if deltas:
+        _upsert(session, list(deltas.values()))
+
+
+def remove_entry(
+    session: Session, user_id: uuid.UUID, created_at: datetime.datetime, mood: int
+) -> None:
+    """
+    Take a removed (or moved) entry out of its day's rollup.
+
+    Must be called after the entry change is visible to the session's
+    queries; this function flushes the session first.
+
+    Args:
+        session: Database session; the caller commits.
+        user_id: ID of the entry's owner.
+        created_at: The entry's creation time before the change.
+        mood: The entry's mood before the change.
+    """
+    session.flush()
+    day = created_at.date()
+    start, end = _day_bounds(day)
+    key = (_table.c.user_id == user_id) & (_table.c.day == day)
+    session.exec(
+        update(_table)
+        .where(key)
+        .values(count=_table.c.count - 1, sum=_table.c.sum - mood)
+    )
+    session.exec(delete(_table).where(key, _table.c.count <= 0))
+
+    day_entries = (
+        (Entry.user_id == user_id) & (Entry.created_at >= start) & (Entry.created_at < end)
+    )
+    session.exec(
+        update(_table)
+        .where(key)
+        .values(
+            min=select(func.min(Entry.mood)).where(day_entries).scalar_subquery(),
+            max=select(func.max(Entry.mood)).where(day_entries).scalar_subquery(),
+        )
+    )
+
+
+def remove_user(session: Session, user_id: uuid.UUID) -> None:
+    """
+    Delete all of a user's rollups, within the caller's transaction.
+    """
+    session.exec(delete(_table).where(_table.c.user_id == user_id))
+
+
+def move_entry(
+    session: Session,
+    entry: Entry,
+    old_created_at: datetime.datetime,
+    old_mood: int,
+) -> None:
+    """
+    Update rollups after an entry's mood or day changed.
+
+    Args:
+        session: Database session; the caller commits.
+        entry: The entry with its new values applied.
+        old_created_at: The entry's creation time before the change.
+        old_mood: The entry's mood before the change.
+    """
+    if old_mood == entry.mood and old_created_at.date() == entry.created_at.date():
+        return
+    new_values = {"user_id": entry.user_id, "created_at": entry.created_at, "mood": entry.mood}
+    remove_entry(session, entry.user_id, old_created_at, old_mood)
+    add_entries(session, [new_values])
+
+
+def rebuild(session: Session, user_id: uuid.UUID | None = None) -> int:
+    """
+    Recompute rollups from the entry table.
+
+    Args:
+        session: Database session; committed on success.
+        user_id: Only rebuild this user's rollups; all users when `None`.
+
+    Returns:
+        The number of rollup rows written.
+    """
+    day = func.date(Entry.created_at)
+    statement = select(
+        Entry.user_id,
+        day.label("day"),
+        func.count().label("count"),
+        func.sum(Entry.mood).label("sum"),
+        func.min(Entry.mood).label("min"),
+        func.max(Entry.mood).label("max"),
+    ).group_by(Entry.user_id, day)
+    clear = delete(_table)
+    if user_id is not None:
+        statement = statement.where(Entry.user_id == user_id)
+        clear = clear.where(_table.c.user_id == user_id)
+
+    session.exec(clear)
+    rows = [
+        {
+            **row._asdict(),
+            "day": row.day
+            if isinstance(row.day, datetime.date)
+            else datetime.date.fromisoformat(row.day),
+        }
+        for row in session.exec(statement)
+    ]
+    if rows:
+        session.exec(_table.insert(), params=rows)
+    session.commit()
+    return len(rows)
+
+
+def backfill_rollups(connection: Connection) -> None:
+    """
+    Build rollups for existing entries if the rollup table is still empty.
+
+    Run by the schema migrations (see `app.migrations`), inside their
+    transaction.
+    """
+    with Session(bind=connection) as session:
+        has_rollups = session.exec(select(_table.c.day).limit(1)).first()
+        has_entries = session.exec(select(Entry.id).limit(1)).first()
+        if has_entries and not has_rollups:
+            rebuild(session)
+
+
+def get_daily_rollups(
+    *,
+    session: Session,
+    user_id: uuid.UUID,
+    start: datetime.date | None = None,
+    end: datetime.date | None = None,
+) -> list[DailyMoodRollup]:
+    """
+    Load a user's daily rollups, oldest first.
+
+    Args:
+        session: Database session.
+        user_id: ID of the user whose rollups to load.
+        start: First day to include, if any.
+        end: Last day to include, if any.
+
+    Returns:
+        The matching `DailyMoodRollup` rows.
+    """
+    statement = select(DailyMoodRollup).where(DailyMoodRollup.user_id == user_id)
+    if start is not None:
+        statement = statement.where(DailyMoodRollup.day >= start)
+    if end is not None:
+        statement = statement.where(DailyMoodRollup.day <= end)
+    return list(session.exec(statement.order_by(DailyMoodRollup.day)).all())
+
+
+def get_daily_rollup_arrays(
+    *, session: Session, user_id: uuid.UUID
+) -> dict[str, np.ndarray]:
+    """
+    Load all of a user's daily rollups as column arrays, oldest first.
+
+    Returns:
+        A dict with `day` (datetime64[D]), `count`, `sum`, `min` and `max`.
+    """
+    rows = session.exec(
+        select(_table.c.day, _table.c.count, _table.c.sum, _table.c.min, _table.c.max)
+        .where(_table.c.user_id == user_id)
+        .order_by(_table.c.day)
+    ).all()
+    columns = list(zip(*rows)) if rows else [[], [], [], [], []]
+    return {
+        "day": np.array(columns[0], dtype="datetime64[D]"),
+        "count": np.array(columns[1], dtype=np.int64),
+        "sum": np.array(columns[2], dtype=np.int64),
+        "min": np.array(columns[3], dtype=np.int64),
+        "max": np.array(columns[4], dtype=np.int64),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Maintain MoodMap daily mood rollups.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    rebuild_parser = subcommands.add_parser(
+        "rebuild", help="Recompute rollups from the entry table."
+    )
+    rebuild_parser.add_argument("--user-id", type=uuid.UUID, default=None)
+    args = parser.parse_args()
+
+    from app.core.sharding import shards
+
+    # A user's rollups live on their shard; a full rebuild covers every shard
+    if args.user_id is not None:
+        targets = [shards.engine_for(args.user_id)]
+    else:
+        targets = shards.engines
+    written = 0
+    for target in targets:
+        with Session(target) as session:
+            written += rebuild(session, user_id=args.user_id)
+    print(f"Rebuilt {written} daily rollup rows")
+
+
+if __name__ == "__main__":
+    main()
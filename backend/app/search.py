@@ -0,0 +1,321 @@
+"""
+Full-text search over journal entry titles and bodies.
+
+The index lives in the database itself and depends on the dialect:
+- SQLite: an FTS5 virtual table `entry_fts`, written explicitly by the CRUD
+  layer whenever an entry is created, updated or deleted
+- Postgres: a generated `search_vector` tsvector column on `entry` with a
+  GIN index, which Postgres keeps in sync on its own
+
+Other databases fall back to an (unindexed) `LIKE` scan.
+
+Results are ranked (BM25 on SQLite, `ts_rank_cd` on Postgres), paginated
+and come with a highlighted snippet. Snippets are HTML: the entry text is
+escaped and only the `<mark>` tags around matched terms are markup.
+"""
+
+import html
+import re
+import uuid
+from collections.abc import Iterable
+from typing import Any
+
+from sqlalchemy import DateTime, Uuid, bindparam, text
+from sqlalchemy.engine import Connection, Engine
+from sqlmodel import Session, or_, select
+
+from app.core.config import settings
+from app.models import Entry
+
+# Markup wrapped around matched terms in snippets
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_END = "</mark>"
+
+# Placeholders the database wraps around matches (Unicode private use
+# characters), replaced by the markup once the entry text is escaped
+_MATCH_START = "\ue000"
+_MATCH_END = "\ue001"
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def _dialect(bind: Session | Connection | Engine) -> str:
+    if isinstance(bind, Session):
+        bind = bind.get_bind()
+    return bind.dialect.name
+
+
+def create_search_index(connection: Connection) -> None:
+    """
+    Create the search index for the current dialect if it does not exist.
+
+    Run by the schema migrations (see `app.migrations`). On SQLite a newly
+    created FTS table is backfilled from existing entries.
+    """
+    dialect = _dialect(connection)
+    if dialect == "sqlite":
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE name = 'entry_fts'")
+        ).first()
+        if not exists:
+            connection.execute(
+                text(
+                    "CREATE VIRTUAL TABLE entry_fts USING fts5("
+                    "entry_id, user_id, title, body, "
+                    "tokenize = 'unicode61 remove_diacritics 2')"
+                )
+            )
+            _backfill_sqlite(connection)
+    elif dialect == "postgresql":
+        config = settings.SEARCH_TEXT_CONFIG
+        if not config.isidentifier():
+            raise ValueError(f"Invalid text search config: {config!r}")
+        connection.execute(
+            text(
+                "ALTER TABLE entry ADD COLUMN IF NOT EXISTS search_vector tsvector "
+                "GENERATED ALWAYS AS ("
+                f"setweight(to_tsvector('{config}', coalesce(title, '')), 'A') || "
+                f"setweight(to_tsvector('{config}', coalesce(body, '')), 'B')"
+                ") STORED"
+            )
+        )
+        connection.execute(
+            text(
+                "CREATE INDEX IF NOT EXISTS ix_entry_search_vector "
+                "ON entry USING GIN (search_vector)"
+            )
+        )
+
+
+def _backfill_sqlite(connection: Connection) -> None:
+    connection.execute(
+        text(
+            "INSERT INTO entry_fts (entry_id, user_id, title, body) "
+            "SELECT id, user_id, title, coalesce(body, '') FROM entry"
+        )
+    )
+
+
+def rebuild_search_index(session: Session) -> None:
+    """
+    Rebuild the SQLite FTS index from the entry table.
+
+    Postgres keeps its generated column in sync and needs no rebuild.
+    """
+    if _dialect(session) != "sqlite":
+        return
+    session.exec(text("DELETE FROM entry_fts"))
+    _backfill_sqlite(session.connection())
+    session.commit()
+
+
+def _delete_sqlite(session: Session, entry_ids: Iterable[uuid.UUID]) -> None:
+    # entry_id is an indexed FTS column, so MATCH finds the row without a scan
+    session.exec(
+        text(
+            "DELETE FROM entry_fts WHERE rowid IN ("
+            "SELECT rowid FROM entry_fts WHERE entry_fts MATCH :match)"
+        ),
+        params=[{"match": f'entry_id : "{entry_id.hex}"'} for entry_id in entry_ids],
+    )
+
+
+def index_entries(session: Session, entries: Iterable[Any]) -> None:
+    """
+    Add or refresh entries in the search index, within the caller's transaction.
+
+    Args:
+        session: Database session; the caller commits.
+        entries: Entries (or row dicts / objects with `id`, `user_id`,
+            `title` and `body`) to index.
+    """
+    if _dialect(session) != "sqlite":
+        return
+    rows = [
+        entry if isinstance(entry, dict) else {
+            "id": entry.id,
+            "user_id": entry.user_id,
+            "title": entry.title,
+            "body": entry.body,
+        }
+        for entry in entries
+    ]
+    if not rows:
+        return
+    _delete_sqlite(session, (row["id"] for row in rows))
+    session.exec(
+        text(
+            "INSERT INTO entry_fts (entry_id, user_id, title, body) "
+            "VALUES (:entry_id, :user_id, :title, :body)"
+        ),
+        params=[
+            {
+                "entry_id": row["id"].hex,
+                "user_id": row["user_id"].hex,
+                "title": row["title"],
+                "body": row["body"] or "",
+            }
+            for row in rows
+        ],
+    )
+
+
+def index_entry(session: Session, entry: Entry) -> None:
+    """
+    Add or refresh a single entry in the search index.
+    """
+    index_entries(session, [entry])
+
+
+def remove_entry(session: Session, entry_id: uuid.UUID) -> None:
+    """
+    Remove an entry from the search index, within the caller's transaction.
+    """
+    if _dialect(session) == "sqlite":
+        _delete_sqlite(session, [entry_id])
+
+
+def remove_user_entries(session: Session, user_id: uuid.UUID) -> None:
+    """
+    Remove all of a user's entries from the search index, within the
+    caller's transaction.
+    """
+    if _dialect(session) == "sqlite":
+        session.exec(
+            text(
+                "DELETE FROM entry_fts WHERE rowid IN ("
+                "SELECT rowid FROM entry_fts WHERE entry_fts MATCH :match)"
+            ),
+            params={"match": f'user_id : "{user_id.hex}"'},
+        )
+
+
+def _terms(query: str) -> list[str]:
+    return _TOKEN.findall(query)
+
+
+def _sqlite_match(user_id: uuid.UUID, terms: list[str]) -> str:
+    # Quote every term so user input can't inject FTS syntax; the last term
+    # is a prefix match to support search-as-you-type
+    phrases = [f'"{term}"' for term in terms]
+    phrases[-1] += "*"
+    return f'user_id : "{user_id.hex}" AND {{title body}} : ({" ".join(phrases)})'
+
+
+def _render(snippet: str) -> str:
+    """
+    Escape raw entry text as HTML, then turn match placeholders into marks.
+    """
+    return (
+        html.escape(snippet)
+        .replace(_MATCH_START, HIGHLIGHT_START)
+        .replace(_MATCH_END, HIGHLIGHT_END)
+    )
+
+
+def _snippet(title: str, body_snippet: str | None, title_highlight: str) -> str:
+    if body_snippet and _MATCH_START in body_snippet:
+        return _render(body_snippet)
+    if _MATCH_START in title_highlight:
+        return _render(title_highlight)
+    return _render(body_snippet or title)
+
+
+def search_entries(
+    *, session: Session, user_id: uuid.UUID, query: str, limit: int, offset: int
+) -> list[dict[str, Any]]:
+    """
+    Search a user's entries, best matches first.
+
+    Args:
+        session: Database session.
+        user_id: ID of the user whose entries to search.
+        query: Free-text query; every word must match (the last as a prefix
+            on SQLite).
+        limit: Maximum number of results to return.
+        offset: Number of ranked results to skip.
+
+    Returns:
+        Dicts with `id`, `title`, `mood`, `created_at`, `snippet` and `rank`
+        (higher is better).
+    """
+    terms = _terms(query)
+    if not terms:
+        return []
+    dialect = _dialect(session)
+
+    if dialect == "sqlite":
+        rows = session.exec(
+            text(
+                "SELECT entry.id, entry.title, entry.mood, entry.created_at, "
+                f"snippet(entry_fts, 3, '{_MATCH_START}', '{_MATCH_END}', '…', 16) "
+                "AS body_snippet, "
+                f"highlight(entry_fts, 2, '{_MATCH_START}', '{_MATCH_END}') "
+                "AS title_highlight, "
+                "-bm25(entry_fts, 0.0, 0.0, 5.0, 1.0) AS rank "
+                "FROM entry_fts JOIN entry ON entry.id = entry_fts.entry_id "
+                "WHERE entry_fts MATCH :match "
+                "ORDER BY bm25(entry_fts, 0.0, 0.0, 5.0, 1.0) "
+                "LIMIT :limit OFFSET :offset"
+            ).columns(created_at=DateTime),
+            params={"match": _sqlite_match(user_id, terms), "limit": limit, "offset": offset},
+        ).all()
+        return [
+            {
+                "id": uuid.UUID(row.id),
+                "title": row.title,
+                "mood": row.mood,
+                "created_at": row.created_at,
+                "snippet": _snippet(row.title, row.body_snippet, row.title_highlight),
+                "rank": row.rank,
+            }
+            for row in rows
+        ]
+
+    if dialect == "postgresql":
+        statement = text(
+            "SELECT e.id, e.title, e.mood, e.created_at, "
+            "ts_rank_cd(e.search_vector, q) AS rank, "
+            "ts_headline(CAST(:config AS regconfig), coalesce(nullif(e.body, ''), e.title), q, "
+            f"'StartSel={_MATCH_START}, StopSel={_MATCH_END}, "
+            "MaxFragments=1, MaxWords=24, MinWords=8') AS snippet "
+            "FROM entry e, plainto_tsquery(CAST(:config AS regconfig), :query) q "
+            "WHERE e.user_id = :user_id AND e.search_vector @@ q "
+            "ORDER BY rank DESC, e.created_at DESC "
+            "LIMIT :limit OFFSET :offset"
+        ).bindparams(bindparam("user_id", type_=Uuid))
+        rows = session.exec(
+            statement,
+            params={
+                "config": settings.SEARCH_TEXT_CONFIG,
+                "query": " ".join(terms),
+                "user_id": user_id,
+                "limit": limit,
+                "offset": offset,
+            },
+        ).all()
+        return [{**row._mapping, "snippet": _render(row.snippet)} for row in rows]
+
+    # Unindexed fallback for other databases
+    conditions = [
+        or_(Entry.title.ilike(f"%{term}%"), Entry.body.ilike(f"%{term}%"))
+        for term in terms
+    ]
+    entries = session.exec(
+        select(Entry.id, Entry.title, Entry.mood, Entry.created_at, Entry.body)
+        .where(Entry.user_id == user_id, *conditions)
+        .order_by(Entry.created_at.desc())
+        .limit(limit)
+        .offset(offset)
+    ).all()
+    return [
+        {
+            "id": row.id,
+            "title": row.title,
+            "mood": row.mood,
+            "created_at": row.created_at,
+            "snippet": _render((row.body or row.title)[:200]),
+            "rank": 0.0,
+        }
+        for row in entries
+    ]
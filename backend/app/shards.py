@@ -0,0 +1,157 @@
+"""
+Moving users between entry shards.
+
+A move copies the user's entries to the target shard in batches, rebuilds
+their rollups and search index rows there, copies their delete tombstones
+and change counter, points the user directory at
+the target, and then deletes the data from the source shard. Entries
+keep their IDs and timestamps, so ETags and cursors stay valid.
+
+Other processes keep routing the user to the old shard until their shard
+cache expires (`SHARD_CACHE_TTL_SECONDS`), and writes made to the source
+while a move is running are not copied. Move users while they are
+inactive, or with the API stopped. A failed move can simply be re-run:
+the target's partial copy is cleared before copying again.
+
+Command line:
+
+    python -m app.shards status
+    python -m app.shards move --user-id UUID --to SHARD
+    python -m app.shards rebalance [--dry-run] [--limit N]
+"""
+
+import argparse
+import uuid
+from collections.abc import Callable
+
+from sqlmodel import Session, delete, func, insert, select
+
+from app import changes, crud, rollups, search
+from app.core.sharding import ensure_user_on_shard, shards
+from app.models import Entry, User
+
+# Entries copied per batch during a move
+MOVE_BATCH_SIZE = 1000
+
+
+def move_user(user_id: uuid.UUID, target: int, batch_size: int = MOVE_BATCH_SIZE) -> int:
+    """
+    Move a user's entry data to another shard.
+
+    Args:
+        user_id: ID of the user to move.
+        target: Index of the destination shard.
+        batch_size: Number of entries copied per batch.
+
+    Raises:
+        ValueError: If the user does not exist or the shard is unknown.
+
+    Returns:
+        The number of entries moved (0 if the user is already on `target`).
+    """
+    if not 0 <= target < shards.count:
+        raise ValueError(f"Unknown shard {target}; {shards.count} shards are configured")
+    with Session(shards.directory) as directory:
+        user = directory.get(User, user_id)
+        if user is None:
+            raise ValueError(f"User {user_id} not found")
+        source = user.shard
+        if source == target:
+            return 0
+
+        ensure_user_on_shard(user, target)
+        moved = 0
+        with Session(shards.engines[source]) as src, Session(shards.engines[target]) as dst:
+            crud.delete_user_data(session=dst, user_id=user_id)
+            for batch in crud.iter_entry_batches_by_user_id(
+                session=src, user_id=user_id, batch_size=batch_size
+            ):
+                rows = [{**row._asdict(), "user_id": user_id} for row in batch]
+                dst.exec(insert(Entry), params=rows)
+                search.index_entries(dst, rows)
+                moved += len(rows)
+            changes.copy_user(src, dst, user_id)
+            # Commits the copied entries together with the rebuilt rollups
+            rollups.rebuild(dst, user_id=user_id)
+
+            user.shard = target
+            directory.add(user)
+            directory.commit()
+            shards.remember(user_id, target)
+
+            crud.delete_user_data(session=src, user_id=user_id)
+            if source != 0:
+                src.exec(delete(User).where(User.id == user_id))
+            src.commit()
+    return moved
+
+
+def rebalance(
+    dry_run: bool = False,
+    limit: int | None = None,
+    log: Callable[[str], None] | None = None,
+) -> int:
+    """
+    Move every user whose shard differs from their hash placement.
+
+    Run after adding shards to spread existing users onto them.
+
+    Args:
+        dry_run: Only report the moves that would be made.
+        limit: Move at most this many users.
+        log: Called with a message for each move, if given.
+
+    Returns:
+        The number of users moved (or that would be moved).
+    """
+    with Session(shards.directory) as directory:
+        users = directory.exec(select(User.id, User.shard).order_by(User.id)).all()
+    count = 0
+    for user_id, shard in users:
+        target = shards.placement(user_id)
+        if target == shard:
+            continue
+        if limit is not None and count >= limit:
+            break
+        message = f"User {user_id}: shard {shard} -> {target}"
+        if not dry_run:
+            message += f" ({move_user(user_id, target)} entries)"
+        if log is not None:
+            log(message)
+        count += 1
+    return count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Move MoodMap users between shards.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    subcommands.add_parser("status", help="Show users and entries per shard.")
+    move_parser = subcommands.add_parser("move", help="Move one user to another shard.")
+    move_parser.add_argument("--user-id", type=uuid.UUID, required=True)
+    move_parser.add_argument("--to", type=int, required=True, dest="target")
+    rebalance_parser = subcommands.add_parser(
+        "rebalance", help="Move users whose shard differs from their hash placement."
+    )
+    rebalance_parser.add_argument("--dry-run", action="store_true")
+    rebalance_parser.add_argument("--limit", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.command == "move":
+        moved = move_user(args.user_id, args.target)
+        print(f"Moved {moved} entries to shard {args.target}")
+    elif args.command == "rebalance":
+        count = rebalance(dry_run=args.dry_run, limit=args.limit, log=print)
+        print(f"{'Would move' if args.dry_run else 'Moved'} {count} users")
+    else:
+        with Session(shards.directory) as directory:
+            users = dict(
+                directory.exec(select(User.shard, func.count()).group_by(User.shard)).all()
+            )
+        for shard, shard_engine in enumerate(shards.engines):
+            with Session(shard_engine) as session:
+                entries = session.exec(select(func.count()).select_from(Entry)).one()
+            print(f"Shard {shard}: {users.get(shard, 0)} users, {entries} entries")
+
+
+if __name__ == "__main__":
+    main()
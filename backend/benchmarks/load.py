@@ -0,0 +1,485 @@
+"""
+HTTP load benchmark for the MoodMap API.
+
+Starts `app.main:app` under uvicorn in a subprocess, seeds it through the
+API itself (users registered via `POST /users/`, entry histories uploaded
+via `POST /entries/import`), then drives a series of scenarios with a
+fixed number of concurrent clients for a fixed duration each:
+
+- `login`: bursts of `POST /login/access-token`
+- `dashboard-<n>`: what the dashboard does on mount, for a user with an
+  `n`-entry history: the summary list, a revalidation of it with
+  `If-None-Match`, a full page and the mood time series
+- `ingest`: `POST /entries/`
+- `mixed`: a weighted blend of the above (mostly dashboard reads)
+
+Every request's latency is recorded per route. The report is JSON with
+request counts, errors, throughput and p50/p95/p99 latency per route and
+scenario, plus enough metadata (commit, settings) to compare two runs:
+
+    python -m benchmarks.load run --output before.json
+    python -m benchmarks.load run --output after.json
+    python -m benchmarks.load compare before.json after.json
+
+Runs use a fresh temporary SQLite database by default; pass
+`--database-url` to benchmark against another database (e.g. Postgres).
+Seeded users get unique emails, so an existing database is only added to.
+
+Usage (from `backend/`):
+
+    python -m benchmarks.load run [--duration 10] [--concurrency 16]
+        [--history-sizes 100 1000 10000] [--database-url URL] [--output FILE]
+    python -m benchmarks.load compare BASE HEAD [--threshold 0.1]
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+PASSWORD = "benchmark-password"
+
+# Settings the app refuses to start without; only used when not already set
+DEFAULT_ENV = {
+    "JWT_SECRET": "benchmark-secret-benchmark-secret",
+    "JWT_ALGORITHM": "HS256",
+    "ACCESS_TOKEN_EXPIRY": "60",
+    "BACKEND_CORS_ORIGINS": "http://localhost:3000",
+}
+
+
+@dataclass
+class RouteStats:
+    """
+    Latencies (in seconds) and status codes recorded for one route.
+    """
+
+    latencies: list[float] = field(default_factory=list)
+    statuses: dict[int, int] = field(default_factory=lambda: defaultdict(int))
+    errors: int = 0
+
+    def record(self, latency: float, status: int) -> None:
+        self.latencies.append(latency)
+        self.statuses[status] += 1
+        if status >= 400:
+            self.errors += 1
+
+    def summary(self, elapsed: float) -> dict[str, Any]:
+        latencies = sorted(self.latencies)
+        if len(latencies) >= 2:
+            cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+            p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+        else:
+            p50 = p95 = p99 = latencies[0] if latencies else 0.0
+        return {
+            "requests": len(latencies),
+            "errors": self.errors,
+            "statuses": {str(code): n for code, n in sorted(self.statuses.items())},
+            "throughput_rps": round(len(latencies) / elapsed, 2),
+            "mean_ms": round(statistics.fmean(latencies) * 1000, 3) if latencies else 0.0,
+            "p50_ms": round(p50 * 1000, 3),
+            "p95_ms": round(p95 * 1000, 3),
+            "p99_ms": round(p99 * 1000, 3),
+            "max_ms": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        }
+
+
+# A request factory takes a client and returns the route label and response
+Action = Callable[[httpx.AsyncClient], Awaitable[tuple[str, httpx.Response]]]
+
+
+@dataclass
+class BenchUser:
+    email: str
+    headers: dict[str, str]
+    history: int
+    etags: dict[str, str] = field(default_factory=dict)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BACKEND_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def start_server(
+    database_url: str, port: int, workers: int, extra_env: dict[str, str]
+) -> subprocess.Popen:
+    """
+    Migrate the database, start uvicorn serving `app.main:app` and wait
+    until it answers.
+    """
+    env = {**DEFAULT_ENV, **os.environ, **extra_env, "DATABASE_URL": database_url}
+    subprocess.run(
+        [sys.executable, "-m", "app.migrations", "upgrade"],
+        cwd=BACKEND_DIR,
+        env=env,
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.main:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+            "--log-level",
+            "warning",
+            "--no-access-log",
+        ],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"Server exited with code {process.returncode}")
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/utils/check-running", timeout=1)
+            return process
+        except httpx.TransportError:
+            time.sleep(0.2)
+    process.terminate()
+    raise SystemExit("Server did not start within 60 seconds")
+
+
+WORDS = (
+    "calm tired happy anxious walk coffee work friends rain sunny gym read "
+    "sleep family busy quiet dinner music focus stress relaxed meeting"
+).split()
+
+
+def _history_ndjson(size: int, rng: random.Random) -> bytes:
+    start = datetime.datetime(2020, 1, 1)
+    lines = []
+    for i in range(size):
+        created_at = start + datetime.timedelta(hours=i * 6, minutes=rng.randrange(360))
+        lines.append(
+            json.dumps(
+                {
+                    "mood": rng.randint(1, 10),
+                    "title": f"Day {i}",
+                    "body": " ".join(rng.choices(WORDS, k=rng.randint(10, 80))),
+                    "created_at": created_at.isoformat(),
+                }
+            )
+        )
+    return ("\n".join(lines) + "\n").encode()
+
+
+async def seed(
+    client: httpx.AsyncClient, run_id: str, history_sizes: list[int], rng: random.Random
+) -> list[BenchUser]:
+    """
+    Register one user per history size and upload their entries.
+    """
+    users = []
+    for size in history_sizes:
+        email = f"bench-{run_id}-{size}@example.com"
+        response = await client.post(
+            "/users/",
+            json={
+                "email": email,
+                "first_name": "Bench",
+                "last_name": str(size),
+                "password": PASSWORD,
+            },
+        )
+        response.raise_for_status()
+        token = (
+            await client.post(
+                "/login/access-token", data={"username": email, "password": PASSWORD}
+            )
+        ).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        if size:
+            report = await client.post(
+                "/entries/import?format=ndjson",
+                content=_history_ndjson(size, rng),
+                headers=headers,
+                timeout=600,
+            )
+            report.raise_for_status()
+        users.append(BenchUser(email=email, headers=headers, history=size))
+    return users
+
+
+def login_action(user: BenchUser) -> Action:
+    async def action(client: httpx.AsyncClient) -> tuple[str, httpx.Response]:
+        response = await client.post(
+            "/login/access-token", data={"username": user.email, "password": PASSWORD}
+        )
+        return "POST /login/access-token", response
+
+    return action
+
+
+def dashboard_actions(user: BenchUser) -> list[tuple[float, Action]]:
+    suffix = f" [history={user.history}]"
+
+    async def summary(client: httpx.AsyncClient) -> tuple[str, httpx.Response]:
+        response = await client.get(
+            "/entries/", params={"limit": 10, "view": "summary"}, headers=user.headers
+        )
+        if "etag" in response.headers:
+            user.etags["summary"] = response.headers["etag"]
+        return "GET /entries?view=summary" + suffix, response
+
+    async def revalidate(client: httpx.AsyncClient) -> tuple[str, httpx.Response]:
+        headers = dict(user.headers)
+        if "summary" in user.etags:
+            headers["If-None-Match"] = user.etags["summary"]
+        response = await client.get(
+            "/entries/", params={"limit": 10, "view": "summary"}, headers=headers
+        )
+        return "GET /entries?view=summary (If-None-Match)" + suffix, response
+
+    async def full_page(client: httpx.AsyncClient) -> tuple[str, httpx.Response]:
+        response = await client.get(
+            "/entries/", params={"limit": 100}, headers=user.headers
+        )
+        return "GET /entries?limit=100" + suffix, response
+
+    async def timeseries(client: httpx.AsyncClient) -> tuple[str, httpx.Response]:
+        response = await client.get(
+            "/entries/timeseries",
+            params={"bucket": "day", "tz": "Europe/London"},
+            headers=user.headers,
+        )
+        return "GET /entries/timeseries" + suffix, response
+
+    return [(3, summary), (3, revalidate), (1, full_page), (2, timeseries)]
+
+
+def ingest_action(user: BenchUser, rng: random.Random) -> Action:
+    async def action(client: httpx.AsyncClient) -> tuple[str, httpx.Response]:
+        response = await client.post(
+            "/entries/",
+            json={
+                "mood": rng.randint(1, 10),
+                "title": "Benchmark entry",
+                "body": " ".join(rng.choices(WORDS, k=20)),
+            },
+            headers=user.headers,
+        )
+        return "POST /entries", response
+
+    return action
+
+
+async def run_scenario(
+    base_url: str,
+    actions: list[tuple[float, Action]],
+    duration: float,
+    concurrency: int,
+    rng: random.Random,
+) -> dict[str, Any]:
+    """
+    Run `concurrency` clients picking weighted actions for `duration` seconds.
+    """
+    stats: dict[str, RouteStats] = defaultdict(RouteStats)
+    weights = [weight for weight, _ in actions]
+    choices = [action for _, action in actions]
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+
+        async def worker() -> None:
+            while time.perf_counter() < deadline:
+                action = rng.choices(choices, weights)[0]
+                start = time.perf_counter()
+                try:
+                    route, response = await action(client)
+                    status = response.status_code
+                except httpx.TransportError:
+                    route, status = "transport error", 599
+                stats[route].record(time.perf_counter() - start, status)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    total = sum(len(route.latencies) for route in stats.values())
+    return {
+        "duration_s": round(elapsed, 3),
+        "requests": total,
+        "errors": sum(route.errors for route in stats.values()),
+        "throughput_rps": round(total / elapsed, 2),
+        "routes": {name: route.summary(elapsed) for name, route in sorted(stats.items())},
+    }
+
+
+async def run_benchmark(args: argparse.Namespace, base_url: str) -> dict[str, Any]:
+    rng = random.Random(args.seed)
+    run_id = uuid.uuid4().hex[:8]
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        users = await seed(client, run_id, args.history_sizes, rng)
+        [ingest_user] = await seed(client, run_id + "-ingest", [0], rng)
+
+    scenarios: dict[str, list[tuple[float, Action]]] = {
+        "login": [(1, login_action(users[0]))],
+    }
+    for user in users:
+        scenarios[f"dashboard-{user.history}"] = dashboard_actions(user)
+    scenarios["ingest"] = [(1, ingest_action(ingest_user, rng))]
+    mixed_user = users[len(users) // 2]
+    scenarios["mixed"] = [
+        *[(weight * 8, action) for weight, action in dashboard_actions(mixed_user)],
+        (18, ingest_action(ingest_user, rng)),
+        (2, login_action(mixed_user)),
+    ]
+
+    results = {}
+    for name, actions in scenarios.items():
+        if args.scenarios and name not in args.scenarios:
+            continue
+        print(f"Running {name} for {args.duration}s...", file=sys.stderr)
+        results[name] = await run_scenario(
+            base_url, actions, args.duration, args.concurrency, rng
+        )
+    return results
+
+
+def run(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite:///{tmp}/benchmark.sqlite"
+        port = args.port or _free_port()
+        extra_env = dict(pair.split("=", 1) for pair in args.env)
+        server = start_server(database_url, port, args.workers, extra_env)
+        try:
+            scenarios = asyncio.run(run_benchmark(args, f"http://127.0.0.1:{port}"))
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": database_url.split(":", 1)[0],
+            "duration_s": args.duration,
+            "concurrency": args.concurrency,
+            "workers": args.workers,
+            "history_sizes": args.history_sizes,
+            "seed": args.seed,
+            "env": extra_env,
+        },
+        "scenarios": scenarios,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    print(output)
+
+
+def compare(args: argparse.Namespace) -> None:
+    """
+    Print per-route throughput and p95 changes between two reports.
+
+    Exits with status 1 if any route's p95 latency grew, or its throughput
+    dropped, by more than `--threshold` (a fraction).
+    """
+    base = json.loads(Path(args.base).read_text())["scenarios"]
+    head = json.loads(Path(args.head).read_text())["scenarios"]
+    regressions = []
+    rows = []
+    for scenario, head_result in head.items():
+        for route, after in head_result["routes"].items():
+            before = base.get(scenario, {}).get("routes", {}).get(route)
+            if before is None:
+                continue
+            p95_change = (after["p95_ms"] - before["p95_ms"]) / (before["p95_ms"] or 1)
+            rps_change = (after["throughput_rps"] - before["throughput_rps"]) / (
+                before["throughput_rps"] or 1
+            )
+            rows.append(
+                {
+                    "scenario": scenario,
+                    "route": route,
+                    "p95_ms": [before["p95_ms"], after["p95_ms"]],
+                    "p95_change": round(p95_change, 3),
+                    "throughput_rps": [before["throughput_rps"], after["throughput_rps"]],
+                    "throughput_change": round(rps_change, 3),
+                }
+            )
+            if p95_change > args.threshold or rps_change < -args.threshold:
+                regressions.append(f"{scenario}: {route}")
+    print(json.dumps({"routes": rows, "regressions": regressions}, indent=2))
+    if regressions:
+        sys.exit(1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="MoodMap HTTP load benchmark.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subcommands.add_parser("run", help="Start the API and run the scenarios.")
+    run_parser.add_argument("--duration", type=float, default=10.0, help="Seconds per scenario.")
+    run_parser.add_argument("--concurrency", type=int, default=16)
+    run_parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes.")
+    run_parser.add_argument(
+        "--history-sizes", type=int, nargs="+", default=[100, 1000, 10000]
+    )
+    run_parser.add_argument("--scenarios", nargs="*", help="Only run these scenarios.")
+    run_parser.add_argument("--database-url", help="Defaults to a fresh SQLite file.")
+    run_parser.add_argument("--port", type=int, help="Defaults to a free port.")
+    run_parser.add_argument(
+        "--env", nargs="*", default=[], metavar="NAME=VALUE",
+        help="Extra settings for the server, e.g. DATABASE_ASYNC=true.",
+    )
+    run_parser.add_argument("--seed", type=int, default=1)
+    run_parser.add_argument("--output", help="Also write the JSON report here.")
+    run_parser.set_defaults(handler=run)
+
+    compare_parser = subcommands.add_parser("compare", help="Compare two reports.")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("head")
+    compare_parser.add_argument("--threshold", type=float, default=0.1)
+    compare_parser.set_defaults(handler=compare)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Micro-benchmark: per-entry cost of producing an entries page as JSON.
+
+Compares two ways of turning a user's entries into the `GET /entries`
+response body:
+
+- `response_model` (before): load `Entry` ORM entities, build
+  `EntriesPublic` from them, then let FastAPI validate it against the
+  route's `response_model`, encode it to Python primitives and
+  `json.dumps` it
+- `fast` (after): select plain column rows, build `EntriesPublic` once
+  (the only validation pass) and write it with pydantic-core's compiled
+  serializer via `ModelJSONResponse`
+
+Both read from the same in-memory SQLite database so the query and row
+handling are included, but HTTP and auth are not. Results are printed as
+JSON, one object per page size.
+
+Usage (from `backend/`):
+
+    python -m benchmarks.serialization [--sizes 10 100 500] [--repeat 100]
+"""
+
+import argparse
+import asyncio
+import datetime
+import gc
+import json
+import statistics
+import time
+import uuid
+from collections.abc import Callable
+
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine, insert, select
+from starlette.responses import JSONResponse
+
+from app import crud
+from app.api.responses import ModelJSONResponse
+from app.models import Entry, EntriesPublic, User
+
+_field = create_model_field(name="Response_get_user_entries", type_=EntriesPublic)
+_loop = asyncio.new_event_loop()
+
+
+def seed(session: Session, n: int) -> uuid.UUID:
+    user = User(
+        email="bench@example.com", first_name="Bench", last_name="User", hashed_password="x"
+    )
+    session.add(user)
+    session.flush()
+    now = datetime.datetime(2025, 1, 1)
+    session.exec(
+        insert(Entry),
+        params=[
+            {
+                "id": uuid.uuid4(),
+                "user_id": user.id,
+                "mood": i % 10 + 1,
+                "title": f"Entry {i}",
+                "body": "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 4,
+                "created_at": now - datetime.timedelta(minutes=i),
+                "updated_at": now - datetime.timedelta(minutes=i),
+            }
+            for i in range(n)
+        ],
+    )
+    session.commit()
+    return user.id
+
+
+def response_model_path(session: Session, user_id: uuid.UUID, limit: int) -> bytes:
+    rows = session.exec(
+        select(Entry)
+        .where(Entry.user_id == user_id)
+        .order_by(Entry.created_at.desc(), Entry.id)
+        .limit(limit + 1)
+    ).all()
+    page = crud.build_entries_page(rows, limit=limit, count=limit)
+    content = _loop.run_until_complete(
+        serialize_response(field=_field, response_content=page, is_coroutine=True)
+    )
+    session.expunge_all()
+    return JSONResponse(content).body
+
+
+def fast_path(session: Session, user_id: uuid.UUID, limit: int) -> bytes:
+    rows = session.exec(
+        crud.user_entries_page_statement(user_id=user_id, limit=limit)
+    ).all()
+    page = crud.build_entries_page(rows, limit=limit, count=limit)
+    return ModelJSONResponse(page).body
+
+
+def _time(fn: Callable[[], bytes], repeat: int) -> float:
+    fn()  # warm up
+    samples = []
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - start)
+    finally:
+        gc.enable()
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Entries page serialisation benchmark.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--repeat", type=int, default=100)
+    args = parser.parse_args()
+
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    SQLModel.metadata.create_all(engine)
+    results = []
+    with Session(engine) as session:
+        user_id = seed(session, max(args.sizes))
+        for size in args.sizes:
+            before_body = response_model_path(session, user_id, size)
+            after_body = fast_path(session, user_id, size)
+            if json.loads(before_body) != json.loads(after_body):
+                raise SystemExit("Fast path output differs from the response_model path")
+            before = _time(lambda: response_model_path(session, user_id, size), args.repeat)
+            after = _time(lambda: fast_path(session, user_id, size), args.repeat)
+            results.append(
+                {
+                    "entries": size,
+                    "response_model_us_per_entry": round(before / size * 1e6, 2),
+                    "fast_us_per_entry": round(after / size * 1e6, 2),
+                    "speedup": round(before / after, 2),
+                }
+            )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
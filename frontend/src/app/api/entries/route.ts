@@ -50,7 +50,7 @@ export async function POST(request: NextRequest){
     return NextResponse.json(newEntry)
 }
 
-export async function GET(){
+export async function GET(request: NextRequest){
     const base = process.env.NEXT_PUBLIC_API_BASE ?? "http://localhost:8000"
 
     const cookieStore = await cookies()
@@ -63,18 +63,35 @@ export async function GET(){
         )
     }
 
-    const res = await fetch(`${base}/entries/`, {
+    // forward pagination params (limit, cursor) and the client's cached ETag
+    const headers: Record<string, string> = {
+        "Authorization": `Bearer ${accessToken}`,
+    }
+    const ifNoneMatch = request.headers.get("if-none-match")
+    if (ifNoneMatch) {
+        headers["If-None-Match"] = ifNoneMatch
+    }
+    const res = await fetch(`${base}/entries/${request.nextUrl.search}`, {
         method: "GET",
-        headers: {
-            "Authorization": `Bearer ${accessToken}`,
-        }
+        headers,
+        cache: "no-store",
     })
 
+    const etag = res.headers.get("etag")
+    const cacheHeaders: Record<string, string> = etag
+        ? { "ETag": etag, "Cache-Control": "private, no-cache" }
+        : {}
+
+    // nothing changed since the client's copy
+    if (res.status === 304) {
+        return new NextResponse(null, { status: 304, headers: cacheHeaders })
+    }
+
     if(!res.ok)
     {
         return NextResponse.json({ error: "Failed to get entries" }, { status: res.status })
     }
 
     const entries = await res.json()
-    return NextResponse.json(entries)
+    return NextResponse.json(entries, { headers: cacheHeaders })
 }
\ No newline at end of file
@@ -0,0 +1,38 @@
+import { NextRequest, NextResponse } from "next/server";
+import { cookies } from "next/headers";
+
+/**
+ * Route: GET /api/entries/timeseries
+ * Get the user's mood aggregated into day/week/month buckets for the chart
+ * @param request - The request object
+ * @returns The bucketed mood series
+ */
+export async function GET(request: NextRequest){
+    const base = process.env.NEXT_PUBLIC_API_BASE ?? "http://localhost:8000"
+
+    const cookieStore = await cookies()
+    const accessToken = cookieStore.get("access_token")?.value
+
+    if (!accessToken) {
+        return NextResponse.json(
+            { error: "Unauthorized" },
+            { status: 401 }
+        )
+    }
+
+    // forward bucket, tz and max_points to the backend
+    const res = await fetch(`${base}/entries/timeseries${request.nextUrl.search}`, {
+        method: "GET",
+        headers: {
+            "Authorization": `Bearer ${accessToken}`,
+        }
+    })
+
+    if(!res.ok)
+    {
+        return NextResponse.json({ error: "Failed to get mood series" }, { status: res.status })
+    }
+
+    const series = await res.json()
+    return NextResponse.json(series)
+}
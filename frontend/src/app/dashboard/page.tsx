@@ -1,6 +1,6 @@
 "use client";
 
-import { MoodChart } from "@/components/MoodChart";
+import { MoodBucket, MoodChart } from "@/components/MoodChart";
 import Link from "next/link";
 import { useEffect, useState } from "react";
 
@@ -8,34 +8,45 @@ type Entry = {
   id: string;
   title: string;
   mood: number;
-  body: string;
   created_at: string;
-  updated_at: string;
 };
 
 type Entries = {
   data: Entry[];
   count: number;
+  next_cursor: string | null;
+};
+
+type MoodTimeSeries = {
+  data: MoodBucket[];
+  bucket: string;
+  timezone: string;
 };
 
 export default function Dashboard() {
   const [entries, setEntries] = useState<Entries>();
+  const [series, setSeries] = useState<MoodTimeSeries>();
   const [error, setError] = useState<string | null>(null);
 
   useEffect(() => {
     (async () => {
       try {
-        const res = await fetch("/api/entries", {
-          method: "GET",
-        });
+        const tz = Intl.DateTimeFormat().resolvedOptions().timeZone;
+        const [res, seriesRes] = await Promise.all([
+          fetch("/api/entries?limit=10&view=summary", { method: "GET" }),
+          fetch(`/api/entries/timeseries?tz=${encodeURIComponent(tz)}`, {
+            method: "GET",
+          }),
+        ]);
 
-        if (!res.ok) {
+        if (!res.ok || !seriesRes.ok) {
           setError("Failed to load entries");
           return;
         }
 
         const json: Entries = await res.json();
         setEntries(json);
+        setSeries(await seriesRes.json());
       } catch (err) {
         console.error(err);
         setError("Something went wrong while loading your entries");
@@ -128,9 +139,9 @@ export default function Dashboard() {
         <section className="bg-white rounded-2xl shadow-sm border border-slate-200 flex flex-col p-4">
           <h2 className="text-lg font-semibold mb-2">Mood Over Time</h2>
 
-          {entries && entries.count > 0 ? (
+          {entries && entries.count > 0 && series ? (
             <div className="flex-1 min-h-[260px]">
-              <MoodChart entries={entries.data} />
+              <MoodChart buckets={series.data} />
             </div>
           ) : (
             <p className="text-sm text-slate-500">
@@ -1,34 +1,28 @@
 "use client"
 import { CartesianGrid, Legend, Line, LineChart, Tooltip, XAxis, YAxis } from 'recharts';
 
-type Entry = {
-    id: string;
-    title: string;
-    mood: number;
-    body: string;
-    created_at: string;
-    updated_at: string;
+export type MoodBucket = {
+    bucket: string;
+    avg: number;
+    min: number;
+    max: number;
+    n: number;
 };
 
 type MoodChartProps = {
-    entries: Entry[];
+    buckets: MoodBucket[];
 };
 
-export function MoodChart({ entries } : MoodChartProps){
-    if (!entries || entries.length === 0) {
+export function MoodChart({ buckets } : MoodChartProps){
+    if (!buckets || buckets.length === 0) {
         return <p className="text-center text-sm text-gray-500">No data yet.</p>;
     }
 
-    const data = entries
-        .slice()
-        .sort(
-            (a, b) => 
-                new Date(a.created_at).getTime() - new Date(b.created_at).getTime()
-        )
-        .map((e) => ({
-            dateLabel: new Date(e.created_at).toLocaleDateString(),
-            mood: e.mood,
-        }))
+    // buckets arrive oldest first and already downsampled by the backend
+    const data = buckets.map((b) => ({
+        dateLabel: new Date(`${b.bucket}T00:00:00`).toLocaleDateString(),
+        mood: Math.round(b.avg * 10) / 10,
+    }))
 
 
 